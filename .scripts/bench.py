@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""Benchmark discovery and linting on a generated repository.
+
+A synthetic tree is generated from a seed, so every run and every commit
+sees the same files: shell and PowerShell scripts spread over nested
+directories, chains of shell libraries sourcing each other, and deep
+node_modules and target directories full of scripts that discovery must
+skip. ShellCheck and pwsh are replaced by stub executables that answer
+the linters' protocols with a configurable latency, so the numbers measure
+this package rather than the tools.
+
+Measured are find_files() over the tree, in this process, and the wall time,
+tool process count and peak RSS of shlint.py, pwshlint.py and lint.py runs,
+each with a cold and a warm cache. Results are written as JSON, with the
+commit and settings they came from; --baseline compares them against an
+earlier results file.
+
+Usage:
+    python .scripts/bench.py --output before.json
+    git checkout my-branch
+    python .scripts/bench.py --output after.json --baseline before.json
+
+The stubs are run through their #! line and peak RSS comes from wait4(),
+so the benchmark needs a POSIX system.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the current directory to sys.path to allow importing pylib
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from pylib.cache import read_json, write_json_atomic  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.file_finder import find_files  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.report import Colors  # noqa: E402  # pylint: disable=wrong-import-position
+
+RESULT_FORMAT = 1
+
+# Written into generated trees; only directories holding it are ever wiped
+TREE_MARKER = ".bench-tree.json"
+
+# Lines containing this are reported by both stubs
+ISSUE_MARKER = "BENCH_ISSUE"
+
+# Patterns the benchmarked linters discover by default
+PATTERNS = ["**/*.sh", "**/*.ps1"]
+
+# Linter scripts whose runs are measured
+SCRIPTS = ["shlint.py", "pwshlint.py", "lint.py"]
+
+# Stub executables. They log one line per process to $BENCH_LOG, sleep
+# $BENCH_LATENCY per process and $BENCH_FILE_LATENCY per file checked.
+_STUB_PRELUDE = r"""import json, os, sys, time
+
+def started(tool):
+    with open(os.environ["BENCH_LOG"], "a", encoding="utf-8") as log:
+        log.write(tool + "\n")
+    time.sleep(float(os.environ.get("BENCH_LATENCY", "0")))
+
+def findings(text):
+    return [
+        (number, line.index(MARKER) + 1)
+        for number, line in enumerate(text.splitlines(), 1)
+        if MARKER in line
+    ]
+
+FILE_LATENCY = float(os.environ.get("BENCH_FILE_LATENCY", "0"))
+"""
+
+SHELLCHECK_STUB = r"""
+started("shellcheck")
+args = sys.argv[1:]
+if "--version" in args:
+    print("ShellCheck - shell script analysis tool\nversion: 0.0.0-bench")
+    sys.exit(0)
+files = [arg for arg in args if not arg.startswith("-") or arg == "-"]
+comments = []
+for path in files:
+    time.sleep(FILE_LATENCY)
+    text = sys.stdin.read() if path == "-" else open(path, encoding="utf-8").read()
+    for line, column in findings(text):
+        comments.append({
+            "file": path, "line": line, "endLine": line, "column": column,
+            "endColumn": column + len(MARKER), "level": "warning", "code": 2086,
+            "message": "Double quote to prevent globbing and word splitting.",
+            "fix": None,
+        })
+if "--format=json1" in args:
+    print(json.dumps({"comments": comments}))
+sys.exit(1 if comments else 0)
+"""
+
+PWSH_STUB = r"""
+started("pwsh")
+args = sys.argv[1:]
+if "-Command" in args:
+    if "Get-Module" in args[args.index("-Command") + 1]:
+        print("0.0.0-bench\t" + os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(0)
+if "-EncodedCommand" not in args:
+    sys.exit(0)
+print(json.dumps({"ready": True, "version": "0.0.0-bench"}), flush=True)
+for request in sys.stdin:
+    request = json.loads(request)
+    time.sleep(FILE_LATENCY)
+    text = request.get("script")
+    if text is None:
+        text = open(request["path"], encoding="utf-8").read()
+    for line, column in findings(text)[: request.get("limit") or None]:
+        print(json.dumps({"id": request["id"], "diagnostic": {
+            "line": line, "column": column, "severity": "Warning",
+            "rule": "PSAvoidUsingWriteHost", "message": "Avoid Write-Host.",
+            "fixable": False,
+        }}), flush=True)
+    print(json.dumps({"id": request["id"]}), flush=True)
+"""
+
+
+class TreeSpec:  # pylint: disable=too-many-instance-attributes
+    """Shape of a generated tree.
+
+    Attributes:
+        seed: Seed of the random choices; equal specs give equal trees.
+        shell: Number of .sh files outside ignored directories.
+        pwsh: Number of .ps1 files outside ignored directories.
+        depth: Nesting depth of the source directories.
+        noise: Number of scripts inside node_modules and target directories.
+        noise_depth: Nesting depth of the ignored directories.
+        chains: Number of shell library chains.
+        chain_length: Libraries per chain, each sourcing the previous one.
+        issues: Fraction of scripts with a finding.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.seed = args.seed
+        self.shell = args.shell
+        self.pwsh = args.pwsh
+        self.depth = args.depth
+        self.noise = args.noise
+        self.noise_depth = args.noise_depth
+        self.chains = args.chains
+        self.chain_length = args.chain_length
+        self.issues = args.issues
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the settings as a JSON object."""
+        return dict(vars(self))
+
+
+def _write(path: str, text: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as handle:
+        handle.write(text)
+
+
+def _source_dir(rng: random.Random, depth: int) -> str:
+    """Pick a nested directory such as src/d3/d1/d4."""
+    parts = ["src"] + [f"d{rng.randrange(6)}" for _ in range(rng.randrange(depth + 1))]
+    return os.path.join(*parts)
+
+
+def _shell_script(rng: random.Random, spec: TreeSpec, number: int) -> str:
+    lines = ["#!/usr/bin/env bash", "set -euo pipefail", ""]
+    if spec.chains and rng.random() < 0.5:
+        chain = rng.randrange(spec.chains)
+        library = f"lib/chain{chain}/lib{spec.chain_length - 1}.sh"
+        lines += [f"# shellcheck source={library}", f". {library}", ""]
+    lines += [f'echo "script {number}" "$@"' for _ in range(rng.randrange(5, 40))]
+    if rng.random() < spec.issues:
+        lines.append(f"echo $1 # {ISSUE_MARKER}")
+    return "\n".join(lines) + "\n"
+
+
+def _pwsh_script(rng: random.Random, spec: TreeSpec, number: int) -> str:
+    lines = ["param([string]$Name = 'bench')", ""]
+    lines += [
+        f'Write-Output "script {number} $Name"' for _ in range(rng.randrange(5, 40))
+    ]
+    if rng.random() < spec.issues:
+        lines.append(f"Write-Host $Name # {ISSUE_MARKER}")
+    return "\n".join(lines) + "\n"
+
+
+def _libraries(spec: TreeSpec, root: str) -> int:
+    """Write the library chains; return the number of files written."""
+    for chain in range(spec.chains):
+        for index in range(spec.chain_length):
+            lines = ["#!/usr/bin/env bash"]
+            if index:
+                lines.append(f'. "$(dirname "${{BASH_SOURCE[0]}}")/lib{index - 1}.sh"')
+            lines.append(f"lib_{chain}_{index}() {{ echo {index}; }}")
+            _write(
+                os.path.join(root, "lib", f"chain{chain}", f"lib{index}.sh"),
+                "\n".join(lines) + "\n",
+            )
+    return spec.chains * spec.chain_length
+
+
+def _noise(rng: random.Random, spec: TreeSpec, root: str) -> None:
+    """Write scripts into deep node_modules and target directories."""
+    for number in range(spec.noise):
+        if number % 2:
+            parts = ["target", rng.choice(["debug", "release"]), "build"]
+            parts += [f"crate{rng.randrange(20)}" for _ in range(spec.noise_depth - 3)]
+        else:
+            parts = []
+            for _ in range(spec.noise_depth // 2):
+                parts += ["node_modules", f"pkg{rng.randrange(20)}"]
+        extension = ".sh" if number % 3 else ".ps1"
+        _write(
+            os.path.join(root, *parts, f"noise{number}{extension}"),
+            f"echo noise {number} # {ISSUE_MARKER}\n",
+        )
+
+
+def generate_tree(spec: TreeSpec, root: str) -> None:
+    """Write a synthetic repository.
+
+    Args:
+        spec: Shape of the tree.
+        root: Empty or missing directory to write it to.
+    """
+    rng = random.Random(spec.seed)
+    libraries = _libraries(spec, root)
+    for number in range(spec.shell - libraries):
+        _write(
+            os.path.join(root, _source_dir(rng, spec.depth), f"script{number}.sh"),
+            _shell_script(rng, spec, number),
+        )
+    for number in range(spec.pwsh):
+        _write(
+            os.path.join(root, _source_dir(rng, spec.depth), f"script{number}.ps1"),
+            _pwsh_script(rng, spec, number),
+        )
+    _noise(rng, spec, root)
+    _write(os.path.join(root, ".gitignore"), "/out/\n*.log\n")
+    _write(os.path.join(root, TREE_MARKER), json.dumps(spec.to_dict()) + "\n")
+
+
+def tree_digest(root: str) -> str:
+    """Return a digest of the paths and sizes of every file in a tree."""
+    digest = hashlib.sha256()
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            digest.update(f"{relative}\0{os.path.getsize(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def write_stubs(directory: str) -> None:
+    """Write the stub shellcheck and pwsh executables."""
+    os.makedirs(directory, exist_ok=True)
+    prelude = f"#!{sys.executable}\n{_STUB_PRELUDE}MARKER = {ISSUE_MARKER!r}\n"
+    for name, body in (("shellcheck", SHELLCHECK_STUB), ("pwsh", PWSH_STUB)):
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(prelude + body)
+        os.chmod(path, 0o755)
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    return {
+        "seconds": [round(sample, 6) for sample in samples],
+        "median": round(statistics.median(samples), 6),
+        "min": round(min(samples), 6),
+    }
+
+
+def bench_find_files(tree: str, repeat: int) -> Dict[str, Any]:
+    """Time find_files() over the tree in this process.
+
+    Args:
+        tree: Root of the generated tree.
+        repeat: Number of timed calls.
+
+    Returns:
+        The result entry.
+    """
+    previous = os.getcwd()
+    os.chdir(tree)
+    try:
+        samples = []
+        found = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = len(find_files(PATTERNS))
+            samples.append(time.perf_counter() - started)
+    finally:
+        os.chdir(previous)
+    return {"name": "find_files", "files": found, **_summary(samples)}
+
+
+def run_measured(
+    command: List[str], cwd: str, env: Dict[str, str]
+) -> Tuple[float, int, Optional[int]]:
+    """Run a command, discarding its output.
+
+    Returns:
+        Tuple of (wall time in seconds, exit code, peak RSS in KiB of the
+        process or any of its children, where the system reports it).
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        command,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss
+    else:
+        process.wait()
+        peak = None
+    return time.perf_counter() - started, process.returncode, peak
+
+
+def _count_processes(log: str) -> Dict[str, int]:
+    counts = {"shellcheck": 0, "pwsh": 0}
+    try:
+        with open(log, encoding="utf-8") as handle:
+            for line in handle:
+                counts[line.strip()] = counts.get(line.strip(), 0) + 1
+    except FileNotFoundError:
+        pass
+    return counts
+
+
+def bench_command(
+    args: argparse.Namespace,
+    work: str,
+    script: str,
+    warm: bool,
+) -> Dict[str, Any]:
+    """Time runs of one linter script over the tree.
+
+    Args:
+        args: Parsed command-line arguments.
+        work: Directory holding the tree, stubs, logs and caches.
+        script: Script in this directory to run.
+        warm: Run once untimed first, so timed runs find a filled cache.
+
+    Returns:
+        The result entry.
+
+    Raises:
+        RuntimeError: If a run fails rather than report findings.
+    """
+    log = os.path.join(work, "processes.log")
+    cache = os.path.join(work, "cache")
+    env = dict(os.environ)
+    env.update(
+        PATH=os.path.join(work, "bin") + os.pathsep + env.get("PATH", ""),
+        BENCH_LOG=log,
+        BENCH_LATENCY=str(args.latency),
+        BENCH_FILE_LATENCY=str(args.file_latency),
+    )
+    arguments = ["--no-daemon", "--jobs", str(args.jobs), *args.lint_args]
+    command = [sys.executable, os.path.join(SCRIPT_DIR, script), *arguments]
+    command += ["--cache-dir", cache] if warm else ["--no-cache"]
+    shutil.rmtree(cache, ignore_errors=True)
+    if warm:
+        run_measured(command, os.path.join(work, "tree"), env)
+
+    samples = []
+    peak = None
+    processes: Dict[str, int] = {}
+    for _ in range(args.repeat):
+        with open(log, "w", encoding="utf-8"):
+            pass
+        seconds, code, rss = run_measured(command, os.path.join(work, "tree"), env)
+        if code not in (0, 1):
+            raise RuntimeError(f"{' '.join(command)} exited with code {code}")
+        samples.append(seconds)
+        peak = rss if peak is None or (rss is not None and rss > peak) else peak
+        processes = _count_processes(log)
+    return {
+        "name": f"{script} {'warm' if warm else 'cold'}",
+        "arguments": arguments,
+        "processes": processes,
+        "peak_rss_kib": peak,
+        **_summary(samples),
+    }
+
+
+def _git(*command: str) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", *command],
+            cwd=SCRIPT_DIR,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def _prepare_tree(args: argparse.Namespace, spec: TreeSpec, work: str) -> str:
+    """Generate the tree under work, or link the reusable --tree there."""
+    tree = os.path.join(work, "tree")
+    if args.tree is None:
+        generate_tree(spec, tree)
+        return tree
+    marker = os.path.join(args.tree, TREE_MARKER)
+    if os.path.isfile(marker):
+        with open(marker, encoding="utf-8") as handle:
+            if json.load(handle) != spec.to_dict():
+                shutil.rmtree(args.tree)
+    elif os.path.exists(args.tree) and os.listdir(args.tree):
+        raise RuntimeError(f"{args.tree} is not empty and was not generated here")
+    if not os.path.isfile(marker):
+        generate_tree(spec, args.tree)
+    os.symlink(os.path.abspath(args.tree), tree, target_is_directory=True)
+    return tree
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Generate the tree and stubs, and run every benchmark.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Returns:
+        The results document.
+    """
+    spec = TreeSpec(args)
+    work = tempfile.mkdtemp(prefix="lint-bench-")
+    try:
+        tree = _prepare_tree(args, spec, work)
+        write_stubs(os.path.join(work, "bin"))
+        results = [bench_find_files(tree, args.repeat)]
+        for script in SCRIPTS:
+            for warm in (False, True):
+                results.append(bench_command(args, work, script, warm))
+                print(f"  {results[-1]['name']}: {results[-1]['median']:.3f}s")
+        digest = tree_digest(tree)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return {
+        "format": RESULT_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--", ".")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "tree": spec.to_dict(),
+            "tree_digest": digest,
+            "jobs": args.jobs,
+            "repeat": args.repeat,
+            "latency": args.latency,
+            "file_latency": args.file_latency,
+            "lint_args": args.lint_args,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Describe how the medians changed since a baseline.
+
+    Args:
+        baseline: Earlier results document.
+        current: Results document to compare.
+
+    Returns:
+        One line per benchmark found in both documents.
+    """
+    lines = []
+    if baseline.get("settings") != current.get("settings"):
+        lines.append(
+            f"{Colors.YELLOW}Settings differ from the baseline; "
+            f"the numbers may not be comparable{Colors.RESET}"
+        )
+    before = {result["name"]: result for result in baseline.get("results", [])}
+    for result in current["results"]:
+        old = before.get(result["name"])
+        if old is None or not old["median"]:
+            continue
+        change = result["median"] / old["median"] - 1
+        color = (
+            Colors.GREEN if change <= -0.05 else Colors.RED if change >= 0.05 else ""
+        )
+        lines.append(
+            f"  {result['name']:<28} {old['median']:8.3f}s -> "
+            f"{result['median']:8.3f}s  {color}{change:+7.1%}"
+            f"{Colors.RESET if color else ''}"
+        )
+    return lines
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark discovery and linting on a generated repository"
+    )
+    parser.add_argument(
+        "--output",
+        default="bench-results.json",
+        help="Results file to write (default: bench-results.json)",
+    )
+    parser.add_argument(
+        "--baseline", metavar="FILE", help="Earlier results file to compare with"
+    )
+    parser.add_argument(
+        "--tree",
+        metavar="DIR",
+        help="Keep the generated tree here and reuse it while its settings match",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Tree seed (default: 1)")
+    parser.add_argument(
+        "--shell", type=int, default=3000, help="Shell scripts (default: 3000)"
+    )
+    parser.add_argument(
+        "--pwsh", type=int, default=1000, help="PowerShell scripts (default: 1000)"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=5, help="Source directory depth (default: 5)"
+    )
+    parser.add_argument(
+        "--noise",
+        type=int,
+        default=5000,
+        help="Scripts in node_modules and target (default: 5000)",
+    )
+    parser.add_argument(
+        "--noise-depth",
+        type=int,
+        default=12,
+        help="Depth of node_modules and target (default: 12)",
+    )
+    parser.add_argument(
+        "--chains", type=int, default=20, help="Library chains (default: 20)"
+    )
+    parser.add_argument(
+        "--chain-length",
+        type=int,
+        default=8,
+        help="Libraries per chain (default: 8)",
+    )
+    parser.add_argument(
+        "--issues",
+        type=float,
+        default=0.05,
+        help="Fraction of scripts with a finding (default: 0.05)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Stub start-up time per process, in seconds (default: 0)",
+    )
+    parser.add_argument(
+        "--file-latency",
+        type=float,
+        default=0.0,
+        help="Stub time per file checked, in seconds (default: 0)",
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=4, help="Linter --jobs (default: 4)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per benchmark (default: 3)"
+    )
+    parser.add_argument(
+        "--lint-args",
+        nargs=argparse.REMAINDER,
+        default=[],
+        help="Further arguments for every linter run, such as --stream",
+    )
+    return parser
+
+
+def main() -> None:
+    """Run the benchmarks and write the results."""
+    args = build_parser().parse_args()
+    if args.repeat < 1:
+        print(f"{Colors.RED}[FAIL] --repeat must be at least 1{Colors.RESET}")
+        sys.exit(2)
+    print("Running benchmarks...")
+    try:
+        results = run_benchmarks(args)
+    except (OSError, RuntimeError) as exc:
+        print(f"{Colors.RED}[FAIL] {exc}{Colors.RESET}")
+        sys.exit(2)
+    if not write_json_atomic(args.output, results):
+        print(f"{Colors.RED}[FAIL] Could not write {args.output}{Colors.RESET}")
+        sys.exit(2)
+    print(f"{Colors.GREEN}[OK] Results written to {args.output}{Colors.RESET}")
+    if args.baseline:
+        baseline = read_json(args.baseline)
+        if not isinstance(baseline, dict) or baseline.get("format") != RESULT_FORMAT:
+            print(
+                f"{Colors.RED}[FAIL] {args.baseline} is not a results file{Colors.RESET}"
+            )
+            sys.exit(2)
+        print(f"\nCompared with {args.baseline}:")
+        print("\n".join(compare(baseline, results)))
+
+
+if __name__ == "__main__":
+    main()
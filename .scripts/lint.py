@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Run every script linter in one pass.
+
+Runs every linter registered by the *lint.py scripts in this directory
+(shlint.py and pwshlint.py). Their scripts are discovered in a single walk
+and linted on one shared worker pool, with each linter's results reported
+in turn and one combined exit code. Accepts the same options as shlint.py
+and pwshlint.py.
+"""
+
+import os
+import sys
+
+# Add the current directory to sys.path to allow importing pylib
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from pylib.driver import (  # noqa: E402  # pylint: disable=wrong-import-position
+    LintDriver,
+    load_linters,
+)
+
+if __name__ == "__main__":
+    LintDriver(load_linters(SCRIPT_DIR)).run()
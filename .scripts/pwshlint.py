@@ -3,30 +3,107 @@
 
 This script provides a Python interface to PSScriptAnalyzer with consistent
 output formatting and optional auto-fix support.
+
+Analysis runs in long-lived pwsh workers (one per lint thread) that load
+PSScriptAnalyzer and the settings file once and stream diagnostics back as
+JSON, stopping early once --max-diagnostics have been seen.
 """
 
 import os
-import shutil
-import subprocess
 import sys
+from typing import Any, Dict, List, Optional, Tuple
 
 # Add the current directory to sys.path to allow importing pylib
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, SCRIPT_DIR)
 
-from pylib.linter import Colors, Linter  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.cache import settings_digest  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.driver import register  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.linter import Colors, Linter, LintResult  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.process import LIMITS, run_process  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.pwsh_host import (  # noqa: E402  # pylint: disable=wrong-import-position
+    PwshHostError,
+    PwshHostPool,
+    PwshHostTimeout,
+)
+from pylib.report import Diagnostic  # noqa: E402  # pylint: disable=wrong-import-position
+
+# Prints "<version><TAB><module directory>" for the newest installed
+# PSScriptAnalyzer, or nothing
+VERSION_CMD = (
+    "Get-Module -ListAvailable -Name PSScriptAnalyzer | "
+    "Sort-Object Version -Descending | Select-Object -First 1 | "
+    'ForEach-Object { "$($_.Version)`t$($_.ModuleBase)" }'
+)
+
+
+def _probe_analyzer(executable: str) -> Optional[Tuple[str, List[str]]]:
+    """Ask pwsh for the installed PSScriptAnalyzer version and location.
+
+    The module directory and its parent are recorded as dependencies, so
+    installing or removing a module version invalidates the stamp.
+    """
+    try:
+        result = run_process(
+            [executable, "-NoProfile", "-Command", VERSION_CMD], text=True
+        )
+    except OSError:
+        return None
+    output = result.stdout.strip()
+    if result.returncode != 0 or not output:
+        return None
+    version, _, module_base = output.splitlines()[0].partition("\t")
+    depends = [module_base, os.path.dirname(module_base)] if module_base else []
+    return version, depends
+
+
+TABLE_COLUMNS = [("Line", "line"), ("Severity", "severity"), ("RuleName", "rule")]
+
 
+def render_table(diagnostics: List[Dict[str, Any]]) -> str:
+    """Render diagnostics like Format-Table with Line, Severity, RuleName, Message.
 
+    Args:
+        diagnostics: Diagnostic objects returned by the pwsh worker.
+
+    Returns:
+        Table text.
+    """
+    rows = sorted(diagnostics, key=lambda d: (d.get("line") or 0, d.get("column") or 0))
+    widths = [
+        max([len(title)] + [len(str(row.get(key, ""))) for row in rows])
+        for title, key in TABLE_COLUMNS
+    ]
+    header = [
+        title.ljust(width)
+        for (title, _), width in zip(TABLE_COLUMNS, widths, strict=True)
+    ]
+    lines = [
+        " ".join(header + ["Message"]),
+        " ".join(["-" * width for width in widths] + ["-------"]),
+    ]
+    for row in rows:
+        cells = [str(row.get("line", "")).rjust(widths[0])]
+        cells += [
+            str(row.get(key, "")).ljust(width)
+            for (_, key), width in zip(TABLE_COLUMNS[1:], widths[1:], strict=True)
+        ]
+        lines.append(" ".join(cells + [str(row.get("message", ""))]))
+    return "\n".join(lines)
+
+
+@register
 class PwshLinter(Linter):
     """Linter for PowerShell scripts using PSScriptAnalyzer."""
 
     def __init__(self):
         """Initialize the PSScriptAnalyzer linter."""
-        super().__init__("PSScriptAnalyzer", "**/*.ps1")
+        super().__init__("PSScriptAnalyzer", "**/*.ps1", ["pwsh", "powershell"])
+        self._hosts: Optional[PwshHostPool] = None
 
     def check_installed(self) -> None:
         """Verify that PowerShell and PSScriptAnalyzer are installed."""
-        if not shutil.which("pwsh"):
+        if not self.toolchain.which("pwsh"):
             print(
                 f"{Colors.RED}[FAIL] PowerShell (pwsh) is not installed{Colors.RESET}"
             )
@@ -35,28 +112,20 @@ class PwshLinter(Linter):
         self._ensure_psscriptanalyzer()
 
     def _ensure_psscriptanalyzer(self) -> None:
-        """Ensure PSScriptAnalyzer module is installed."""
-        check_cmd = "Get-Module -ListAvailable -Name PSScriptAnalyzer"
-        result = subprocess.run(
-            ["pwsh", "-Command", check_cmd],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        """Ensure PSScriptAnalyzer module is installed and record its version."""
+        version = self.toolchain.probe("psscriptanalyzer", "pwsh", _probe_analyzer)
 
-        if result.returncode != 0 or not result.stdout.strip():
+        if version is None:
             print(f"{Colors.YELLOW}Installing PSScriptAnalyzer...{Colors.RESET}")
             install_cmd = (
                 "Install-Module -Name PSScriptAnalyzer -Force "
                 "-Scope CurrentUser -SkipPublisherCheck -ErrorAction Stop"
             )
-            install_res = subprocess.run(
-                ["pwsh", "-Command", install_cmd],
-                capture_output=True,
-                text=True,
-                check=False,
+            install_res = run_process(["pwsh", "-Command", install_cmd], text=True)
+            version = self.toolchain.probe(
+                "psscriptanalyzer", "pwsh", _probe_analyzer, refresh=True
             )
-            if install_res.returncode != 0:
+            if install_res.returncode != 0 or version is None:
                 print(
                     f"{Colors.RED}[FAIL] Failed to install PSScriptAnalyzer: "
                     f"{install_res.stderr}{Colors.RESET}"
@@ -66,81 +135,125 @@ class PwshLinter(Linter):
                 f"{Colors.GREEN}[OK] PSScriptAnalyzer installed successfully{Colors.RESET}"
             )
 
-    def _get_settings_arg(self) -> str:
-        """Get the settings file argument if it exists.
+        self.tool_version = version
 
-        Returns:
-            Settings argument string or empty string.
-        """
+    def _settings_file(self) -> str:
+        """Get the path of the repository's PSScriptAnalyzer settings file."""
         root_dir = os.path.dirname(SCRIPT_DIR)
-        settings_file = os.path.join(root_dir, ".PSScriptAnalyzerSettings.psd1")
-        if os.path.exists(settings_file):
-            return f"-Settings '{settings_file}'"
-        return ""
+        return os.path.join(root_dir, ".PSScriptAnalyzerSettings.psd1")
+
+    def cache_context(self) -> List[str]:
+        """Return the PSScriptAnalyzer version and settings file digest."""
+        return [
+            self.name,
+            self.tool_version,
+            settings_digest(self._settings_file()),
+        ]
+
+    def _host_pool(self) -> PwshHostPool:
+        """Return the worker pool, creating it on first use."""
+        if self._hosts is None:
+            settings_file = self._settings_file()
+            self._hosts = PwshHostPool(
+                settings_file if os.path.exists(settings_file) else None
+            )
+        return self._hosts
 
-    def lint_file(self, file_path: str, fix: bool) -> bool:
+    def close(self) -> None:
+        """Stop the pwsh workers."""
+        if self._hosts is not None:
+            self._hosts.close()
+            self._hosts = None
+
+    def lint_file(self, file_path: str) -> LintResult:
         """Lint a PowerShell script using PSScriptAnalyzer.
 
         Args:
             file_path: Path to the PowerShell script to lint.
-            fix: Whether to attempt automatic fixes.
 
         Returns:
-            True if issues were found, False otherwise.
+            The lint result, with the analyzer's diagnostics as a table.
         """
-        settings_arg = self._get_settings_arg()
+        if not os.path.splitext(file_path)[1]:
+            # Scripts found by their #! line; -Path only takes PowerShell extensions
+            try:
+                with open(file_path, encoding="utf-8-sig", errors="replace") as handle:
+                    script = handle.read()
+            except OSError as exc:
+                return LintResult(True, f"PSScriptAnalyzer failed: {exc}")
+            return self._analyze(file_path, script)
+        return self._analyze(file_path)
 
-        if fix:
-            self._try_fix(file_path, settings_arg)
+    def lint_source(self, file_path: str, source: bytes) -> LintResult:
+        """Lint in-memory script content using PSScriptAnalyzer.
 
-        # Check for issues
-        cmd = (
-            f"Invoke-ScriptAnalyzer -Path '{file_path}' {settings_arg} "
-            "-ErrorAction SilentlyContinue | "
-            "Format-Table -Property Line, Severity, RuleName, Message -AutoSize | "
-            "Out-String -Width 4096"
-        )
+        Args:
+            file_path: Path the content belongs to, for reporting.
+            source: Script content.
 
-        result = subprocess.run(
-            ["pwsh", "-Command", cmd],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        Returns:
+            The lint result, with the analyzer's diagnostics as a table.
+        """
+        return self._analyze(file_path, source.decode("utf-8-sig", "replace"))
 
-        output = result.stdout.strip()
-        if result.returncode == 0 and output:
-            print(f"{Colors.WHITE}{file_path}{Colors.RESET}")
-            print(output)
-            return True
+    def _analyze(self, file_path: str, script: Optional[str] = None) -> LintResult:
+        """Analyze a script file, or the given script text, in a worker."""
+        limit = LIMITS.diagnostics
+        try:
+            # One more than are kept tells whether any were left out
+            with self._host_pool().host() as host:
+                diagnostics = host.request(
+                    "analyze", file_path, script, None if limit is None else limit + 1
+                )
+        except PwshHostTimeout as exc:
+            return LintResult(True, str(exc), timed_out=True)
+        except PwshHostError as exc:
+            return LintResult(True, f"PSScriptAnalyzer failed: {exc}")
 
-        print(f"{Colors.GRAY}  OK: {file_path}{Colors.RESET}")
-        return False
+        truncated = limit is not None and len(diagnostics) > limit
+        if truncated:
+            diagnostics = diagnostics[:limit]
+        if diagnostics:
+            return LintResult(
+                True,
+                render_table(diagnostics),
+                fixable=any(d.get("fixable") for d in diagnostics),
+                diagnostics=[
+                    Diagnostic(
+                        d["line"],
+                        d["column"],
+                        d["severity"],
+                        d["rule"],
+                        d["message"],
+                        d.get("end_line"),
+                        d.get("end_column"),
+                        bool(d.get("fixable")),
+                    )
+                    for d in diagnostics
+                ],
+                truncated=truncated,
+            )
 
-    def _try_fix(self, file_path: str, settings_arg: str) -> None:
+        return LintResult(False)
+
+    def fix_file(self, file_path: str) -> List[str]:
         """Attempt to apply PSScriptAnalyzer fixes.
 
         Args:
             file_path: Path to the file to fix.
-            settings_arg: Settings file argument string.
-        """
-        cmd = (
-            f"Invoke-ScriptAnalyzer -Path '{file_path}' -Fix {settings_arg} "
-            "-ErrorAction SilentlyContinue"
-        )
 
+        Returns:
+            Messages describing the fix attempt.
+        """
         try:
-            subprocess.run(
-                ["pwsh", "-Command", cmd],
-                capture_output=True,
-                text=True,
-                check=False,
-            )
-        except OSError as exc:
-            print(
+            with self._host_pool().host() as host:
+                host.request("fix", file_path)
+        except PwshHostError as exc:
+            return [
                 f"{Colors.YELLOW}  Warning: Error during fix for {file_path}: "
                 f"{exc}{Colors.RESET}"
-            )
+            ]
+        return []
 
 
 if __name__ == "__main__":
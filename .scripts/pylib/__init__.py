@@ -4,7 +4,25 @@ This package provides common abstractions and utilities for building
 consistent file linters.
 """
 
-from .file_finder import find_files
-from .linter import Colors, Linter
+from .file_finder import (
+    find_changed_files,
+    find_files,
+    find_git_files,
+    find_staged_files,
+    iter_files,
+)
+from .linter import Colors, Linter, LintResult
+from .report import Diagnostic, Reporter
 
-__all__ = ["Colors", "Linter", "find_files"]
+__all__ = [
+    "Colors",
+    "Diagnostic",
+    "LintResult",
+    "Linter",
+    "Reporter",
+    "find_changed_files",
+    "find_files",
+    "find_git_files",
+    "find_staged_files",
+    "iter_files",
+]
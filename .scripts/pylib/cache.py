@@ -0,0 +1,308 @@
+"""Persistent result cache for linters.
+
+Results are keyed by the SHA-256 of a file's content combined with the
+file's path and a context digest (tool version, settings file contents,
+tool flags), so any change to the file or to the configuration misses the
+cache. The path is part of the key because results name the file and the
+tools resolve sourced files relative to it. A per-path
+stat record (mtime, size, inode) lets unchanged files skip re-hashing.
+The cache is a single JSON file, bounded by an entry count with least
+recently used entries evicted first. It also remembers how long each file
+took to lint, which the scheduler uses to start the slowest work first.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CACHE_FORMAT = 4
+DEFAULT_CACHE_DIR = os.path.join(".cache", "lint")
+DEFAULT_MAX_ENTRIES = 10000
+
+# Weight of the newest measurement in a file's recorded lint duration
+DURATION_WEIGHT = 0.5
+
+# Stat records newer than this are re-hashed, since a write within the same
+# timestamp tick would not change mtime ("racy" entries, as in git).
+RACY_WINDOW_NS = 2_000_000_000
+
+StatKey = Tuple[int, int, int]
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        Hex digest string.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_digest(path: str) -> str:
+    """Return a digest of a settings file, or a marker if it does not exist.
+
+    Args:
+        path: Path to the settings file.
+
+    Returns:
+        String suitable for inclusion in a cache context.
+    """
+    try:
+        return f"{path}:{file_digest(path)}"
+    except OSError:
+        return f"{path}:missing"
+
+
+def read_json(path: str) -> Any:
+    """Read a JSON file, returning None if it is missing or invalid.
+
+    Args:
+        path: Path to the JSON file.
+
+    Returns:
+        The decoded value, or None.
+    """
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_atomic(path: str, data: Any) -> bool:
+    """Write JSON to a temporary file and rename it over path.
+
+    Args:
+        path: Destination path; parent directories are created.
+        data: JSON-serializable value.
+
+    Returns:
+        True if the file was written, False on I/O errors.
+    """
+    directory = os.path.dirname(path) or os.curdir
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        return False
+    return True
+
+
+def file_stat_key(path: str) -> StatKey:
+    """Return (mtime_ns, size, inode), which changes when a file is rewritten."""
+    info = os.stat(path)
+    return info.st_mtime_ns, info.st_size, info.st_ino
+
+
+def context_digest(context: List[str]) -> str:
+    """Return the key prefix for results produced under a lint configuration."""
+    return hashlib.sha256("\0".join(context).encode()).hexdigest()
+
+
+class _Tables:
+    """Contents of a cache file, each table in least recently used order.
+
+    Attributes:
+        results: Result payloads by result key.
+        stats: [mtime, size, inode, digest, recorded at] by absolute path.
+        durations: Lint durations in seconds by absolute path.
+    """
+
+    __slots__ = ("results", "stats", "durations")
+
+    def __init__(self, data: Any = None):
+        if not isinstance(data, dict) or data.get("format") != CACHE_FORMAT:
+            data = {}
+        self.results: Dict[str, Dict[str, Any]] = data.get("results", {})
+        self.stats: Dict[str, List[Any]] = data.get("stats", {})
+        self.durations: Dict[str, float] = data.get("durations", {})
+
+    def evict(self, max_entries: int) -> None:
+        """Drop least recently used entries over the cap from every table."""
+        for table in (self.results, self.stats, self.durations):
+            excess = len(table) - max_entries
+            if excess > 0:
+                for key in list(table)[:excess]:
+                    del table[key]
+
+    def to_data(self) -> Dict[str, Any]:
+        """Return the contents in cache file form."""
+        return {
+            "format": CACHE_FORMAT,
+            "results": self.results,
+            "stats": self.stats,
+            "durations": self.durations,
+        }
+
+
+class ResultCache:
+    """On-disk cache of per-file lint results.
+
+    Payloads are arbitrary JSON-serializable dicts supplied by the linter.
+    Lookups and stores are thread-safe.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        context: List[str],
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """Load the cache file if present.
+
+        Args:
+            path: Location of the cache file.
+            context: Values that invalidate every cached result when changed.
+            max_entries: Maximum number of results kept on disk.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.context = context_digest(context)
+        self.tables = _Tables(read_json(path))
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _digest(self, file_path: str) -> Tuple[StatKey, str]:
+        """Return the stat key and content digest, hashing only if needed."""
+        key = os.path.abspath(file_path)
+        stat_key = file_stat_key(file_path)
+        record = self.tables.stats.get(key)
+        if (
+            record is not None
+            and tuple(record[:3]) == stat_key
+            and stat_key[0] < record[4] - RACY_WINDOW_NS
+        ):
+            digest = record[3]
+            # Re-insert to keep recently seen paths at the end of the table
+            del self.tables.stats[key]
+            self.tables.stats[key] = record
+        else:
+            digest = file_digest(file_path)
+            self.tables.stats[key] = [*stat_key, digest, time.time_ns()]
+            self._dirty = True
+        return stat_key, digest
+
+    def _result_key(
+        self, file_path: str, digest: str, dependencies: Sequence[str]
+    ) -> str:
+        path = os.path.normpath(file_path)
+        if not os.path.isabs(path):
+            # Relative paths are reported as given but resolved from the cwd
+            path = f"{os.getcwd()}\0{path}"
+        if not dependencies:
+            return f"{self.context}:{path}:{digest}"
+        states = []
+        for dependency in dependencies:
+            try:
+                states.append(f"{dependency}\0{self._digest(dependency)[1]}")
+            except OSError:
+                states.append(f"{dependency}\0")
+        combined = hashlib.sha256("\n".join(states).encode()).hexdigest()
+        return f"{self.context}:{path}:{digest}:{combined}"
+
+    def get(
+        self, file_path: str, dependencies: Sequence[str] = ()
+    ) -> Optional[Dict[str, Any]]:
+        """Look up the cached result for a file.
+
+        Args:
+            file_path: Path to the file.
+            dependencies: Files the result also depends on (such as sourced
+                scripts); a change to any of them, or one of them appearing
+                or disappearing, is a miss.
+
+        Returns:
+            The stored payload, or None on a miss.
+        """
+        with self._lock:
+            try:
+                _, digest = self._digest(file_path)
+            except OSError:
+                return None
+            key = self._result_key(file_path, digest, dependencies)
+            payload = self.tables.results.pop(key, None)
+            if payload is None:
+                return None
+            # Re-insert to mark the entry as most recently used
+            self.tables.results[key] = payload
+            self._dirty = True
+            return payload
+
+    def put(
+        self,
+        file_path: str,
+        payload: Dict[str, Any],
+        dependencies: Sequence[str] = (),
+    ) -> None:
+        """Store the result for a file's current content.
+
+        The file is re-hashed only if it changed since the last lookup
+        (for example after an automatic fix).
+
+        Args:
+            file_path: Path to the file.
+            payload: JSON-serializable result data.
+            dependencies: Files the result also depends on (see get()).
+        """
+        key = os.path.abspath(file_path)
+        with self._lock:
+            try:
+                record = self.tables.stats.get(key)
+                if record is not None and tuple(record[:3]) == file_stat_key(file_path):
+                    digest = record[3]
+                else:
+                    digest = self._digest(file_path)[1]
+            except OSError:
+                return
+            result_key = self._result_key(file_path, digest, dependencies)
+            self.tables.results.pop(result_key, None)
+            self.tables.results[result_key] = payload
+            self._dirty = True
+
+    def record_duration(self, file_path: str, seconds: float) -> None:
+        """Record how long linting a file took.
+
+        The stored value is a moving average, so one slow run (a cold disk
+        cache, a busy machine) does not dominate the estimate.
+
+        Args:
+            file_path: Path to the file.
+            seconds: Measured duration.
+        """
+        key = os.path.abspath(file_path)
+        with self._lock:
+            previous = self.tables.durations.pop(key, None)
+            if previous is not None:
+                seconds = DURATION_WEIGHT * seconds + (1 - DURATION_WEIGHT) * previous
+            self.tables.durations[key] = seconds
+            self._dirty = True
+
+    def duration(self, file_path: str) -> Optional[float]:
+        """Return the recorded lint duration of a file in seconds, or None."""
+        return self.tables.durations.get(os.path.abspath(file_path))
+
+    def save(self) -> None:
+        """Write the cache to disk atomically if it changed."""
+        if not self._dirty:
+            return
+        self.tables.evict(self.max_entries)
+        if write_json_atomic(self.path, self.tables.to_data()):
+            self._dirty = False
@@ -0,0 +1,306 @@
+"""Resident lint daemon and its thin client.
+
+Every linter run pays interpreter start-up, the toolchain check, file
+discovery and, for PowerShell, starting pwsh and importing
+PSScriptAnalyzer. Started with --daemon, a linter instead stays resident
+and serves requests on a Unix domain socket in the cache directory. It
+keeps the result cache in memory, the tool workers running and discovery
+results indexed (invalidated through inotify). A linter run without
+--daemon first offers its command line to a running daemon and streams
+back the output and exit code. It runs in-process when no daemon answers.
+
+Protocol: the client sends one JSON line
+``{"linters": [...], "argv": [...], "cwd": "..."}``; the daemon answers
+with JSON lines ``{"stream": "out"|"err", "text": "..."}`` and a final
+``{"exit": code}``, where a null code asks the client to run in-process.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from .file_finder import DiscoveryIndex, ignore_rules
+from .timing import TRACER
+from .watch import InotifyWatcher
+
+SOCKET_FILE = "daemon.sock"
+
+# Runs one request's command line, exiting like the linter script would
+Handler = Callable[[List[str]], None]
+
+
+def socket_path(cache_dir: str) -> str:
+    """Return the daemon socket location for a cache directory."""
+    return os.path.join(cache_dir, SOCKET_FILE)
+
+
+def forward(path: str, linters: List[str], argv: List[str]) -> Optional[int]:
+    """Run a command line on the daemon, streaming its output.
+
+    Args:
+        path: Daemon socket.
+        linters: Names of the linters the command runs.
+        argv: Command-line arguments, without the program name.
+
+    Returns:
+        The exit code, or None if no daemon handled the request.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    request = {"linters": linters, "argv": argv, "cwd": os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+            client.sendall(json.dumps(request).encode() + b"\n")
+        except OSError:
+            return None
+        answered = False
+        for line in client.makefile("rb"):
+            message = json.loads(line)
+            if "exit" in message:
+                return message["exit"]
+            stream = sys.stdout if message["stream"] == "out" else sys.stderr
+            stream.write(message["text"])
+            stream.flush()
+            answered = True
+    if not answered:
+        return None
+    print("Lint daemon closed the connection", file=sys.stderr)
+    return 2
+
+
+class _Channel:
+    """Text stream forwarding writes to the client as JSON lines."""
+
+    def __init__(self, connection: socket.socket, name: str):
+        self._connection = connection
+        self._name = name
+        self._broken = False
+
+    def write(self, text: str) -> int:
+        """Send text to the client, unless it has disconnected."""
+        if text and not self._broken:
+            message = json.dumps({"stream": self._name, "text": text})
+            try:
+                self._connection.sendall(message.encode() + b"\n")
+            except OSError:
+                # The client went away; finish the request quietly
+                self._broken = True
+        return len(text)
+
+    def flush(self) -> None:
+        """Writes are sent immediately."""
+
+    def isatty(self) -> bool:
+        """The client's terminal is not known."""
+        return False
+
+
+class _Shutdown(BaseException):
+    """Raised by the signal handler to stop serving."""
+
+
+def _exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _parse_request(line: bytes) -> Optional[Dict[str, Any]]:
+    """Decode a request line, or return None if it is malformed."""
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(request, dict) or not isinstance(request.get("cwd"), str):
+        return None
+    for key in ("linters", "argv"):
+        value = request.get(key)
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            return None
+    return request
+
+
+class LintDaemon:
+    """Serves lint requests for a fixed set of linters."""
+
+    def __init__(self, path: str, handlers: Dict[FrozenSet[str], Handler]):
+        """Initialize the daemon.
+
+        Args:
+            path: Socket to listen on.
+            handlers: Request handlers by the set of linter names they run.
+        """
+        self.path = path
+        self.handlers = handlers
+        self.index: Optional[DiscoveryIndex] = None
+        self._watcher: Optional[InotifyWatcher] = None
+        self._overflows = 0
+
+    def start_index(self) -> Optional[DiscoveryIndex]:
+        """Index discovery results, if inotify can keep them current.
+
+        Returns:
+            The discovery index, or None when inotify is unavailable.
+        """
+        try:
+            self._watcher = InotifyWatcher([os.curdir], ignore_rules(None))
+        except (OSError, AttributeError):
+            return None
+        self.index = DiscoveryIndex()
+        return self.index
+
+    def _refresh_index(self) -> None:
+        """Apply the file changes queued since the last request."""
+        if self._watcher is None or self.index is None:
+            return
+        while True:
+            changed = self._watcher.poll(0)
+            if self._watcher.overflows != self._overflows:
+                # Events were dropped, so deletions may be missing
+                self._overflows = self._watcher.overflows
+                self.index.clear()
+            if not changed:
+                return
+            self.index.changed(changed)
+
+    def _handle(self, connection: socket.socket) -> None:
+        request = _parse_request(connection.makefile("rb").readline())
+        if request is None:
+            with contextlib.suppress(OSError):
+                _Channel(connection, "err").write("Malformed lint daemon request\n")
+                connection.sendall(json.dumps({"exit": 2}).encode() + b"\n")
+            return
+        handler = None
+        if os.path.realpath(request["cwd"]) == os.path.realpath(os.curdir):
+            handler = self.handlers.get(frozenset(request["linters"]))
+        if handler is None:
+            with contextlib.suppress(OSError):
+                connection.sendall(json.dumps({"exit": None}).encode() + b"\n")
+            return
+
+        self._refresh_index()
+        TRACER.reset()
+        code = 0
+        out, err = _Channel(connection, "out"), _Channel(connection, "err")
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                handler(request["argv"])
+            except SystemExit as exc:
+                code = _exit_code(exc)
+            except Exception:  # pylint: disable=broad-exception-caught
+                traceback.print_exc()
+                code = 2
+        with contextlib.suppress(OSError):
+            connection.sendall(json.dumps({"exit": code}).encode() + b"\n")
+
+    def _claim_socket(self) -> bool:
+        """Remove a stale socket; return False if a daemon is listening."""
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+            return True
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+                return True
+        return False
+
+    def serve(self) -> int:
+        """Serve requests, one at a time, until interrupted or terminated.
+
+        Returns:
+            Exit code: 0 after a clean shutdown, 2 if another daemon is
+            already serving this directory or sockets are unsupported.
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            print("Unix domain sockets are not supported on this platform")
+            return 2
+        if not self._claim_socket():
+            print(f"A lint daemon is already listening on {self.path}")
+            return 2
+
+        def shutdown(*_: Any) -> None:
+            raise _Shutdown()
+
+        previous = signal.signal(signal.SIGTERM, shutdown)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.path)
+            server.listen(8)
+            print(f"Lint daemon listening on {self.path}", flush=True)
+            try:
+                while True:
+                    connection = server.accept()[0]
+                    with connection:
+                        self._handle(connection)
+            except (KeyboardInterrupt, _Shutdown):
+                pass
+            finally:
+                signal.signal(signal.SIGTERM, previous)
+                with contextlib.suppress(OSError):
+                    os.unlink(self.path)
+                if self._watcher is not None:
+                    self._watcher.close()
+        return 0
+
+
+def serve_linters(
+    cache_dir: str,
+    linters: List[Any],
+    handlers: Dict[FrozenSet[str], Handler],
+    parsers: List[Any],
+) -> int:
+    """Keep linters resident and serve requests for them.
+
+    Args:
+        cache_dir: Cache directory holding the socket.
+        linters: Linter instances to keep warm between requests.
+        handlers: Request handlers by the set of linter names they run.
+        parsers: Argument parsers of the handlers, given the discovery index.
+
+    Returns:
+        The daemon's exit code.
+    """
+    daemon = LintDaemon(socket_path(cache_dir), handlers)
+    index = daemon.start_index()
+    for parser in parsers:
+        parser.set_defaults(discovery_index=index)
+    for linter in linters:
+        linter.resident = True
+    try:
+        return daemon.serve()
+    finally:
+        for linter in linters:
+            linter.resident = False
+            linter.complete()
+
+
+def delegate(
+    args: argparse.Namespace, linters: List[str], argv: Optional[List[str]]
+) -> None:
+    """Hand the run to a lint daemon serving this directory, if there is one.
+
+    Exits with the daemon's status code when it handled the run.
+
+    Args:
+        args: Parsed command-line arguments.
+        linters: Names of the linters the run uses.
+        argv: Command-line arguments (default: sys.argv[1:]).
+    """
+    if args.no_daemon or args.watch:
+        return
+    code = forward(
+        socket_path(args.cache_dir), linters, sys.argv[1:] if argv is None else argv
+    )
+    if code is not None:
+        sys.exit(code)
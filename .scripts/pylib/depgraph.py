@@ -0,0 +1,134 @@
+"""Persisted dependency graph between linted files.
+
+Some tools read more than the file they are given: ``shellcheck -x``
+follows ``source`` commands, so a script's result also depends on the
+libraries it sources. The graph records each file's direct dependencies as
+reported by a linter-supplied parser, keyed by the file's stat signature so
+a file is re-parsed only after it changes, and is saved next to the result
+cache. Its transitive closures key cached results (see ResultCache.get) and
+tell watch mode which files to re-lint when a library changes.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import RACY_WINDOW_NS, file_stat_key, read_json, write_json_atomic
+
+GRAPH_FORMAT = 1
+
+# Returns the paths a file depends on, or an empty set
+Parser = Callable[[str], Set[str]]
+
+
+class DependencyGraph:
+    """Direct dependencies per file, parsed on demand and cached by stat.
+
+    Paths are stored and returned absolute. Lookups are thread-safe.
+    """
+
+    def __init__(self, parse: Parser, path: Optional[str] = None):
+        """Load the saved graph if present.
+
+        Args:
+            parse: Returns the direct dependencies of a file.
+            path: Location of the graph file, or None to keep it in memory.
+        """
+        self.path = path
+        self._parse = parse
+        # abspath -> [mtime_ns, size, inode, parsed at (ns), [dependencies]]
+        self._nodes: Dict[str, List[Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        data = read_json(path) if path else None
+        if isinstance(data, dict) and data.get("format") == GRAPH_FORMAT:
+            self._nodes = data.get("nodes", {})
+
+    def direct(self, file_path: str) -> List[str]:
+        """Return the direct dependencies of a file.
+
+        Args:
+            file_path: Path to the file.
+
+        Returns:
+            Sorted absolute paths; empty if the file cannot be read.
+        """
+        key = os.path.abspath(file_path)
+        try:
+            stat_key = file_stat_key(key)
+        except OSError:
+            return []
+        with self._lock:
+            node = self._nodes.get(key)
+        # Entries parsed within the racy window may predate a same-tick write
+        if (
+            node is not None
+            and tuple(node[:3]) == stat_key
+            and stat_key[0] < node[3] - RACY_WINDOW_NS
+        ):
+            return node[4]
+        parsed_at = time.time_ns()
+        dependencies = sorted(
+            {os.path.abspath(path) for path in self._parse(key)} - {key}
+        )
+        with self._lock:
+            self._nodes[key] = [*stat_key, parsed_at, dependencies]
+            self._dirty = True
+        return dependencies
+
+    def closure(self, file_path: str) -> List[str]:
+        """Return every file a file depends on, directly or not.
+
+        Missing files are included, since creating one changes the result.
+
+        Args:
+            file_path: Path to the file.
+
+        Returns:
+            Sorted absolute paths, excluding the file itself.
+        """
+        root = os.path.abspath(file_path)
+        found: Set[str] = set()
+        pending = [root]
+        while pending:
+            for dependency in self.direct(pending.pop()):
+                if dependency not in found and dependency != root:
+                    found.add(dependency)
+                    pending.append(dependency)
+        return sorted(found)
+
+    def save(self) -> None:
+        """Write the graph to disk if it changed, dropping deleted files."""
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            nodes = {
+                path: node for path, node in self._nodes.items() if os.path.exists(path)
+            }
+            self._nodes = nodes
+            self._dirty = False
+        write_json_atomic(self.path, {"format": GRAPH_FORMAT, "nodes": nodes})
+
+
+def group_by_dependencies(
+    file_paths: Iterable[str], dependencies: Callable[[str], List[str]]
+) -> List[List[str]]:
+    """Group files that have the same dependencies.
+
+    Batches built from whole groups contain every user of a library, so the
+    tool reads the library once per batch rather than once for each batch a
+    user happens to land in.
+
+    Args:
+        file_paths: Paths to group.
+        dependencies: Returns the sorted dependencies of a file.
+
+    Returns:
+        Groups of paths, each in the original order; files without
+        dependencies form the first group.
+    """
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for file_path in file_paths:
+        groups.setdefault(tuple(dependencies(file_path)), []).append(file_path)
+    return [groups[key] for key in sorted(groups)]
@@ -0,0 +1,174 @@
+"""Finding the files a lint run covers.
+
+Files come from the filesystem walk, the git index or git's list of
+changes, as the command-line arguments ask, and are split between linters
+by pattern and, with --shebang, by #! line. With --stream the walk is
+consumed in parts, so linting can start before the last directory has
+been listed.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .file_finder import (
+    SNIFF_FILE,
+    ShebangSniffer,
+    filter_files,
+    find_changed_files,
+    find_files,
+    find_git_files,
+    find_staged_files,
+    iter_files,
+    select_scripts,
+    sniff_patterns,
+)
+from .report import Colors
+from .shard import select_shard
+
+# Files handed to the linters at once with --stream. The size doubles after
+# every part, so the first files start at once and a large tree still
+# needs few tool invocations.
+STREAM_FIRST_PART = 64
+
+# Longest a file found with --stream waits to be handed over, in seconds
+STREAM_FLUSH = 0.5
+
+
+def discover(
+    args: argparse.Namespace, patterns: List[str], interpreters: Iterable[str] = ()
+) -> List[str]:
+    """Find the files to lint according to the command-line arguments.
+
+    Exits with code 2 if git-based discovery fails. With --shard, only the
+    files of the selected shard are returned. With --shebang, extensionless
+    files next to those patterns match are included if their #! line names
+    one of interpreters.
+
+    Args:
+        args: Parsed command-line arguments.
+        patterns: File paths or glob patterns to match.
+        interpreters: Interpreters of the scripts to include with --shebang.
+
+    Returns:
+        Sorted list of file paths.
+    """
+    interpreters = frozenset(interpreters)
+    if args.shebang and interpreters:
+        found = _find(args, [*patterns, *sniff_patterns(patterns)])
+        files = select_files(args, found, patterns, interpreters)
+        shebang_sniffer(args).save()
+    else:
+        files = _find(args, patterns)
+    if args.shard is not None:
+        return select_shard(files, args.shard, args.shard_timings)
+    return files
+
+
+def _find(args: argparse.Namespace, patterns: List[str]) -> List[str]:
+    try:
+        if args.staged:
+            return find_staged_files(patterns, args.ignore)
+        if args.changed_since:
+            return find_changed_files(
+                patterns, args.changed_since, args.ignore, args.untracked
+            )
+    except ValueError as exc:
+        print(f"{Colors.RED}[FAIL] {exc}{Colors.RESET}")
+        sys.exit(2)
+    if args.discovery == "git":
+        return find_git_files(patterns, args.ignore, args.untracked)
+    if args.discovery_index is not None:
+        return args.discovery_index.find(patterns, args.ignore)
+    return find_files(patterns, args.ignore)
+
+
+def discover_stream(
+    args: argparse.Namespace, patterns: List[str], interpreters: Iterable[str] = ()
+) -> Iterator[List[str]]:
+    """Find the files to lint in parts, as the filesystem walk finds them.
+
+    Used with --stream, which the options restrict to plain filesystem
+    discovery. Parts hold STREAM_FIRST_PART files, then twice as many each
+    time, and are handed over early if STREAM_FLUSH passes. A lint daemon
+    answers from its discovery index in one part instead.
+
+    Args:
+        args: Parsed command-line arguments.
+        patterns: File paths or glob patterns to match.
+        interpreters: Interpreters of the scripts to include with --shebang.
+
+    Yields:
+        Lists of file paths, each path in one of them, in no particular order.
+    """
+    interpreters = frozenset(interpreters)
+    if args.discovery_index is not None:
+        yield discover(args, patterns, interpreters)
+        return
+    sniffing = bool(args.shebang and interpreters)
+    found = iter_files(
+        [*patterns, *sniff_patterns(patterns)] if sniffing else patterns, args.ignore
+    )
+    for part in _parts(found):
+        yield select_files(args, part, patterns, interpreters) if sniffing else part
+    if sniffing:
+        shebang_sniffer(args).save()
+
+
+def _parts(paths: Iterator[str]) -> Iterator[List[str]]:
+    """Group paths into parts of growing size (see discover_stream())."""
+    size = STREAM_FIRST_PART
+    part: List[str] = []
+    started = time.monotonic()
+    for path in paths:
+        part.append(path)
+        if len(part) >= size or time.monotonic() - started >= STREAM_FLUSH:
+            yield part
+            size *= 2
+            part = []
+            started = time.monotonic()
+    if part:
+        yield part
+
+
+# Shebang caches by file, kept for the life of the process
+_SNIFFERS: Dict[Optional[str], ShebangSniffer] = {}
+
+
+def shebang_sniffer(args: argparse.Namespace) -> ShebangSniffer:
+    """Return the shebang cache for the cache directory in args."""
+    path = None if args.no_cache else os.path.join(args.cache_dir, SNIFF_FILE)
+    if path not in _SNIFFERS:
+        _SNIFFERS[path] = ShebangSniffer(path)
+    return _SNIFFERS[path]
+
+
+def select_files(
+    args: argparse.Namespace,
+    files: List[str],
+    patterns: List[str],
+    interpreters: Iterable[str],
+) -> List[str]:
+    """Select the discovered files a linter handles.
+
+    Args:
+        args: Parsed command-line arguments.
+        files: Normalized file paths, in order.
+        patterns: File paths or glob patterns to match.
+        interpreters: Interpreters of the scripts to include with --shebang.
+
+    Returns:
+        Files matching patterns and, with --shebang, extensionless files
+        next to them whose #! line names one of interpreters, in order.
+    """
+    interpreters = frozenset(interpreters)
+    if not (args.shebang and interpreters):
+        return filter_files(files, patterns, args.ignore)
+    candidates = filter_files(
+        files, [*patterns, *sniff_patterns(patterns)], args.ignore
+    )
+    return select_scripts(
+        candidates, patterns, interpreters, shebang_sniffer(args), args.ignore
+    )
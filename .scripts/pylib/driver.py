@@ -0,0 +1,324 @@
+"""Run several linters as one command.
+
+Running each linter script in turn walks the tree once per linter, starts a
+worker pool per linter and leaves the pool idle while the slowest tool
+finishes. The driver discovers files once, splits them between linters by
+their default patterns, and submits every linter's work to one shared pool
+before reporting, so the tools run concurrently while output stays grouped
+linter by linter. It ends with a combined summary and exit code.
+
+Linter scripts mark their Linter subclass with @register, and
+load_linters() imports every ``*lint.py`` script next to the driver
+script to collect them, so a new linter needs no change to the driver.
+"""
+
+import argparse
+import fnmatch
+import glob
+import importlib
+import os
+import sys
+from typing import Callable, Iterator, List, Optional, Set, Tuple, Type
+
+from .daemon import delegate, serve_linters
+from .discovery import discover, discover_stream, select_files, shebang_sniffer
+from .linter import (
+    Linter,
+    LintResult,
+    lint_round,
+    report_stream,
+    stream_round,
+    watch_loop,
+)
+from .options import build_parser, validate_args
+from .process import worker_pool
+from .report import REPORTERS, Reporter, status_output, write_timing
+from .shard import merge_command, record_shard
+from .timing import PHASE, TRACER, span
+
+# Linter classes collected by @register, in registration order
+LINTERS: List[Type[Linter]] = []
+
+
+def register(cls: Type[Linter]) -> Type[Linter]:
+    """Class decorator adding a linter to the ones the driver runs."""
+    if cls not in LINTERS:
+        LINTERS.append(cls)
+    return cls
+
+
+def load_linters(directory: str) -> List[Linter]:
+    """Import the linter scripts in a directory and create their linters.
+
+    Args:
+        directory: Directory holding ``*lint.py`` scripts; it must be on
+            sys.path.
+
+    Returns:
+        One instance of every registered linter, ordered by script name.
+    """
+    for path in sorted(glob.glob(os.path.join(directory, "?*lint.py"))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+    return [cls() for cls in LINTERS]
+
+
+def _named_files(
+    args: argparse.Namespace, linter: Linter, paths: List[str]
+) -> List[str]:
+    """Return the paths named on the command line that a linter handles.
+
+    A named file is routed by its own name, or with --shebang by its #!
+    line, so files the default pattern does not reach (such as those in
+    hidden directories) still go to the right linter.
+    """
+    named = {os.path.normpath(path) for path in args.files}
+    suffix = linter.default_pattern.rsplit("/", 1)[-1]
+    sniffer = shebang_sniffer(args) if args.shebang and linter.interpreters else None
+    selected = []
+    for path in paths:
+        if path not in named:
+            continue
+        name = os.path.basename(path)
+        if fnmatch.fnmatchcase(name, suffix) or (
+            sniffer is not None
+            and not os.path.splitext(name)[1]
+            and sniffer.interpreter(path) in linter.interpreters
+        ):
+            selected.append(path)
+    return selected
+
+
+class LintDriver:
+    """Runs a set of linters over a single discovery pass and worker pool."""
+
+    def __init__(self, linters: List[Linter]):
+        """Initialize the driver.
+
+        Args:
+            linters: Linters to run, in reporting order.
+        """
+        self.linters = linters
+        self.parser = build_parser("Lint files with every configured linter")
+
+    def run(self, argv: Optional[List[str]] = None) -> None:
+        """Run all linters and exit with the combined status code.
+
+        The exit code is 2 if a linter's tool is missing, 1 if any file has
+        issues and 0 otherwise. The run is handed to a lint daemon if one is
+        serving the current directory. A first argument of "merge" reports
+        the partial results of --shard runs instead.
+
+        Args:
+            argv: Command-line arguments (default: sys.argv[1:]).
+        """
+        argv = sys.argv[1:] if argv is None else argv
+        if argv[:1] == ["merge"]:
+            sys.exit(merge_command(argv[1:], LintResult.from_payload))
+        args = self.parser.parse_args(argv)
+        validate_args(self.parser, args)
+        names = [linter.name for linter in self.linters]
+        if args.daemon:
+            # The daemon also serves the single-linter scripts
+            handlers = {frozenset(names): self.serve_request}
+            for linter in self.linters:
+                handlers[frozenset([linter.name])] = linter.serve_request
+            sys.exit(
+                serve_linters(
+                    args.cache_dir,
+                    self.linters,
+                    handlers,
+                    [self.parser] + [linter.parser for linter in self.linters],
+                )
+            )
+        delegate(args, names, argv)
+        for linter in self.linters:
+            linter.configure(args)
+        TRACER.enabled = args.profile or bool(args.trace)
+        try:
+            self._execute(args)
+        finally:
+            write_timing(args)
+
+    def serve_request(self, argv: List[str]) -> None:
+        """Handle a lint daemon request."""
+        self.run([*argv, "--no-daemon"])
+
+    def _assign(
+        self, args: argparse.Namespace
+    ) -> Tuple[List[Tuple[Linter, List[str]]], bool]:
+        """Discover files once and give each linter the files it handles.
+
+        Linters whose tool is missing are left out, as are linters without
+        files unless --watch may give them some later.
+
+        Args:
+            args: Parsed command-line arguments.
+
+        Returns:
+            Tuple of ((linter, files) pairs, whether a tool was missing).
+        """
+        with span("Discovery", PHASE):
+            files = discover(
+                args,
+                args.files or [linter.default_pattern for linter in self.linters],
+                {name for linter in self.linters for name in linter.interpreters},
+            )
+        work = []
+        missing = False
+        select = self._selector(args)
+        for linter in self.linters:
+            selected = select(linter, files)
+            if not selected and not args.watch:
+                continue
+            try:
+                with span("Toolchain check", PHASE, linter=linter.name):
+                    linter.check_installed()
+            except SystemExit:
+                missing = True
+                continue
+            work.append((linter, selected))
+        return work, missing
+
+    def _installed(self) -> Tuple[List[Linter], List[Linter]]:
+        """Probe every linter's tool before a --stream run.
+
+        Returns:
+            Tuple of (linters whose tool is installed, the others).
+        """
+        installed = []
+        absent = []
+        for linter in self.linters:
+            try:
+                with span("Toolchain check", PHASE, linter=linter.name):
+                    linter.check_installed()
+            except SystemExit:
+                absent.append(linter)
+                continue
+            installed.append(linter)
+        return installed, absent
+
+    def _stream_parts(
+        self, args: argparse.Namespace, absent: List[Linter], needed: Set[str]
+    ) -> Iterator[List[str]]:
+        """Discover files in parts, noting absent linters that had files.
+
+        Args:
+            args: Parsed command-line arguments.
+            absent: Linters whose tool is missing.
+            needed: Updated with the names of absent linters given files.
+
+        Yields:
+            Lists of discovered paths, from discover_stream().
+        """
+        for part in discover_stream(
+            args,
+            args.files or [linter.default_pattern for linter in self.linters],
+            {name for linter in self.linters for name in linter.interpreters},
+        ):
+            needed.update(
+                linter.name
+                for linter in absent
+                if linter.name not in needed
+                and select_files(
+                    args, part, [linter.default_pattern], linter.interpreters
+                )
+            )
+            yield part
+
+    def _execute(self, args: argparse.Namespace) -> None:
+        """Discover, lint and report, then exit with the status code.
+
+        Args:
+            args: Parsed command-line arguments.
+        """
+        linters = {linter.name: linter for linter in self.linters}
+        reporter = record_shard(
+            args,
+            REPORTERS[args.format](),
+            lambda name, path: linters[name].duration(path),
+        )
+        if args.stream:
+            self._execute_stream(args, reporter)
+        with status_output(args):
+            work, missing = self._assign(args)
+
+        if not any(files for _, files in work) and not (work and args.watch):
+            reporter.no_files("script")
+            sys.exit(2 if missing else 0)
+
+        reporter.open()
+        with worker_pool(args.jobs) as pool:
+            try:
+                has_issues = lint_round(reporter, args, pool, work)
+                if args.watch:
+                    has_issues = watch_loop(
+                        reporter, args, pool, work, self._selector(args)
+                    )
+            finally:
+                for linter, _ in work:
+                    linter.complete()
+
+        reporter.close()
+        if missing:
+            sys.exit(2)
+        sys.exit(1 if has_issues else 0)
+
+    def _execute_stream(self, args: argparse.Namespace, reporter: Reporter) -> None:
+        """Lint files while discovery is still finding them, then exit (--stream).
+
+        Every tool is probed before the walk starts; as without --stream, a
+        missing tool only fails the run if its linter had files.
+
+        Args:
+            args: Parsed command-line arguments.
+            reporter: Destination of the results.
+        """
+        with status_output(args):
+            installed, absent = self._installed()
+        needed: Set[str] = set()
+        select = self._selector(args)
+        with worker_pool(args.jobs) as pool:
+            try:
+                with status_output(args):
+                    work = stream_round(
+                        args,
+                        pool,
+                        installed,
+                        self._stream_parts(args, absent, needed),
+                        select,
+                    )
+                if not any(files for _, files in work) and not (work and args.watch):
+                    reporter.no_files("script")
+                    sys.exit(2 if needed else 0)
+                reporter.open()
+                has_issues = report_stream(reporter, args, pool, work)
+                if args.watch:
+                    has_issues = watch_loop(reporter, args, pool, work, select)
+            finally:
+                for linter in installed:
+                    linter.complete()
+
+        reporter.close()
+        if needed:
+            sys.exit(2)
+        sys.exit(1 if has_issues else 0)
+
+    @staticmethod
+    def _selector(
+        args: argparse.Namespace,
+    ) -> Callable[[Linter, List[str]], List[str]]:
+        """Return a function giving the paths a linter handles."""
+
+        def select(linter: Linter, paths: List[str]) -> List[str]:
+            selected = select_files(
+                args, paths, [linter.default_pattern], linter.interpreters
+            )
+            if args.files:
+                named = set(_named_files(args, linter, paths))
+                matched = set(
+                    select_files(args, selected, args.files, linter.interpreters)
+                )
+                selected = [path for path in paths if path in matched or path in named]
+            return selected
+
+        return select
@@ -1,12 +1,46 @@
 """File discovery utilities for linting scripts.
 
 This module provides functions to find files matching glob patterns
-while respecting common ignore directories.
+while respecting gitignore-style ignore rules (see pylib.ignore).
+
+Discovery is done in a single ``os.scandir`` pass per pattern root: every
+pattern is compiled into a list of path-component matchers and the walker
+carries the set of partially matched patterns down the tree, so ignored
+directories (and directories no pattern can match) are never listed.
+Matching follows ``glob.glob(pattern, recursive=True)`` semantics, including
+the rule that wildcards do not match hidden (dot) names and that a pattern
+ending in a separator, such as ``**/``, matches directories only and so
+finds no files. iter_files() yields
+matches as the walk finds them, for callers that start work before it ends.
+
+Scripts without an extension, such as those in ``bin/`` or hook directories,
+can also be recognized by their ``#!`` line (see select_scripts()). Only the
+first SNIFF_BYTES of a file are read, and the interpreter found is cached by
+the file's stat signature, so later runs only stat such files.
 """
 
-import glob
+import fnmatch
 import os
-from typing import List, Optional, Set
+import re
+import threading
+import time
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from . import git_index
+from .cache import RACY_WINDOW_NS, file_stat_key, read_json, write_json_atomic
+from .ignore import IGNORE_FILES, IgnoreRules
 
 DEFAULT_IGNORES = [
     "__pycache__",
@@ -21,58 +55,760 @@ DEFAULT_IGNORES = [
     "venv",
 ]
 
+# Bytes read from a file to find its #! line
+SNIFF_BYTES = 256
+
+# Shebang cache file in the cache directory
+SNIFF_FILE = "shebangs.json"
+SNIFF_FORMAT = 1
+
+# Marker for a ``**`` path component
+_RECURSIVE = object()
+
+_MAGIC_CHARS = re.compile(r"[*?[]")
+
+
+class _Wildcard:
+    """A pattern component containing glob wildcards."""
+
+    __slots__ = ("regex", "hidden")
+
+    def __init__(self, part: str):
+        self.regex = re.compile(fnmatch.translate(os.path.normcase(part)))
+        # Like glob, wildcards only match dot names if the pattern does too
+        self.hidden = part.startswith(".")
+
+    def match(self, name: str, hidden: bool) -> bool:
+        """Check whether a (normcased) entry name matches this component."""
+        if hidden and not self.hidden:
+            return False
+        return self.regex.match(name) is not None
+
 
-def is_ignored(path: str, ignore_patterns: Set[str]) -> bool:
-    """Check if a path should be ignored based on directory patterns.
+# A compiled pattern component: a normcased literal name, a wildcard or the
+# recursive marker.
+_Component = Union[str, _Wildcard, object]
+
+# Walker state: (pattern index, component position)
+_State = Tuple[int, int]
+
+
+def _has_magic(text: str) -> bool:
+    return _MAGIC_CHARS.search(text) is not None
+
+
+def _split_pattern(pattern: str) -> Tuple[str, List[str]]:
+    """Split a glob pattern into its literal base directory and the rest.
 
     Args:
-        path: The file path to check.
-        ignore_patterns: Set of directory names to ignore.
+        pattern: Glob pattern, relative or absolute.
 
     Returns:
-        True if any path component matches an ignore pattern.
+        Tuple of (base directory, remaining path components). The base is an
+        empty string for patterns that start with a wildcard.
     """
-    parts = path.split(os.sep)
-    for part in parts:
-        if part in ignore_patterns:
-            return True
-    return False
+    drive, rest = os.path.splitdrive(pattern)
+    if os.altsep:
+        rest = rest.replace(os.altsep, os.sep)
+    anchor = drive + (os.sep if rest.startswith(os.sep) else "")
+    parts = [part for part in rest.split(os.sep) if part]
 
+    literal = 0
+    while literal < len(parts) - 1 and not _has_magic(parts[literal]):
+        literal += 1
 
-def find_files(
-    patterns: List[str], ignore_patterns: Optional[List[str]] = None
+    return os.path.join(anchor, *parts[:literal]), parts[literal:]
+
+
+def _compile_component(part: str) -> _Component:
+    if part == "**":
+        return _RECURSIVE
+    if _has_magic(part):
+        return _Wildcard(part)
+    return os.path.normcase(part)
+
+
+def _is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+class _PatternSet:
+    """A group of compiled patterns sharing the same base directory."""
+
+    def __init__(self, components: List[List[_Component]]):
+        self.components = components
+
+    def closure(self, states: FrozenSet[_State]) -> FrozenSet[_State]:
+        """Expand states so ``**`` may also match zero directories."""
+        expanded = set(states)
+        pending = list(states)
+        while pending:
+            index, pos = pending.pop()
+            comps = self.components[index]
+            if comps[pos] is _RECURSIVE and pos + 1 < len(comps):
+                nxt = (index, pos + 1)
+                if nxt not in expanded:
+                    expanded.add(nxt)
+                    pending.append(nxt)
+        return frozenset(expanded)
+
+    def initial(self) -> FrozenSet[_State]:
+        """Return the starting states for a walk at the base directory."""
+        return self.closure(
+            frozenset((i, 0) for i, comps in enumerate(self.components) if comps)
+        )
+
+    def advance(
+        self, states: FrozenSet[_State], name: str, is_dir: bool
+    ) -> Tuple[FrozenSet[_State], bool]:
+        """Feed one directory entry through the matchers.
+
+        Args:
+            states: Active states of the containing directory.
+            name: Entry name.
+            is_dir: Whether the entry is a directory.
+
+        Returns:
+            Tuple of (states to carry into the entry if it is a directory,
+            whether the entry itself matches a pattern as a file).
+        """
+        child: Set[_State] = set()
+        matched = False
+        hidden = _is_hidden(name)
+        normalized = os.path.normcase(name)
+        for index, pos in states:
+            comps = self.components[index]
+            comp = comps[pos]
+            last = pos + 1 == len(comps)
+            if comp is _RECURSIVE:
+                if hidden:
+                    continue
+                if is_dir:
+                    child.add((index, pos))
+                if last:
+                    matched = matched or not is_dir
+                continue
+            if isinstance(comp, _Wildcard):
+                if not comp.match(normalized, hidden):
+                    continue
+            elif comp != normalized:
+                continue
+            if last:
+                matched = matched or not is_dir
+            elif is_dir:
+                child.add((index, pos + 1))
+        return self.closure(frozenset(child)), matched
+
+
+def ignore_rules(ignore_patterns: Optional[List[str]]) -> IgnoreRules:
+    """Compile the default ignores and --ignore patterns, rooted here."""
+    return IgnoreRules(DEFAULT_IGNORES, ignore_patterns or [])
+
+
+def _join(directory: str, name: str) -> str:
+    return f"{directory}/{name}" if directory else name
+
+
+def _walk(base: str, patterns: _PatternSet, rules: IgnoreRules) -> Iterator[str]:
+    """Walk the tree under base yielding paths that match any pattern.
+
+    Ignored directories are decided once, before they are listed, and never
+    entered.
+
+    Args:
+        base: Directory to start from (empty string for the current one).
+        patterns: Compiled patterns relative to base.
+        rules: Ignore rules.
+
+    Yields:
+        Matching file paths, joined onto base.
+    """
+    rules, relative = rules.resolve(base or os.curdir)
+    stack = [(base, relative, patterns.initial())]
+    while stack:
+        directory, relative, states = stack.pop()
+        ignores = rules.directory(relative)
+        if ignores is None:
+            continue
+        try:
+            with os.scandir(directory or os.curdir) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    child, matched = patterns.advance(states, entry.name, is_dir)
+                    path = os.path.join(directory, entry.name)
+                    # Directories are decided by rules.directory() when popped
+                    if matched and entry.is_file():
+                        if not ignores.ignores(entry.name, False):
+                            yield path
+                    elif child and is_dir:
+                        stack.append((path, _join(relative, entry.name), child))
+        except OSError:
+            continue
+
+
+def _group_patterns(patterns: List[str]) -> Dict[str, _PatternSet]:
+    """Compile glob patterns and group them by literal base directory."""
+    grouped: Dict[str, List[List[_Component]]] = {}
+    for pattern in patterns:
+        if pattern.endswith((os.sep, os.altsep or os.sep)):
+            # Like glob, a trailing separator only matches directories
+            continue
+        base, parts = _split_pattern(pattern)
+        if parts:
+            grouped.setdefault(base, []).append(
+                [_compile_component(part) for part in parts]
+            )
+    return {base: _PatternSet(comps) for base, comps in grouped.items()}
+
+
+def _match_paths(
+    paths: Iterable[str], base: str, patterns: _PatternSet, rules: IgnoreRules
+) -> Iterator[str]:
+    """Match a list of slash-separated paths relative to base against patterns.
+
+    Directory states and ignore decisions are memoized so shared directories
+    are matched once.
+
+    Args:
+        paths: Candidate paths relative to base, using forward slashes.
+        base: Directory the paths are relative to.
+        patterns: Compiled patterns relative to base.
+        rules: Ignore rules.
+
+    Yields:
+        Matching paths, joined onto base.
+    """
+    rules, root = rules.resolve(base or os.curdir)
+    initial = patterns.initial()
+    dir_states: Dict[str, FrozenSet[_State]] = {"": initial}
+    for path in paths:
+        directory, _, name = path.rpartition("/")
+        states = dir_states.get(directory)
+        if states is None:
+            states = initial
+            walked = ""
+            for part in directory.split("/"):
+                walked = f"{walked}/{part}" if walked else part
+                cached = dir_states.get(walked)
+                if cached is None:
+                    cached = (
+                        patterns.advance(states, part, True)[0]
+                        if states
+                        else frozenset()
+                    )
+                    dir_states[walked] = cached
+                states = cached
+        if not states or not patterns.advance(states, name, False)[1]:
+            continue
+        ignores = rules.directory(_join(root, directory))
+        if ignores is not None and not ignores.ignores(name, False):
+            yield os.path.join(base, *path.split("/"))
+
+
+def _index_matches(
+    base: str,
+    patterns: _PatternSet,
+    work_tree: str,
+    candidates: List[str],
+    rules: IgnoreRules,
+) -> Iterable[str]:
+    """Match index paths under base, walking instead if base is outside."""
+    prefix = os.path.relpath(os.path.abspath(base or os.curdir), work_tree)
+    if prefix == os.pardir or prefix.startswith(os.pardir + os.sep):
+        return _walk(base, patterns, rules)
+    prefix = "" if prefix == os.curdir else prefix.replace(os.sep, "/") + "/"
+    relative = (path[len(prefix) :] for path in candidates if path.startswith(prefix))
+    return _match_paths(relative, base, patterns, rules)
+
+
+def _relative_to(path: str, base: str) -> Optional[str]:
+    """Return a normalized path relative to base, or None if it is outside."""
+    if not (os.path.isabs(path) or os.path.isabs(base)):
+        # Most discovered paths are relative to the current directory
+        base = os.path.normpath(base) if base else os.curdir
+        if base == os.curdir:
+            outside = path == os.pardir or path.startswith(os.pardir + os.sep)
+            return None if outside else path
+        if path.startswith(base + os.sep):
+            return path[len(base) + 1 :]
+    relative = os.path.relpath(path, base or os.curdir)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return None
+    return relative
+
+
+def filter_files(
+    files: List[str],
+    patterns: List[str],
+    ignore_patterns: Optional[List[str]] = None,
 ) -> List[str]:
-    """Find files matching glob patterns while ignoring specified directories.
+    """Select already discovered files that match glob patterns.
+
+    Matching follows the rules of find_files() without touching the
+    filesystem, so one discovery pass can be split between several linters.
+
+    Args:
+        files: Normalized file paths.
+        patterns: File paths or glob patterns to match.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+
+    Returns:
+        The matching files, in their original order.
+    """
+    rules = ignore_rules(ignore_patterns)
+    direct = {os.path.normpath(pattern) for pattern in patterns}
+    selected = {path for path in files if path in direct and not rules.ignored(path)}
+    for base, compiled in _group_patterns(patterns).items():
+        owners: Dict[str, str] = {}
+        candidates = []
+        for path in files:
+            relative = _relative_to(path, base)
+            if relative is not None:
+                owners[os.path.join(base, relative)] = path
+                candidates.append(relative.replace(os.sep, "/"))
+        for match in _match_paths(candidates, base, compiled, rules):
+            selected.add(owners[match])
+    return [path for path in files if path in selected]
+
+
+def pattern_roots(patterns: List[str]) -> List[str]:
+    """Return the directories files matching patterns can appear under.
+
+    Args:
+        patterns: File paths or glob patterns.
+
+    Returns:
+        Sorted existing directories, none of them inside another.
+    """
+    roots = set()
+    for pattern in patterns:
+        root = _split_pattern(pattern)[0] or os.curdir
+        # Watch the nearest existing parent of a base that is not there yet
+        while not os.path.isdir(root) and os.path.dirname(root) != root:
+            root = os.path.dirname(root) or os.curdir
+        roots.add(os.path.normpath(root))
+    result: List[str] = []
+    for root in sorted(roots, key=lambda root: (root.count(os.sep), root)):
+        if not any(_within(root, outer) for outer in result):
+            result.append(root)
+    return sorted(result)
+
+
+def _within(path: str, directory: str) -> bool:
+    relative = os.path.relpath(path, directory)
+    return relative != os.pardir and not relative.startswith(os.pardir + os.sep)
+
+
+def find_git_files(
+    patterns: List[str],
+    ignore_patterns: Optional[List[str]] = None,
+    include_untracked: bool = False,
+) -> List[str]:
+    """Find files matching glob patterns using the git index.
+
+    Candidates are the tracked files read from the index, so neither git
+    nor the filesystem walk is needed. Untracked files are only included
+    on request: git has to walk every directory that is not ignored to
+    list them, which costs about as much as find_files() itself. Falls back
+    to find_files() outside a git repository or when the index cannot be
+    read, and for patterns rooted outside the working tree.
 
     Args:
         patterns: List of file paths or glob patterns to match.
-        ignore_patterns: Additional directory names to ignore.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+        include_untracked: Whether to also run git to list untracked,
+            non-ignored files.
 
     Returns:
         Sorted list of matching file paths.
     """
-    if ignore_patterns is None:
-        ignore_patterns = []
+    repository = git_index.find_repository()
+    if repository is None or not patterns:
+        return find_files(patterns, ignore_patterns)
+    work_tree, git_dir = repository
+    try:
+        candidates = git_index.read_index(git_dir)
+    except (OSError, ValueError):
+        return find_files(patterns, ignore_patterns)
+    if include_untracked:
+        candidates.extend(git_index.list_untracked(work_tree))
+    candidates.sort()
+
+    return _match_candidates(patterns, ignore_patterns, work_tree, candidates)
 
-    all_ignores = set(DEFAULT_IGNORES + ignore_patterns)
+
+def _match_candidates(
+    patterns: List[str],
+    ignore_patterns: Optional[List[str]],
+    work_tree: str,
+    candidates: List[str],
+    existing_only: bool = True,
+) -> List[str]:
+    """Match sorted repository-relative candidate paths against patterns.
+
+    With existing_only, candidates missing from the working tree (deleted
+    but still tracked) are dropped.
+    """
+    rules = ignore_rules(ignore_patterns)
     found_files = set()
+    direct = [pattern for pattern in patterns if os.path.isfile(pattern)]
+    globs = [pattern for pattern in patterns if pattern not in direct]
+
+    for base, compiled in _group_patterns(globs).items():
+        for match in _index_matches(base, compiled, work_tree, candidates, rules):
+            # Tracked files may have been deleted from the working tree
+            if not existing_only or os.path.isfile(match):
+                found_files.add(os.path.normpath(match))
+
+    found_files.update(find_files(direct, ignore_patterns))
+    return sorted(found_files)
+
+
+def find_changed_files(
+    patterns: List[str],
+    ref: str,
+    ignore_patterns: Optional[List[str]] = None,
+    include_untracked: bool = False,
+) -> List[str]:
+    """Find files matching glob patterns that changed since a git revision.
 
-    if not patterns:
+    Only paths git reports as added or modified since the merge base of ref
+    and HEAD are matched, so the cost scales with the size of the change
+    rather than the repository. Untracked files are only included on
+    request, since listing them walks every directory that is not ignored.
+
+    Args:
+        patterns: List of file paths or glob patterns to match.
+        ref: Revision to compare against (branch, tag or commit).
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+        include_untracked: Whether to also list untracked, non-ignored files.
+
+    Returns:
+        Sorted list of matching file paths.
+
+    Raises:
+        ValueError: Outside a git repository or if ref cannot be resolved.
+    """
+    repository = git_index.find_repository()
+    if repository is None:
+        raise ValueError("--changed-since requires a git repository")
+    work_tree = repository[0]
+    candidates = git_index.list_changed(work_tree, ref)
+    if include_untracked:
+        candidates.extend(git_index.list_untracked(work_tree))
+    if not candidates or not patterns:
+        return []
+    return _match_changes(patterns, ignore_patterns, work_tree, candidates)
+
+
+def find_staged_files(
+    patterns: List[str], ignore_patterns: Optional[List[str]] = None
+) -> List[str]:
+    """Find files matching glob patterns that are staged for commit.
+
+    Args:
+        patterns: List of file paths or glob patterns to match.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+
+    Returns:
+        Sorted list of matching file paths.
+
+    Raises:
+        ValueError: Outside a git repository or if git fails.
+    """
+    repository = git_index.find_repository()
+    if repository is None:
+        raise ValueError("--staged requires a git repository")
+    work_tree = repository[0]
+    candidates = git_index.list_staged(work_tree)
+    if not candidates or not patterns:
         return []
+    # Staged content is linted from the index, so the file need not exist
+    return _match_changes(patterns, ignore_patterns, work_tree, candidates, False)
+
+
+def _match_changes(
+    patterns: List[str],
+    ignore_patterns: Optional[List[str]],
+    work_tree: str,
+    candidates: List[str],
+    existing_only: bool = True,
+) -> List[str]:
+    """Match changed paths, keeping direct file arguments only if changed."""
+    candidates.sort()
+    changed = {os.path.join(work_tree, *path.split("/")) for path in candidates}
+    patterns = [
+        pattern
+        for pattern in patterns
+        if not os.path.isfile(pattern) or os.path.abspath(pattern) in changed
+    ]
+    return _match_candidates(
+        patterns, ignore_patterns, work_tree, candidates, existing_only
+    )
 
+
+def iter_files(
+    patterns: List[str], ignore_patterns: Optional[List[str]] = None
+) -> Iterator[str]:
+    """Yield files matching glob patterns as the walk finds them.
+
+    Unlike find_files(), nothing is collected first, so callers can start
+    working on the first files while directories are still being listed.
+
+    Args:
+        patterns: List of file paths or glob patterns to match.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+
+    Yields:
+        Normalized matching file paths, each once, in no particular order.
+    """
+    rules = ignore_rules(ignore_patterns)
+    found_files: Set[str] = set()
+
+    globs = []
     for pattern in patterns:
         # If the pattern is a direct file path that exists, add it (unless ignored)
         if os.path.isfile(pattern):
-            if not is_ignored(pattern, all_ignores):
-                found_files.add(os.path.normpath(pattern))
+            path = os.path.normpath(pattern)
+            if path not in found_files and not rules.ignored(pattern):
+                found_files.add(path)
+                yield path
             continue
+        globs.append(pattern)
 
-        # Otherwise treat as glob
-        # recursive=True allows ** to match subdirectories
-        matches = glob.glob(pattern, recursive=True)
+    # Every pattern sharing a base directory is matched in the same pass, and
+    # ignored directories are pruned before they are listed.
+    for base, compiled in _group_patterns(globs).items():
+        for match in _walk(base, compiled, rules):
+            path = os.path.normpath(match)
+            if path not in found_files:
+                found_files.add(path)
+                yield path
 
-        for match in matches:
-            if os.path.isfile(match) and not is_ignored(match, all_ignores):
-                found_files.add(os.path.normpath(match))
 
-    return sorted(found_files)
+def find_files(
+    patterns: List[str], ignore_patterns: Optional[List[str]] = None
+) -> List[str]:
+    """Find files matching glob patterns while ignoring specified directories.
+
+    Args:
+        patterns: List of file paths or glob patterns to match.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+
+    Returns:
+        Sorted list of matching file paths.
+    """
+    return sorted(iter_files(patterns, ignore_patterns))
+
+
+class DiscoveryIndex:
+    """Remembered find_files() results, kept current from change events.
+
+    Used by the lint daemon: a result is reused until a file it lists is
+    deleted or a file its patterns match is created, as reported to
+    changed(). Absolute patterns and patterns leaving the current directory
+    are not remembered, since change events only cover the current tree.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self._results: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[str]] = {}
+
+    def find(
+        self, patterns: List[str], ignore_patterns: Optional[List[str]] = None
+    ) -> List[str]:
+        """Return find_files(patterns, ignore_patterns), reusing results.
+
+        Args:
+            patterns: List of file paths or glob patterns to match.
+            ignore_patterns: Additional gitignore-style patterns to ignore.
+
+        Returns:
+            Sorted list of matching file paths.
+        """
+        if any(
+            os.path.isabs(pattern) or not _within(pattern, os.curdir)
+            for pattern in patterns
+        ):
+            return find_files(patterns, ignore_patterns)
+        key = (tuple(patterns), tuple(ignore_patterns or ()))
+        if key not in self._results:
+            self._results[key] = find_files(patterns, ignore_patterns)
+        return list(self._results[key])
+
+    def changed(self, paths: Iterable[str]) -> None:
+        """Drop results that created or deleted files make stale.
+
+        Args:
+            paths: Files that changed, relative to the current directory.
+        """
+        paths = list(paths)
+        if any(os.path.basename(path) in IGNORE_FILES for path in paths):
+            # Ignore rules changed; any result may be stale
+            self._results.clear()
+            return
+        for key, files in list(self._results.items()):
+            listed = set(files)
+            appeared = [path for path in paths if path not in listed]
+            if any(path in listed and not os.path.isfile(path) for path in paths) or (
+                filter_files(
+                    [path for path in appeared if os.path.isfile(path)],
+                    list(key[0]),
+                    list(key[1]),
+                )
+            ):
+                del self._results[key]
+
+    def clear(self) -> None:
+        """Forget every result."""
+        self._results.clear()
+
+
+def read_interpreter(path: str) -> Optional[str]:
+    """Return the interpreter named by a file's ``#!`` line.
+
+    Only the first SNIFF_BYTES are read; files not starting with ``#!``,
+    binaries included, are rejected after the first two. The interpreter
+    run through ``env`` is returned rather than env itself.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        The interpreter's base name, such as "bash" or "pwsh", or None.
+    """
+    try:
+        with open(path, "rb") as handle:
+            head = handle.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    if not head.startswith(b"#!"):
+        return None
+    line = head[2:].split(b"\n", 1)[0]
+    if b"\0" in line:
+        return None
+    words = line.decode("utf-8", "replace").split()
+    if words and words[0].rsplit("/", 1)[-1] == "env":
+        # Skip env's options and variable assignments, including -S
+        words = [word for word in words[1:] if not word.startswith("-")]
+        words = [word for word in words if "=" not in word]
+    return words[0].rsplit("/", 1)[-1] if words else None
+
+
+class ShebangSniffer:
+    """Interpreters of extensionless files, cached by stat signature.
+
+    Lookups are thread-safe.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """Load the saved cache if present.
+
+        Args:
+            path: Location of the cache file, or None to keep it in memory.
+        """
+        self.path = path
+        # abspath -> [mtime_ns, size, inode, read at (ns), interpreter]
+        self._entries: Dict[str, List[Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        data = read_json(path) if path else None
+        if isinstance(data, dict) and data.get("format") == SNIFF_FORMAT:
+            self._entries = data.get("entries", {})
+
+    def interpreter(self, file_path: str) -> Optional[str]:
+        """Return the interpreter named by a file's #! line, or None."""
+        key = os.path.abspath(file_path)
+        try:
+            stat_key = file_stat_key(key)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        # Entries read within the racy window may predate a same-tick write
+        if (
+            entry is not None
+            and tuple(entry[:3]) == stat_key
+            and stat_key[0] < entry[3] - RACY_WINDOW_NS
+        ):
+            return entry[4]
+        read_at = time.time_ns()
+        interpreter = read_interpreter(key)
+        with self._lock:
+            self._entries[key] = [*stat_key, read_at, interpreter]
+            self._dirty = True
+        return interpreter
+
+    def save(self) -> None:
+        """Write the cache to disk if it changed, dropping deleted files."""
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            entries = {
+                path: entry
+                for path, entry in self._entries.items()
+                if os.path.exists(path)
+            }
+            self._entries = entries
+            self._dirty = False
+        write_json_atomic(self.path, {"format": SNIFF_FORMAT, "entries": entries})
+
+
+def _is_extensionless(path: str) -> bool:
+    return not os.path.splitext(os.path.basename(path))[1]
+
+
+def sniff_patterns(patterns: List[str]) -> List[str]:
+    """Return patterns for every file in the directories patterns cover.
+
+    The last component of each glob is replaced by ``*``, so ``**/*.sh``
+    becomes ``**/*``. Discovering these along with the patterns themselves
+    gives select_scripts() its extensionless candidates in the same pass.
+
+    Args:
+        patterns: File paths or glob patterns.
+
+    Returns:
+        Glob patterns, without duplicates; none for direct file paths.
+    """
+    sniffed: List[str] = []
+    for pattern in patterns:
+        if os.path.isfile(pattern):
+            continue
+        directory = os.path.dirname(pattern)
+        candidate = os.path.join(directory, "*") if directory else "*"
+        if candidate not in sniffed:
+            sniffed.append(candidate)
+    return sniffed
+
+
+def select_scripts(
+    files: List[str],
+    patterns: List[str],
+    interpreters: Collection[str],
+    sniffer: ShebangSniffer,
+    ignore_patterns: Optional[List[str]] = None,
+) -> List[str]:
+    """Select files matching patterns, or scripts for the given interpreters.
+
+    Args:
+        files: Normalized file paths, as discovered.
+        patterns: File paths or glob patterns to match.
+        interpreters: Interpreter names, such as "bash"; an extensionless
+            file whose #! line names one of them is selected.
+        sniffer: Reads and caches #! lines.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+
+    Returns:
+        The selected files, in their original order.
+    """
+    matched = set(filter_files(files, patterns, ignore_patterns))
+    return [
+        path
+        for path in files
+        if path in matched
+        or (_is_extensionless(path) and sniffer.interpreter(path) in interpreters)
+    ]
@@ -0,0 +1,376 @@
+"""Git index reader for file discovery.
+
+This module lists the files of a git repository straight from its index
+file (``.git/index``), so discovery cost scales with the number of tracked
+files rather than with everything on disk (build output, dependencies).
+Index format versions 2, 3 and 4 are supported. Indexes needing an
+extension this reader does not understand, such as a split index
+(``core.splitIndex``) whose entries live in a shared file, are rejected
+so callers can fall back to asking git.
+"""
+
+import os
+import re
+import struct
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+_HEADER = struct.Struct(">4sII")
+_FLAGS = struct.Struct(">H")
+
+# ctime, mtime, dev, ino, mode, uid, gid, size: ten 32-bit fields
+_STAT_SIZE = 40
+_MODE_OFFSET = 24
+_MODE_TYPE_MASK = 0o170000
+_MODE_GITLINK = 0o160000
+_MODE_DIRECTORY = 0o040000
+
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE_MASK = 0x3000
+
+_EXTENSION = struct.Struct(">4sI")
+
+# Required extensions (lowercase signature) that do not change the entry
+# list: sparse directory entries are skipped like gitlinks
+_UNDERSTOOD_EXTENSIONS = frozenset([b"sdir"])
+
+_OBJECT_FORMAT = re.compile(r"^\s*objectformat\s*=\s*sha256\s*$", re.I | re.M)
+
+
+def find_repository(start: str = ".") -> Optional[Tuple[str, str]]:
+    """Locate the working tree and git directory containing start.
+
+    Handles both regular ``.git`` directories and ``.git`` files pointing
+    elsewhere (worktrees and submodules).
+
+    Args:
+        start: Directory to begin the upward search from.
+
+    Returns:
+        Tuple of (absolute working tree root, git directory), or None if
+        start is not inside a repository.
+    """
+    current = os.path.abspath(start)
+    while True:
+        candidate = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return current, candidate
+        if os.path.isfile(candidate):
+            with open(candidate, encoding="utf-8") as handle:
+                content = handle.read().strip()
+            if content.startswith("gitdir:"):
+                git_dir = content[len("gitdir:") :].strip()
+                return current, os.path.normpath(os.path.join(current, git_dir))
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _hash_size(git_dir: str) -> int:
+    """Return the object id size used by the repository (SHA-1 or SHA-256)."""
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, encoding="utf-8") as handle:
+            common_dir = os.path.join(git_dir, handle.read().strip())
+    try:
+        with open(os.path.join(common_dir, "config"), encoding="utf-8") as handle:
+            if _OBJECT_FORMAT.search(handle.read()):
+                return 32
+    except OSError:
+        pass
+    return 20
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode git's offset varint used for index v4 path compression."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def read_index(git_dir: str) -> List[str]:
+    """Read the paths of all regular entries in a git index.
+
+    Submodules (gitlinks) and sparse directory entries are skipped and
+    conflicted paths are reported once.
+
+    Args:
+        git_dir: Path to the git directory.
+
+    Returns:
+        Repository-relative paths using forward slashes, in index order.
+
+    Raises:
+        OSError: If the index file cannot be read.
+        ValueError: If the index file is malformed, of an unknown version
+            or needs an unsupported extension (such as a split index).
+    """
+    index_file = os.environ.get("GIT_INDEX_FILE") or os.path.join(git_dir, "index")
+    with open(index_file, "rb") as handle:
+        data = handle.read()
+
+    if len(data) < _HEADER.size:
+        raise ValueError(f"Truncated git index: {index_file}")
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"Unsupported git index format: {index_file}")
+
+    hash_size = _hash_size(git_dir)
+    try:
+        paths, pos = _parse_entries(data, version, count, _STAT_SIZE + hash_size)
+        extension = _required_extension(data, pos, len(data) - hash_size)
+    except (struct.error, ValueError) as exc:
+        raise ValueError(f"Malformed git index: {index_file}") from exc
+    if extension is not None:
+        raise ValueError(f"Unsupported git index extension {extension!r}: {index_file}")
+    return paths
+
+
+def _parse_entries(
+    data: bytes, version: int, count: int, flags_offset: int
+) -> Tuple[List[str], int]:
+    """Decode the entry table of an index file.
+
+    Args:
+        data: Raw index file contents.
+        version: Index format version from the header.
+        count: Number of entries from the header.
+        flags_offset: Offset of the flags field within an entry.
+
+    Returns:
+        Tuple of (repository-relative paths of regular entries, offset of
+        the first byte after the entry table).
+    """
+    paths: List[str] = []
+    previous = b""
+    pos = _HEADER.size
+    for _ in range(count):
+        start = pos
+        (mode,) = struct.unpack_from(">I", data, start + _MODE_OFFSET)
+        (flags,) = _FLAGS.unpack_from(data, start + flags_offset)
+        pos = start + flags_offset + _FLAGS.size
+        if flags & _FLAG_EXTENDED:
+            pos += _FLAGS.size
+
+        if version == 4:
+            strip, pos = _decode_varint(data, pos)
+            end = data.index(b"\0", pos)
+            name = previous[: len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            name = data[pos:end]
+            # Entries are NUL-padded to a multiple of eight bytes
+            pos = start + ((end - start + 8) // 8) * 8
+        previous = name
+
+        if mode & _MODE_TYPE_MASK in (_MODE_GITLINK, _MODE_DIRECTORY):
+            continue
+        path = name.decode("utf-8", "surrogateescape")
+        # Conflicted paths have one adjacent entry per stage
+        if flags & _FLAG_STAGE_MASK and paths and paths[-1] == path:
+            continue
+        paths.append(path)
+    return paths, pos
+
+
+def _required_extension(data: bytes, pos: int, end: int) -> Optional[str]:
+    """Find an index extension that must be understood but is not.
+
+    Extensions whose signature starts with an uppercase letter are optional
+    caches; any other one changes how the index must be read.
+
+    Args:
+        data: Raw index file contents.
+        pos: Offset of the first extension.
+        end: Offset of the trailing checksum.
+
+    Returns:
+        The signature of the first such extension, or None.
+    """
+    while pos < end:
+        signature, size = _EXTENSION.unpack_from(data, pos)
+        if not signature[:1].isupper() and signature not in _UNDERSTOOD_EXTENSIONS:
+            return signature.decode("ascii", "replace")
+        pos += _EXTENSION.size + size
+    if pos != end:
+        raise ValueError("Index extension overruns the checksum")
+    return None
+
+
+def _split_z(output: bytes) -> List[str]:
+    """Decode NUL-separated paths from git's -z output."""
+    return [
+        path.decode("utf-8", "surrogateescape") for path in output.split(b"\0") if path
+    ]
+
+
+def list_untracked(work_tree: str) -> List[str]:
+    """List untracked files that are not excluded by ignore rules.
+
+    The index does not record untracked files, so this asks git, which
+    walks every directory that is not ignored. With core.untrackedCache
+    enabled it only re-reads directories whose modification time changed.
+
+    Args:
+        work_tree: Top-level directory of the working tree.
+
+    Returns:
+        Repository-relative paths using forward slashes. Empty if git is not
+        available.
+    """
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", "--others", "--exclude-standard"],
+            cwd=work_tree,
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        return []
+    if result.returncode != 0:
+        return []
+    return _split_z(result.stdout)
+
+
+def list_changed(work_tree: str, ref: str) -> List[str]:
+    """List files added or modified since the merge base of ref and HEAD.
+
+    The comparison is against the working tree, so staged and unstaged edits
+    count as changes. When ref is an ancestor of HEAD (a tag or an earlier
+    commit) the merge base is ref itself. Deleted files are not reported.
+
+    Args:
+        work_tree: Top-level directory of the working tree.
+        ref: Any revision git understands (branch, tag, commit).
+
+    Returns:
+        Repository-relative paths using forward slashes.
+
+    Raises:
+        ValueError: If git is not available or ref cannot be resolved.
+    """
+    try:
+        base = subprocess.run(
+            ["git", "merge-base", ref, "HEAD"],
+            cwd=work_tree,
+            capture_output=True,
+            check=False,
+        )
+        if base.returncode != 0:
+            # Unrelated histories have no merge base; compare against ref
+            base = subprocess.run(
+                ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+                cwd=work_tree,
+                capture_output=True,
+                check=False,
+            )
+        if base.returncode != 0:
+            raise ValueError(f"Unknown git revision: {ref}")
+        result = subprocess.run(
+            [
+                "git",
+                "diff",
+                "-z",
+                "--name-only",
+                "--no-renames",
+                "--diff-filter=ACMRT",
+                base.stdout.decode().strip(),
+                "--",
+            ],
+            cwd=work_tree,
+            capture_output=True,
+            check=False,
+        )
+    except OSError as exc:
+        raise ValueError(f"Could not run git: {exc}") from exc
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode("utf-8", "replace").strip())
+    return _split_z(result.stdout)
+
+
+def list_staged(work_tree: str) -> List[str]:
+    """List files added or modified in the index relative to HEAD.
+
+    Args:
+        work_tree: Top-level directory of the working tree.
+
+    Returns:
+        Repository-relative paths using forward slashes.
+
+    Raises:
+        ValueError: If git is not available or fails.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "git",
+                "diff",
+                "--cached",
+                "-z",
+                "--name-only",
+                "--no-renames",
+                "--diff-filter=ACMRT",
+                "--",
+            ],
+            cwd=work_tree,
+            capture_output=True,
+            check=False,
+        )
+    except OSError as exc:
+        raise ValueError(f"Could not run git: {exc}") from exc
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode("utf-8", "replace").strip())
+    return _split_z(result.stdout)
+
+
+def read_staged(work_tree: str, paths: List[str]) -> Dict[str, Optional[bytes]]:
+    """Read the staged content of files with a single git process.
+
+    Args:
+        work_tree: Top-level directory of the working tree.
+        paths: Repository-relative paths using forward slashes.
+
+    Returns:
+        Content by path, or None for paths that are not in the index.
+
+    Raises:
+        ValueError: If git is not available or its output is malformed.
+    """
+    # ":<path>" names the stage 0 index entry; newlines cannot be quoted here
+    request = "".join(f":{path}\n" for path in paths if "\n" not in path)
+    try:
+        result = subprocess.run(
+            ["git", "cat-file", "--batch"],
+            cwd=work_tree,
+            input=request.encode("utf-8", "surrogateescape"),
+            capture_output=True,
+            check=False,
+        )
+    except OSError as exc:
+        raise ValueError(f"Could not run git: {exc}") from exc
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode("utf-8", "replace").strip())
+
+    blobs: Dict[str, Optional[bytes]] = dict.fromkeys(paths)
+    data = result.stdout
+    pos = 0
+    for path in (path for path in paths if "\n" not in path):
+        end = data.index(b"\n", pos)
+        header = data[pos:end].split()
+        pos = end + 1
+        if len(header) != 3 or header[1] != b"blob":
+            # "<name> missing" or a non-blob entry
+            continue
+        size = int(header[2])
+        blobs[path] = data[pos : pos + size]
+        # Content is followed by a newline
+        pos += size + 1
+    return blobs
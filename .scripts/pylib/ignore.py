@@ -0,0 +1,360 @@
+"""gitignore-style ignore rules for file discovery.
+
+Rules come from DEFAULT_IGNORES, the .gitignore files of the directories
+being searched and --ignore, in increasing order of precedence, and follow
+gitignore semantics: ``!`` negates,
+a trailing slash matches directories only, a slash elsewhere anchors the
+pattern to the directory it was given in, ``**`` spans directories and the
+last matching rule wins. Paths inside an ignored directory are ignored
+whatever later rules say, since the directory is never entered. As in git,
+the .gitignore files of the repository's top level and of every directory
+down to the one being searched apply too.
+
+The rules that apply in a directory (the defaults, the ignore files of the
+directory and every directory above it, and the command-line patterns) are
+compiled into one regular expression, with the rules in reverse order, so
+deciding an entry takes a single match. A directory without an ignore file
+of its own shares its parent's expression. The expression is matched
+against ``NAME\0PATH`` (each with a trailing slash for directories), so
+the common patterns without a slash are decided by the entry name without
+scanning the rest of the path.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .git_index import find_repository
+
+# Per-directory ignore files read during discovery
+IGNORE_FILES = (".gitignore",)
+
+# (regular expression over NAME\0PATH, negated)
+_Rule = Tuple[str, bool]
+
+
+def _translate_component(text: str) -> str:
+    """Translate one path component of a gitignore pattern to a regex."""
+    parts = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == "\\" and index + 1 < len(text):
+            parts.append(re.escape(text[index + 1]))
+            index += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            # A "]" right after the bracket (or "[!") is part of the set
+            start = (
+                index + 2 if text[index + 1 : index + 2] in ("!", "^") else index + 1
+            )
+            end = text.find("]", start + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = text[index + 1 : end].replace("\\", "\\\\").replace("[", "\\[")
+                if body[0] in "!^":
+                    body = "^" + body[1:]
+                parts.append(f"(?!/)[{body}]")
+                index = end + 1
+                continue
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return "".join(parts)
+
+
+def compile_rule(line: str, base: str = "") -> Optional[_Rule]:
+    """Translate a line of a gitignore file into a rule.
+
+    Args:
+        line: The line, without its line break.
+        base: Slash-separated directory the line applies to, relative to
+            the root of the rules; empty for the root.
+
+    Returns:
+        A (regular expression, negated) rule matching the entry name and its
+        root-relative path, separated by a NUL character and each with a
+        trailing slash for directories, or None for blank lines and
+        comments.
+    """
+    if line.endswith("\r"):
+        line = line[:-1]
+    # Trailing spaces are dropped unless escaped
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated or line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    suffix = "/" if directory_only else "/?"
+    if "/" not in line:
+        # Matches the name at any depth below base
+        name = _translate_component(line)
+        return (
+            f"(?=[^/]){name}{suffix}\0"
+            + (re.escape(f"{base}/") if base else "")
+            + ".*",
+            negated,
+        )
+    components = line.lstrip("/").split("/")
+
+    pattern = "[^\0]*\0" + (re.escape(f"{base}/") if base else "")
+    for position, component in enumerate(components):
+        last = position + 1 == len(components)
+        if component == "**":
+            # "a/**" matches everything inside a, but not a itself
+            pattern += ".+" if last else "(?:.*/)?"
+        else:
+            # Wildcards must not match an empty name, as in "keep/*" and "keep/"
+            pattern += "(?=[^/])" + _translate_component(component)
+            pattern += "" if last else "/"
+    return pattern + suffix, negated
+
+
+def _compile_all(lines: Iterable[str], base: str = "") -> List[_Rule]:
+    """Compile gitignore lines, skipping blank lines and comments."""
+    return [
+        rule
+        for rule in (compile_rule(line, base) for line in lines)
+        if rule is not None
+    ]
+
+
+class _CompiledRules:
+    """Rules combined into one expression; the last matching rule decides."""
+
+    __slots__ = ("rules", "regex", "negated")
+
+    def __init__(self, rules: List[_Rule], overrides: List[_Rule]):
+        # Inherited by subdirectories, which add their own before overrides
+        self.rules = rules
+        # Alternatives are tried in order, so the last rule goes first
+        ordered = (rules + overrides)[::-1]
+        self.regex = (
+            re.compile("|".join(f"({pattern})" for pattern, _ in ordered))
+            if ordered
+            else None
+        )
+        self.negated = [negated for _, negated in ordered]
+
+
+class DirectoryRules:
+    """The ignore rules that apply to the entries of one directory."""
+
+    __slots__ = ("prefix", "compiled")
+
+    def __init__(self, prefix: str, compiled: _CompiledRules):
+        self.prefix = prefix
+        self.compiled = compiled
+
+    def ignores(self, name: str, is_dir: bool) -> bool:
+        """Check whether an entry of the directory is ignored.
+
+        Args:
+            name: Entry name.
+            is_dir: Whether the entry is a directory.
+
+        Returns:
+            True if the last rule matching the entry does not negate.
+        """
+        regex = self.compiled.regex
+        if regex is None:
+            return False
+        entry = f"{name}/" if is_dir else name
+        match = regex.fullmatch(f"{entry}\0{self.prefix}{entry}")
+        return match is not None and not self.compiled.negated[match.lastindex - 1]
+
+
+class RuleTree:
+    """Ignore rules of one directory tree, compiled per directory on demand."""
+
+    def __init__(
+        self,
+        root: str,
+        files: Sequence[str],
+        defaults: List[_Rule],
+        overrides: List[_Rule],
+        start: str = "",
+    ):
+        """Initialize the tree.
+
+        Args:
+            root: Absolute path of the tree's top directory.
+            files: Names of the ignore files to read in each directory.
+            defaults: Compiled rules that ignore files can override.
+            overrides: Compiled rules that take precedence over ignore files.
+            start: Slash-separated directory below root that searches start
+                from; it and the directories above it are never ignored.
+        """
+        self.root = root
+        self.files = files
+        self.start = start
+        self._overrides = overrides
+        self._base = _CompiledRules(defaults, overrides)
+        self._directories: Dict[str, Optional[DirectoryRules]] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget the compiled rules, so ignore files are read again."""
+        self._directories.clear()
+        rules = self._compile("", self._base)
+        parts = self.start.split("/") if self.start else []
+        for depth in range(1, len(parts) + 1):
+            rules = self._compile("/".join(parts[:depth]), rules.compiled)
+
+    def _read(self, directory: str) -> List[_Rule]:
+        """Return the rules of a directory's ignore files."""
+        rules = []
+        path = os.path.join(self.root, *directory.split("/"))
+        for name in self.files:
+            try:
+                with open(
+                    os.path.join(path, name), encoding="utf-8", errors="replace"
+                ) as handle:
+                    lines = handle.read().splitlines()
+            except OSError:
+                continue
+            rules.extend(_compile_all(lines, directory))
+        return rules
+
+    def directory(self, directory: str) -> Optional[DirectoryRules]:
+        """Return the rules for the entries of a directory.
+
+        Args:
+            directory: Slash-separated path relative to the root; empty for
+                the root itself.
+
+        Returns:
+            The directory's rules, or None if it or a directory above it
+            is ignored.
+        """
+        if directory in self._directories:
+            return self._directories[directory]
+        if directory:
+            parent_path, _, name = directory.rpartition("/")
+            parent = self.directory(parent_path)
+            if parent is None or parent.ignores(name, True):
+                self._directories[directory] = None
+                return None
+            return self._compile(directory, parent.compiled)
+        return self._compile(directory, self._base)
+
+    def _compile(self, directory: str, inherited: _CompiledRules) -> DirectoryRules:
+        """Add a directory's ignore files to the rules of its parent."""
+        compiled = inherited
+        local = self._read(directory) if self.files else []
+        if local:
+            compiled = _CompiledRules(inherited.rules + local, self._overrides)
+        rules = DirectoryRules(f"{directory}/" if directory else "", compiled)
+        self._directories[directory] = rules
+        return rules
+
+
+class IgnoreRules:
+    """Ignore rules for the tree below a root directory.
+
+    Ignore files are read inside the root and, when the root is in a git
+    repository, in the directories from the repository's top level down to
+    the root. Paths outside the root, such as absolute patterns elsewhere,
+    are matched against the given patterns alone, relative to their
+    filesystem root.
+    """
+
+    def __init__(
+        self,
+        defaults: Iterable[str] = (),
+        overrides: Iterable[str] = (),
+        root: str = os.curdir,
+        files: Sequence[str] = IGNORE_FILES,
+    ):
+        """Compile the rules given directly.
+
+        Args:
+            defaults: gitignore-style patterns that ignore files can override.
+            overrides: gitignore-style patterns that take precedence over
+                ignore files.
+            root: Directory the patterns and ignore files are relative to.
+            files: Names of the ignore files to read in each directory.
+        """
+        self.defaults = list(defaults)
+        self.overrides = list(overrides)
+        self.root = os.path.abspath(root)
+        repository = find_repository(self.root) if files else None
+        top = self.root if repository is None else repository[0]
+        # The root relative to the top, which the given patterns are anchored to
+        self._prefix = os.path.relpath(self.root, top).replace(os.sep, "/")
+        if self._prefix == ".":
+            self._prefix = ""
+        self._tree = RuleTree(
+            top,
+            files,
+            _compile_all(self.defaults, self._prefix),
+            _compile_all(self.overrides, self._prefix),
+            self._prefix,
+        )
+        self._outside: Dict[str, RuleTree] = {}
+
+    def clear(self) -> None:
+        """Forget the compiled rules, so changed ignore files are read again."""
+        self._tree.clear()
+
+    def resolve(self, path: str) -> Tuple[RuleTree, str]:
+        """Find the rules that apply to a path.
+
+        Args:
+            path: File or directory path.
+
+        Returns:
+            Tuple of (rule tree, slash-separated path relative to its root).
+            Paths outside the root get a tree without ignore files, rooted
+            at the filesystem root.
+        """
+        absolute = os.path.abspath(path)
+        try:
+            relative = os.path.relpath(absolute, self.root)
+        except ValueError:  # Another drive
+            relative = os.pardir
+        if relative != os.pardir and not relative.startswith(os.pardir + os.sep):
+            if relative == os.curdir:
+                return self._tree, self._prefix
+            relative = relative.replace(os.sep, "/")
+            return (
+                self._tree,
+                f"{self._prefix}/{relative}" if self._prefix else relative,
+            )
+        drive, rest = os.path.splitdrive(absolute)
+        anchor = drive + os.sep
+        if anchor not in self._outside:
+            self._outside[anchor] = RuleTree(
+                anchor, (), _compile_all(self.defaults), _compile_all(self.overrides)
+            )
+        return self._outside[anchor], rest.strip(os.sep).replace(os.sep, "/")
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        """Check whether a path, or a directory above it, is ignored.
+
+        Args:
+            path: File or directory path.
+            is_dir: Whether the path is a directory.
+
+        Returns:
+            True if the path is ignored.
+        """
+        rules, relative = self.resolve(path)
+        if not relative:
+            return False
+        parent, _, name = relative.rpartition("/")
+        directory = rules.directory(parent)
+        return directory is None or directory.ignores(name, is_dir)
@@ -5,112 +5,990 @@ file linters with consistent behavior and output formatting.
 """
 
 import argparse
+import functools
+import os
 import sys
+import tempfile
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from .file_finder import find_files
+from .cache import ResultCache, context_digest, file_digest
+from .daemon import delegate, serve_linters
+from .discovery import discover, discover_stream, select_files
+from .file_finder import pattern_roots
+from .git_index import find_repository, read_staged
+from .options import build_parser, validate_args
+from .process import CANCELLED, LIMITS, worker_pool
+from .report import (
+    REPORTERS,
+    Colors,
+    Diagnostic,
+    Reporter,
+    status_output,
+    write_timing,
+)
+from .schedule import apportion, estimate_costs, longest_first
+from .shard import merge_command, record_shard
+from .timing import FIX, LINT, PHASE, TRACER, batch_span, span
+from .toolchain import STAMP_FILE, Toolchain
+from .watch import watch_changes
 
 
-class Colors:
-    """ANSI color codes for terminal output."""
+class LintResult:
+    """Outcome of linting a single file.
 
-    RESET = "\033[0m"
-    RED = "\033[31m"
-    GREEN = "\033[32m"
-    YELLOW = "\033[33m"
-    GRAY = "\033[90m"
-    WHITE = "\033[37m"
+    Attributes:
+        has_issues: True if issues were found (and not fixed).
+        output: Diagnostics reported by the tool, printed under the file name.
+        messages: Notes about fix attempts, printed before the result.
+        fixable: True if the tool can fix at least one of the issues.
+        diagnostics: Structured records of the issues, for machine-readable
+            output formats.
+        timed_out: True if the tool exceeded its time limit, so the file
+            was not fully checked. Such results count as issues but are
+            never cached.
+        truncated: True if only the first --max-diagnostics diagnostics
+            were kept. Such results are not cached either.
+    """
+
+    def __init__(  # pylint: disable=too-many-positional-arguments
+        self,
+        has_issues: bool,
+        output: str = "",
+        messages: Optional[List[str]] = None,
+        fixable: bool = False,
+        diagnostics: Optional[List[Diagnostic]] = None,
+        timed_out: bool = False,
+        truncated: bool = False,
+    ):
+        self.has_issues = has_issues
+        self.output = output
+        self.messages = messages or []
+        self.fixable = fixable
+        self.diagnostics = diagnostics or []
+        self.timed_out = timed_out
+        self.truncated = truncated
+
+    @classmethod
+    def timeout(cls, seconds: Optional[float]) -> "LintResult":
+        """Return the result for a file whose tool ran out of time."""
+        return cls(True, f"Timed out after {seconds:g} seconds", timed_out=True)
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Return the cacheable part of the result (fix messages excluded)."""
+        return {
+            "has_issues": self.has_issues,
+            "output": self.output,
+            "fixable": self.fixable,
+            "diagnostics": [d.to_row() for d in self.diagnostics],
+            "timed_out": self.timed_out,
+            "truncated": self.truncated,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "LintResult":
+        """Rebuild a result from to_payload() data."""
+        return cls(
+            payload["has_issues"],
+            payload["output"],
+            fixable=payload["fixable"],
+            diagnostics=[Diagnostic.from_row(row) for row in payload["diagnostics"]],
+            timed_out=payload.get("timed_out", False),
+            truncated=payload.get("truncated", False),
+        )
+
+
+def _digest_or_none(path: str) -> Optional[str]:
+    """Return a file's content digest, or None if it cannot be read."""
+    try:
+        return file_digest(path)
+    except OSError:
+        return None
+
+
+def _in_order(
+    files: List[str],
+    cached: Dict[str, LintResult],
+    owners: Dict[str, Tuple[int, int]],
+    batch_results: Callable[[int], List[LintResult]],
+) -> Iterator[Tuple[str, LintResult]]:
+    """Yield results in file order, waiting on batches as needed.
+
+    Args:
+        files: Paths in reporting order.
+        cached: Results already known, by path.
+        owners: (batch number, index in batch) for every path not cached.
+        batch_results: Returns the results of a batch, blocking until done.
+
+    Yields:
+        Tuples of (file path, lint result).
+    """
+    for file_path in files:
+        if file_path in cached:
+            yield file_path, cached[file_path]
+        else:
+            number, index = owners[file_path]
+            yield file_path, batch_results(number)[index]
 
 
-class Linter(ABC):
+class _CheckPass:
+    """A check pass whose files are submitted in parts.
+
+    Attributes:
+        cache: Result cache, or None when caching is disabled.
+        jobs: Number of workers the batches are spread over.
+        cached: Results already known, by path.
+        owners: (batch number, index in batch) for every path not cached.
+        outcomes: Returns the results of a batch by number, blocking until
+            they are done.
+    """
+
+    def __init__(self, cache: Optional[ResultCache], jobs: int):
+        self.cache = cache
+        self.jobs = jobs
+        self.cached: Dict[str, LintResult] = {}
+        self.owners: Dict[str, Tuple[int, int]] = {}
+        self.outcomes: Dict[int, Callable[[], List[LintResult]]] = {}
+
+    def results(self, files: List[str]) -> Iterator[Tuple[str, LintResult]]:
+        """Return the results of submitted files in the order of files."""
+        return _in_order(
+            files, self.cached, self.owners, lambda number: self.outcomes[number]()
+        )
+
+
+class Linter(ABC):  # pylint: disable=too-many-instance-attributes
     """Abstract base class for file linters.
 
     Provides common argument parsing, file discovery, and result reporting.
     Subclasses must implement check_installed() and lint_file().
     """
 
-    def __init__(self, name: str, default_pattern: str):
+    def __init__(
+        self, name: str, default_pattern: str, interpreters: Iterable[str] = ()
+    ):
         """Initialize the linter.
 
         Args:
             name: The name of the linter (for display purposes).
             default_pattern: Default glob pattern for finding files.
+            interpreters: Interpreters whose extensionless scripts the
+                linter also handles with --shebang, such as "bash".
         """
         self.name = name
         self.default_pattern = default_pattern
-        self.parser = argparse.ArgumentParser(description=f"Lint {name} files")
-        self.parser.add_argument(
-            "--fix", action="store_true", help="Apply fixes automatically"
-        )
-        self.parser.add_argument(
-            "files", nargs="*", help="Files or glob patterns to lint"
-        )
-        self.parser.add_argument("--ignore", action="append", help="Patterns to ignore")
+        self.interpreters = frozenset(interpreters)
+        self.toolchain = Toolchain()
+        self.tool_version = ""
+        self.parser = build_parser(f"Lint {name} files")
+        # Set while a lint daemon keeps the linter between runs
+        self.resident = False
+        self._pool: Optional[Executor] = None
+        self._cache: Optional[ResultCache] = None
+        self._stream: Optional[_CheckPass] = None
 
     @abstractmethod
     def check_installed(self) -> None:
         """Verify that the linter tool is installed.
 
-        Should exit with code 2 if the tool is not available.
+        Should exit with code 2 if the tool is not available, and set
+        tool_version. Implementations should go through self.toolchain so
+        the probe is skipped when a valid stamp exists.
         """
 
     @abstractmethod
-    def lint_file(self, file_path: str, fix: bool) -> bool:
-        """Lint a single file.
+    def lint_file(self, file_path: str) -> LintResult:
+        """Check a single file without modifying it.
 
         Args:
             file_path: Path to the file to lint.
+
+        Returns:
+            The lint result for the file.
+        """
+
+    def fix_file(self, file_path: str) -> List[str]:
+        """Apply automatic fixes to a single file.
+
+        Only called for files whose check reported fixable issues. The
+        default does nothing, for tools without a fixer.
+
+        Args:
+            file_path: Path to the file to fix.
+
+        Returns:
+            Messages describing the fix attempt.
+        """
+        del file_path
+        return []
+
+    def lint_source(self, file_path: str, source: bytes) -> LintResult:
+        """Check file content supplied in memory (used by --staged).
+
+        The default writes the content to a temporary file of the same name
+        and lints that with lint_file(). Linters whose tool reads standard
+        input can override it to skip the file.
+
+        Args:
+            file_path: Path the content belongs to, for reporting.
+            source: Content to check instead of the file on disk.
+
+        Returns:
+            The lint result for the content.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, os.path.basename(file_path))
+            with open(path, "wb") as handle:
+                handle.write(source)
+            result = self.lint_file(path)
+        result.output = result.output.replace(path, file_path)
+        return result
+
+    def close(self) -> None:  # noqa: B027
+        """Release resources held by the linter, such as worker processes.
+
+        Called once after all files have been linted.
+        """
+
+    def dependencies(self, file_path: str) -> List[str]:
+        """Return the other files a file's result depends on.
+
+        Cached results are invalidated when any of them changes, appears or
+        disappears. The default reports none.
+
+        Args:
+            file_path: Path to the file.
+
+        Returns:
+            Sorted absolute paths, including indirect dependencies.
+        """
+        del file_path
+        return []
+
+    def dependents(self, changed: Set[str], file_paths: Iterable[str]) -> Set[str]:
+        """Return files whose results may change when other files change.
+
+        Used by --watch to re-lint, for example, scripts that source a
+        changed library.
+
+        Args:
+            changed: Paths of files that changed or were deleted.
+            file_paths: Paths of all files the linter covers.
+
+        Returns:
+            Paths from file_paths that depend on any changed file.
+        """
+        changed = {os.path.abspath(path) for path in changed}
+        return {
+            file_path
+            for file_path in file_paths
+            if not changed.isdisjoint(self.dependencies(file_path))
+        }
+
+    def cache_context(self) -> List[str]:
+        """Return values that invalidate all cached results when they change.
+
+        Subclasses should include the tool version, the contents of any
+        settings files and the flags passed to the tool.
+
+        Returns:
+            List of strings identifying the lint configuration.
+        """
+        return [self.name]
+
+    def lint_batch(self, file_paths: List[str]) -> List[LintResult]:
+        """Check several files with as few tool invocations as possible.
+
+        The default calls lint_file() once per file. Subclasses whose tool
+        accepts many files per invocation can override this together with
+        make_batches().
+
+        Args:
+            file_paths: Paths to lint.
+
+        Returns:
+            One lint result per file, in the same order as file_paths.
+        """
+        return [self.lint_file(file_path) for file_path in file_paths]
+
+    def fix_batch(self, file_paths: List[str]) -> Dict[str, List[str]]:
+        """Apply automatic fixes to several files.
+
+        The default calls fix_file() once per file.
+
+        Args:
+            file_paths: Paths to fix.
+
+        Returns:
+            Fix messages by path.
+        """
+        return {file_path: self.fix_file(file_path) for file_path in file_paths}
+
+    def make_batches(
+        self, file_paths: List[str], jobs: int, costs: Dict[str, float]
+    ) -> List[List[str]]:
+        """Group files into batches for lint_batch() and fix_batch().
+
+        Batches are submitted longest first whatever their order here, so
+        subclasses only need to keep their estimated costs similar.
+
+        Args:
+            file_paths: Sorted paths that need linting.
+            jobs: Number of workers the batches will be spread over.
+            costs: Estimated lint time by path (see estimate_costs()).
+
+        Returns:
+            List of batches. The default puts every file in its own batch.
+        """
+        del jobs, costs
+        return [[file_path] for file_path in file_paths]
+
+    def _estimate(self, file_paths: List[str]) -> Dict[str, float]:
+        """Estimate lint times from the durations recorded in the cache."""
+        cache = self._cache
+        return estimate_costs(
+            file_paths, cache.duration if cache is not None else lambda _: None
+        )
+
+    def _lint_and_store(
+        self, batch: List[str], cache: Optional[ResultCache]
+    ) -> List[LintResult]:
+        """Lint a batch and record the results and durations in the cache."""
+        started = time.perf_counter()
+        with batch_span("lint", LINT, batch):
+            results = self.lint_batch(batch)
+        if cache is not None:
+            shares = apportion(batch, time.perf_counter() - started)
+            for file_path, result in zip(batch, results, strict=True):
+                if not (result.timed_out or result.truncated):
+                    cache.put(
+                        file_path, result.to_payload(), self.dependencies(file_path)
+                    )
+                cache.record_duration(file_path, shares[file_path])
+        return results
+
+    def _submit(self, checks: _CheckPass, files: List[str]) -> None:
+        """Add files to a check pass, on the worker pool when there is one.
+
+        Cached results are resolved first and the remaining files grouped by
+        make_batches(). With a pool, the batches are submitted before this
+        returns, longest estimated first so a slow file does not start last,
+        and several linters can share the pool. Without one, a batch runs
+        when its results are first asked for.
+
+        Args:
+            checks: The pass to add to.
+            files: Paths to lint, not yet in the pass.
+        """
+        cache = checks.cache
+        pending = []
+        for file_path in files:
+            payload = (
+                cache.get(file_path, self.dependencies(file_path))
+                if cache is not None
+                else None
+            )
+            if payload is None:
+                pending.append(file_path)
+            else:
+                checks.cached[file_path] = LintResult.from_payload(payload)
+        if not pending:
+            return
+
+        costs = self._estimate(pending)
+        batches = self.make_batches(pending, checks.jobs, costs)
+        first = len(checks.outcomes)
+        for number, batch in enumerate(batches, first):
+            for index, file_path in enumerate(batch):
+                checks.owners[file_path] = (number, index)
+
+        for number in longest_first(batches, costs):
+            run = functools.partial(self._lint_and_store, batches[number], cache)
+            checks.outcomes[first + number] = (
+                functools.cache(run)
+                if self._pool is None
+                else self._pool.submit(run).result
+            )
+
+    def _check_all(
+        self, files: List[str], cache: Optional[ResultCache], jobs: int
+    ) -> Iterator[Tuple[str, LintResult]]:
+        """Check files in batches, on the worker pool when there is one.
+
+        Results are yielded in the order of files as soon as each one and
+        all files before it are done, keeping output grouped per file and
+        deterministic (see _submit()).
+
+        Args:
+            files: Sorted paths to lint.
+            cache: Result cache, or None when caching is disabled.
+            jobs: Number of workers the batches are spread over.
+
+        Returns:
+            Iterator of (file path, lint result) tuples.
+        """
+        checks = _CheckPass(cache, jobs)
+        self._submit(checks, files)
+        return checks.results(files)
+
+    def _fix_all(self, files: List[str], jobs: int) -> Dict[str, List[str]]:
+        """Run the fixer over files in batches, on the worker pool if any.
+
+        Args:
+            files: Paths with fixable issues.
+            jobs: Number of workers the batches are spread over.
+
+        Returns:
+            Fix messages by path.
+        """
+        messages: Dict[str, List[str]] = {}
+
+        def fix(batch: List[str]) -> Dict[str, List[str]]:
+            with batch_span("fix", FIX, batch):
+                return self.fix_batch(batch)
+
+        batches = self.make_batches(files, jobs, self._estimate(files))
+        for batch_messages in (self._pool.map if self._pool else map)(fix, batches):
+            messages.update(batch_messages)
+        return messages
+
+    def _lint_all(
+        self, files: List[str], fix: bool, cache: Optional[ResultCache], jobs: int
+    ) -> Iterator[Tuple[str, LintResult]]:
+        """Lint files, fixing only those that need it in fix mode.
+
+        Fix mode checks every file first, runs the fixer only on files with
+        fixable issues and re-checks only the files the fixer modified, so a
+        clean tree costs the same as in check mode. The first check pass is
+        scheduled before this returns.
+
+        Args:
+            files: Sorted paths to lint.
             fix: Whether to apply automatic fixes.
+            cache: Result cache, or None when caching is disabled.
+            jobs: Number of workers the batches are spread over.
+
+        Returns:
+            Iterator of (file path, lint result) tuples, in the order of files.
+        """
+        checked = self._check_all(files, cache, jobs)
+        if not fix:
+            return checked
+        return self._fix_checked(files, checked, cache, jobs)
+
+    def _fix_checked(
+        self,
+        files: List[str],
+        checked: Iterator[Tuple[str, LintResult]],
+        cache: Optional[ResultCache],
+        jobs: int,
+    ) -> Iterator[Tuple[str, LintResult]]:
+        """Fix the files a check pass found fixable and re-check them."""
+        results = dict(checked)
+        dirty = [path for path in files if results[path].fixable]
+        if dirty:
+            before = {path: _digest_or_none(path) for path in dirty}
+            messages = self._fix_all(dirty, jobs)
+            modified = [path for path in dirty if _digest_or_none(path) != before[path]]
+            results.update(self._check_all(modified, cache, jobs))
+            for path in dirty:
+                results[path].messages = messages.get(path, []) + results[path].messages
+
+        for path in files:
+            yield path, results[path]
+
+    def _lint_staged(self, files: List[str]) -> Iterator[Tuple[str, LintResult]]:
+        """Lint the staged content of files, read from the git index.
+
+        The working tree copies are never read, so unstaged edits neither
+        hide nor cause issues in what is about to be committed.
+
+        Args:
+            files: Sorted paths of staged files.
+
+        Returns:
+            Iterator of (file path, lint result) tuples, in the order of files.
+        """
+        repository = find_repository()
+        work_tree = repository[0] if repository else os.curdir
+        names = [
+            os.path.relpath(os.path.abspath(path), work_tree).replace(os.sep, "/")
+            for path in files
+        ]
+        try:
+            blobs = read_staged(work_tree, names)
+        except ValueError as exc:
+            print(f"{Colors.RED}[FAIL] {exc}{Colors.RESET}")
+            sys.exit(2)
+
+        def lint(index: int) -> LintResult:
+            source = blobs[names[index]]
+            if source is None:
+                return LintResult(True, f"{files[index]} is not in the index")
+            with batch_span("lint", LINT, [files[index]]):
+                return self.lint_source(files[index], source)
+
+        results = (self._pool.map if self._pool else map)(lint, range(len(files)))
+        return zip(files, results, strict=True)
+
+    def schedule(
+        self, files: List[str], args: argparse.Namespace, pool: Optional[Executor]
+    ) -> Iterator[Tuple[str, LintResult]]:
+        """Open the cache and start linting files.
+
+        Work is submitted to pool (or run lazily without one); call
+        complete() once the results have been consumed.
+
+        Args:
+            files: Sorted paths to lint.
+            args: Parsed command-line arguments.
+            pool: Worker pool, possibly shared with other linters.
+
+        Returns:
+            Iterator of (file path, lint result) tuples, in the order of files.
+        """
+        self._pool = pool
+        if args.staged:
+            return self._lint_staged(files)
+        with span("Cache load", PHASE, linter=self.name):
+            self._cache = self._open_cache(args)
+        return self._lint_all(files, args.fix, self._cache, args.jobs)
+
+    def begin_stream(
+        self, args: argparse.Namespace, pool: Optional[Executor]
+    ) -> Callable[[List[str]], None]:
+        """Open the cache for a run whose files arrive from discovery (--stream).
+
+        Args:
+            args: Parsed command-line arguments.
+            pool: Worker pool, possibly shared with other linters.
+
+        Returns:
+            Function to call with each part of the files as it is found,
+            which starts checking them at once; end_stream() then returns
+            the results.
+        """
+        self._pool = pool
+        with span("Cache load", PHASE, linter=self.name):
+            self._cache = self._open_cache(args)
+        checks = _CheckPass(self._cache, args.jobs)
+        self._stream = checks
+        return lambda files: self._submit(checks, files)
+
+    def end_stream(
+        self, files: List[str], args: argparse.Namespace
+    ) -> Iterator[Tuple[str, LintResult]]:
+        """Return the results of a streamed run once discovery has finished.
+
+        Call complete() once the results have been consumed, as after
+        schedule().
+
+        Args:
+            files: Sorted paths of every file passed to feed().
+            args: Parsed command-line arguments.
 
         Returns:
-            True if issues were found (and not fixed), False otherwise.
+            Iterator of (file path, lint result) tuples, in the order of files.
         """
+        checks, self._stream = self._stream, None
+        if checks is None:
+            return iter([])
+        checked = checks.results(files)
+        if not args.fix:
+            return checked
+        return self._fix_checked(files, checked, checks.cache, args.jobs)
 
-    def run(self) -> None:
+    def duration(self, file_path: str) -> Optional[float]:
+        """Return the recorded lint duration of a file while a run is open."""
+        return self._cache.duration(file_path) if self._cache is not None else None
+
+    def flush(self) -> None:
+        """Save the cache after the results of schedule() were consumed.
+
+        A resident linter keeps the loaded cache for its next run.
+        """
+        if self._cache is not None:
+            with span("Cache save", PHASE, linter=self.name):
+                self._cache.save()
+            if not self.resident:
+                self._cache = None
+
+    def complete(self) -> None:
+        """Stop tool workers and save the cache after the last schedule().
+
+        A resident linter keeps its tool workers running.
+        """
+        if not self.resident:
+            self.close()
+        self._pool = None
+        self.flush()
+
+    def configure(self, args: argparse.Namespace) -> None:
+        """Apply command-line settings that precede check_installed().
+
+        Args:
+            args: Parsed command-line arguments.
+        """
+        if not args.no_cache:
+            self.toolchain = Toolchain(os.path.join(args.cache_dir, STAMP_FILE))
+        LIMITS.timeout = args.timeout or None
+        LIMITS.cpu = args.max_cpu or None
+        LIMITS.memory = args.max_memory * 1024 * 1024 if args.max_memory else None
+        LIMITS.diagnostics = args.max_diagnostics
+
+    def _open_cache(self, args: argparse.Namespace) -> Optional[ResultCache]:
+        """Open the result cache unless disabled.
+
+        Args:
+            args: Parsed command-line arguments.
+
+        Returns:
+            The result cache, or None when caching is disabled.
+        """
+        if args.no_cache:
+            return None
+        path = os.path.join(args.cache_dir, f"{self.name.lower()}.json")
+        cache = self._cache
+        if cache is not None and (cache.path, cache.max_entries) == (
+            path,
+            args.cache_size,
+        ):
+            # Results are keyed by context, so a kept cache only needs the new one
+            cache.context = context_digest(self.cache_context())
+            return cache
+        return ResultCache(path, self.cache_context(), args.cache_size)
+
+    def run(self, argv: Optional[List[str]] = None) -> None:
         """Run the linter on files matching the configured patterns.
 
         Parses command-line arguments, discovers files, runs the linter on each,
-        and exits with appropriate status code.
+        and exits with appropriate status code. The run is handed to a lint
+        daemon if one is serving the current directory. A first argument of
+        "merge" reports the partial results of --shard runs instead.
+
+        Args:
+            argv: Command-line arguments (default: sys.argv[1:]).
         """
-        args = self.parser.parse_args()
-        self.check_installed()
+        argv = sys.argv[1:] if argv is None else argv
+        if argv[:1] == ["merge"]:
+            sys.exit(merge_command(argv[1:], LintResult.from_payload))
+        args = self.parser.parse_args(argv)
+        validate_args(self.parser, args)
+        if args.daemon:
+            sys.exit(
+                serve_linters(
+                    args.cache_dir,
+                    [self],
+                    {frozenset([self.name]): self.serve_request},
+                    [self.parser],
+                )
+            )
+        delegate(args, [self.name], argv)
+        self.configure(args)
+        TRACER.enabled = args.profile or bool(args.trace)
+        try:
+            self._execute(args)
+        finally:
+            write_timing(args)
 
-        patterns = args.files
-        if not patterns:
-            patterns = [self.default_pattern]
+    def serve_request(self, argv: List[str]) -> None:
+        """Handle a lint daemon request."""
+        self.run([*argv, "--no-daemon"])
 
-        files = find_files(patterns, args.ignore)
+    def _execute(self, args: argparse.Namespace) -> None:
+        """Discover, lint and report, then exit with the status code.
+
+        Args:
+            args: Parsed command-line arguments.
+        """
+        reporter = record_shard(
+            args, REPORTERS[args.format](), lambda _, path: self.duration(path)
+        )
+        patterns = args.files or [self.default_pattern]
+        files: List[str] = []
+        with status_output(args):
+            if not args.stream:
+                # Discover first so runs with nothing to lint skip probing the tool
+                with span("Discovery", PHASE):
+                    files = discover(args, patterns, self.interpreters)
+            if files or args.watch or args.stream:
+                with span("Toolchain check", PHASE):
+                    self.check_installed()
 
-        if not files:
-            print(f"{Colors.YELLOW}No {self.name} files found to lint{Colors.RESET}")
+        if not (files or args.watch or args.stream):
+            reporter.no_files(self.name)
             sys.exit(0)
 
-        print(f"{self.name}: Linting files...")
-        print("")
+        with worker_pool(args.jobs) as pool:
+            try:
+                work = [(self, files)]
+                if args.stream:
+                    parts = discover_stream(args, patterns, self.interpreters)
+                    with status_output(args):
+                        work = stream_round(
+                            args, pool, [self], parts, lambda _, part: part
+                        )
+                    if not (work[0][1] or args.watch):
+                        reporter.no_files(self.name)
+                        sys.exit(0)
+                reporter.open()
+                has_issues = (report_stream if args.stream else lint_round)(
+                    reporter, args, pool, work
+                )
+                if args.watch:
+                    has_issues = watch_loop(
+                        reporter,
+                        args,
+                        pool,
+                        work,
+                        lambda _, paths: select_files(
+                            args, paths, patterns, self.interpreters
+                        ),
+                    )
+            finally:
+                self.complete()
+
+        reporter.close()
+        sys.exit(1 if has_issues else 0)
 
-        has_issues = False
-        file_count = 0
 
-        for file_path in files:
+def report_results(
+    reporter: Reporter,
+    linter: Linter,
+    results: Iterator[Tuple[str, LintResult]],
+    fail_fast: bool = False,
+) -> Tuple[int, bool]:
+    """Write one linter's results through a reporter as they arrive.
+
+    Args:
+        reporter: Destination of the results.
+        linter: The linter that produced them.
+        results: (file path, lint result) tuples from Linter.schedule().
+        fail_fast: Stop after the first file with issues.
+
+    Returns:
+        Tuple of (number of files, whether any file had issues).
+    """
+    file_count = 0
+    has_issues = False
+    reporter.start(linter.name, linter.tool_version)
+    with span("Linting", PHASE, linter=linter.name):
+        for file_path, result in results:
             file_count += 1
-            if self.lint_file(file_path, args.fix):
-                has_issues = True
+            reporter.result(file_path, result)
+            has_issues = has_issues or result.has_issues
+            if has_issues and fail_fast:
+                break
+    reporter.end()
+    return file_count, has_issues
+
+
+def lint_round(
+    reporter: Reporter,
+    args: argparse.Namespace,
+    pool: Optional[Executor],
+    work: List[Tuple[Linter, List[str]]],
+) -> bool:
+    """Lint and report each linter's files, then write the summary.
+
+    Every linter's work is scheduled before any result is consumed, so
+    linters sharing the pool run concurrently while output stays grouped.
+
+    Args:
+        reporter: Destination of the results.
+        args: Parsed command-line arguments.
+        pool: Worker pool, or None to run in the calling thread.
+        work: (linter, sorted paths) pairs; linters without files are skipped.
+
+    Returns:
+        Whether any file had issues.
+    """
+    CANCELLED.clear()
+    scheduled = [
+        (linter, linter.schedule(files, args, pool)) for linter, files in work if files
+    ]
+    return report_round(reporter, args, pool, scheduled)
+
+
+def stream_round(
+    args: argparse.Namespace,
+    pool: Optional[Executor],
+    linters: List[Linter],
+    parts: Iterable[List[str]],
+    select: Callable[[Linter, List[str]], List[str]],
+) -> List[Tuple[Linter, List[str]]]:
+    """Start linting files while discovery is still finding them (--stream).
+
+    Each part of the discovered files is split between the linters and
+    their checks submitted before the next part is looked for, so tool
+    processes run while the walk goes on. Pass the result to
+    report_stream() once this returns.
+
+    Args:
+        args: Parsed command-line arguments.
+        pool: Worker pool shared by the linters, or None to run in the
+            calling thread.
+        linters: Linters whose tools are installed.
+        parts: Lists of discovered paths, from discover_stream().
+        select: Returns the paths of a part that a linter handles.
+
+    Returns:
+        (linter, sorted paths) pairs, as for lint_round().
+    """
+    CANCELLED.clear()
+    found: List[Tuple[Linter, List[str]]] = [(linter, []) for linter in linters]
+    feeds = [linter.begin_stream(args, pool) for linter in linters]
+    with span("Discovery", PHASE):
+        for part in parts:
+            for (linter, files), feed in zip(found, feeds, strict=True):
+                selected = select(linter, part)
+                files.extend(selected)
+                feed(selected)
+    return [(linter, sorted(files)) for linter, files in found]
+
 
-        print("")
-        print(f"Checked {file_count} file(s)")
+def report_stream(
+    reporter: Reporter,
+    args: argparse.Namespace,
+    pool: Optional[Executor],
+    work: List[Tuple[Linter, List[str]]],
+) -> bool:
+    """Report the results of stream_round(), then write the summary.
 
+    Args:
+        reporter: Destination of the results.
+        args: Parsed command-line arguments.
+        pool: Worker pool the files were submitted to.
+        work: (linter, sorted paths) pairs from stream_round().
+
+    Returns:
+        Whether any file had issues.
+    """
+    scheduled = [
+        (linter, linter.end_stream(files, args)) for linter, files in work if files
+    ]
+    return report_round(reporter, args, pool, scheduled)
+
+
+def report_round(
+    reporter: Reporter,
+    args: argparse.Namespace,
+    pool: Optional[Executor],
+    scheduled: List[Tuple[Linter, Iterator[Tuple[str, LintResult]]]],
+) -> bool:
+    """Report scheduled results linter by linter, then write the summary.
+
+    With --fail-fast, the first file with issues ends the round: queued
+    work is dropped and running tool processes are killed.
+
+    Args:
+        reporter: Destination of the results.
+        args: Parsed command-line arguments.
+        pool: Worker pool the work was submitted to, or None.
+        scheduled: (linter, results in file order) pairs.
+
+    Returns:
+        Whether any file had issues.
+    """
+    file_count = 0
+    failed = []
+    for linter, results in scheduled:
+        count, has_issues = report_results(reporter, linter, results, args.fail_fast)
+        if has_issues and args.fail_fast:
+            CANCELLED.set()
+            if pool is not None:
+                # Killed tools return at once; wait so no result lands after flush
+                pool.shutdown(cancel_futures=True)
+        linter.flush()
+        file_count += count
         if has_issues:
-            if args.fix:
-                print("")
-                print(
-                    f"{Colors.YELLOW}[WARN] Some issues could not be auto-fixed{Colors.RESET}"
-                )
-                print("Please review and fix them manually")
-                sys.exit(1)
-            else:
-                print(f"{Colors.RED}[FAIL] {self.name} found issues{Colors.RESET}")
-                print("Run with --fix to apply automatic fixes")
-                sys.exit(1)
-        else:
-            print(f"{Colors.GREEN}[OK] All files are clean{Colors.RESET}")
-            sys.exit(0)
+            failed.append(linter.name)
+            if args.fail_fast:
+                break
+    names = failed or [linter.name for linter, _ in scheduled]
+    reporter.summary(", ".join(names), file_count, bool(failed), args.fix)
+    return bool(failed)
+
+
+def watch_loop(
+    reporter: Reporter,
+    args: argparse.Namespace,
+    pool: Optional[Executor],
+    work: List[Tuple[Linter, List[str]]],
+    select: Callable[[Linter, List[str]], List[str]],
+) -> bool:
+    """Re-lint changed files and the files depending on them until Ctrl+C.
+
+    Files whose content is the same as when they were last linted (an
+    editor saving without changes, or this run's own fixes) are skipped.
+
+    Args:
+        reporter: Destination of the results.
+        args: Parsed command-line arguments.
+        pool: Worker pool shared by every round.
+        work: (linter, sorted paths) pairs from the initial run.
+        select: Returns the changed paths a linter handles.
+
+    Returns:
+        Whether the last round had issues.
+    """
+    known = [(linter, set(files)) for linter, files in work]
+    patterns = args.files or [linter.default_pattern for linter, _ in work]
+    linted: Dict[str, Optional[str]] = {}
+    has_issues = False
+    try:
+        _waiting(args)
+        for changed in watch_changes(pattern_roots(patterns), args.ignore):
+            fresh = {
+                path
+                for path in changed
+                if path not in linted or linted[path] != _digest_or_none(path)
+            }
+            round_work = [
+                (linter, _affected(linter, files, fresh, select(linter, sorted(fresh))))
+                for linter, files in known
+            ]
+            before = {
+                path: _digest_or_none(path) for _, batch in round_work for path in batch
+            }
+            if not before:
+                continue
+
+            has_issues = lint_round(reporter, args, pool, round_work)
+            # After --fix, the fixed content is what was linted last
+            linted.update(
+                (path, _digest_or_none(path) if args.fix else digest)
+                for path, digest in before.items()
+            )
+            _waiting(args)
+    except KeyboardInterrupt:
+        pass
+    return has_issues
+
+
+def _affected(
+    linter: Linter, files: Set[str], changed: Set[str], selected: List[str]
+) -> List[str]:
+    """Update a linter's file set after changes; return the files to re-lint.
+
+    Args:
+        linter: The linter the files belong to.
+        files: Paths the linter covers, updated in place.
+        changed: Paths that changed or were deleted.
+        selected: The changed paths the linter handles.
+
+    Returns:
+        Sorted paths: the selected files that still exist and their dependents.
+    """
+    files.difference_update(changed)
+    files.update(path for path in selected if os.path.isfile(path))
+    targets = files.intersection(selected)
+    targets.update(files & linter.dependents(changed, sorted(files)))
+    return sorted(targets)
+
+
+def _waiting(args: argparse.Namespace) -> None:
+    with status_output(args):
+        print("\nWatching for changes (press Ctrl+C to stop)...", flush=True)
@@ -0,0 +1,205 @@
+"""Command-line options shared by the linter scripts and the driver."""
+
+import argparse
+
+from .cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_ENTRIES
+from .report import REPORTERS
+from .schedule import default_jobs
+from .shard import parse_shard
+
+
+def build_parser(description: str) -> argparse.ArgumentParser:
+    """Create the command-line parser shared by linters and the driver.
+
+    Args:
+        description: Program description for --help.
+
+    Returns:
+        The argument parser.
+    """
+    parser = argparse.ArgumentParser(
+        description=description,
+        epilog="Run with 'merge PARTIAL...' to report the results of all "
+        "--shard runs together.",
+    )
+    parser.add_argument("--fix", action="store_true", help="Apply fixes automatically")
+    parser.add_argument("files", nargs="*", help="Files or glob patterns to lint")
+    parser.add_argument(
+        "--ignore",
+        action="append",
+        help="gitignore-style pattern to ignore, on top of .gitignore files "
+        "(repeatable; '!PATTERN' re-includes)",
+    )
+    parser.add_argument(
+        "--discovery",
+        choices=["fs", "git"],
+        default="fs",
+        help="Find files by walking the filesystem or from the git index",
+    )
+    parser.add_argument(
+        "--untracked",
+        action="store_true",
+        help="With --discovery git or --changed-since, also lint untracked "
+        "files that are not ignored; this runs git ls-files --others, which "
+        "walks every directory that is not ignored",
+    )
+    parser.add_argument(
+        "--shebang",
+        action="store_true",
+        help="Also lint extensionless files whose #! line names the "
+        "linter's interpreter (bash, sh, pwsh, ...)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Start linting files while the filesystem walk is still finding "
+        "them; results are still reported in sorted order",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help="Only lint files added or modified since the merge base with REF",
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help="Lint the staged content of staged files (what will be committed)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-lint files (and files sourcing them) on change",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Stay resident and serve lint runs from this directory over a socket",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Lint in this process even if a lint daemon is running",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not read or write the cache"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory for cached results (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="Maximum number of cached results to keep",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=default_jobs(),
+        help="Number of files to lint in parallel (default: usable CPUs, "
+        "within the cgroup CPU and memory limits)",
+    )
+    parser.add_argument(
+        "--timeout",
+        metavar="SECONDS",
+        type=float,
+        help="Report a file as timed out if its tool spends longer than this "
+        "on it (default: no limit)",
+    )
+    parser.add_argument(
+        "--max-cpu",
+        metavar="SECONDS",
+        type=int,
+        help="CPU time limit per file for tool processes, reported as a "
+        "timeout (POSIX; set by the tool process before it starts, or with "
+        "prlimit just after where that is not possible)",
+    )
+    parser.add_argument(
+        "--max-memory",
+        metavar="MIB",
+        type=int,
+        help="Address space limit for each tool process (POSIX; set like --max-cpu)",
+    )
+    parser.add_argument(
+        "--max-diagnostics",
+        metavar="N",
+        type=int,
+        help="Report at most N diagnostics per file, stopping the tool early "
+        "where its output allows",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Stop at the first file with issues and cancel the remaining work",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(REPORTERS),
+        default="text",
+        help="Output format (default: text)",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="INDEX/COUNT",
+        type=parse_shard,
+        help="Lint only part INDEX of COUNT of the files, balanced by size or "
+        "--shard-timings, and write the results for 'merge'",
+    )
+    parser.add_argument(
+        "--shard-timings",
+        metavar="FILE",
+        help="Durations by path from 'merge --timings', to balance the shards",
+    )
+    parser.add_argument(
+        "--shard-output",
+        metavar="FILE",
+        help="Partial result file of --shard (default: lint-shard-INDEX-of-COUNT.json)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a timing summary and the slowest files to stderr",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write timing spans in Chrome trace event format (for Perfetto)",
+    )
+    # Set by the lint daemon to reuse discovery results between runs
+    parser.set_defaults(discovery_index=None)
+    return parser
+
+
+def validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Reject option combinations that cannot work together.
+
+    Args:
+        parser: Parser the arguments came from, used to report the error.
+        args: Parsed command-line arguments.
+    """
+    if args.staged and args.fix:
+        parser.error("--fix cannot be combined with --staged")
+    if args.max_diagnostics is not None and args.max_diagnostics < 1:
+        parser.error("--max-diagnostics must be at least 1")
+    if args.stream and (
+        args.staged or args.changed_since or args.shard or args.discovery == "git"
+    ):
+        parser.error(
+            "--stream only works with filesystem discovery, without "
+            "--staged, --changed-since, --shard or --discovery git"
+        )
+    if args.untracked and not (args.discovery == "git" or args.changed_since):
+        parser.error("--untracked requires --discovery git or --changed-since")
+    if args.watch and args.staged:
+        parser.error("--watch cannot be combined with --staged")
+    if args.watch and args.format == "sarif":
+        parser.error("--watch cannot be combined with --format sarif")
+    if args.watch and args.daemon:
+        parser.error("--watch cannot be combined with --daemon")
+    if args.watch and args.fail_fast:
+        parser.error("--watch cannot be combined with --fail-fast")
+    if args.watch and args.shard:
+        parser.error("--watch cannot be combined with --shard")
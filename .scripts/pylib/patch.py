@@ -0,0 +1,182 @@
+"""In-process unified diff application.
+
+Linters that emit fixes as unified diffs (``shellcheck --format=diff``)
+previously piped each diff into its own ``git apply`` process. This module
+parses the diff and applies hunks in memory, then writes every file once
+with an atomic rename, so fixing needs neither git nor a working tree.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, List
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# How far from its recorded position a hunk may still be applied, in lines
+_MAX_OFFSET = 100
+
+
+class PatchError(Exception):
+    """Raised when a diff cannot be parsed or does not apply."""
+
+
+class Hunk:
+    """One hunk of a unified diff."""
+
+    __slots__ = ("old_start", "old_lines", "new_lines", "old_left", "new_left")
+
+    def __init__(self, old_start: int, old_count: int, new_count: int):
+        self.old_start = old_start
+        self.old_lines: List[str] = []
+        self.new_lines: List[str] = []
+        # Lines still expected in the body, to tell body from headers
+        self.old_left = old_count
+        self.new_left = new_count
+
+    def open(self) -> bool:
+        """Whether the hunk body still expects lines."""
+        return self.old_left > 0 or self.new_left > 0
+
+    def add(self, line: str) -> None:
+        """Add a body line (with its ' ', '-' or '+' marker)."""
+        marker, text = line[0], line[1:]
+        if marker != "+":
+            self.old_lines.append(text)
+            self.old_left -= 1
+        if marker != "-":
+            self.new_lines.append(text)
+            self.new_left -= 1
+
+
+def _split_lines(text: str) -> List[str]:
+    """Split text after each newline only (str.splitlines also breaks on \\r)."""
+    lines = text.split("\n")
+    last = lines.pop()
+    return [line + "\n" for line in lines] + ([last] if last else [])
+
+
+def _target_path(header: str) -> str:
+    name = header[4:].split("\t", 1)[0].rstrip("\r\n")
+    return name[2:] if name.startswith("b/") else name
+
+
+def parse_unified_diff(text: str) -> Dict[str, List[Hunk]]:
+    """Parse a unified diff covering one or more files.
+
+    Args:
+        text: Diff text with ``--- a/<path>`` / ``+++ b/<path>`` headers.
+
+    Returns:
+        Hunks by target path, in diff order.
+
+    Raises:
+        PatchError: If the diff is malformed.
+    """
+    patches: Dict[str, List[Hunk]] = {}
+    hunks: List[Hunk] = []
+    hunk = None
+    marker = ""
+    for line in _split_lines(text):
+        if hunk is not None and hunk.open() and line[:1] in (" ", "-", "+"):
+            hunk.add(line)
+            marker = line[0]
+        elif line.startswith("\\") and hunk is not None:
+            # "\ No newline at end of file" applies to the previous line
+            lines = hunk.new_lines if marker == "+" else hunk.old_lines
+            lines[-1] = lines[-1].rstrip("\n")
+            if marker == " ":
+                hunk.new_lines[-1] = hunk.new_lines[-1].rstrip("\n")
+        elif line.startswith("+++ "):
+            hunks = patches.setdefault(_target_path(line), [])
+            hunk = None
+        elif line.startswith("@@"):
+            match = _HUNK_HEADER.match(line)
+            if match is None:
+                raise PatchError(f"Malformed hunk header: {line.strip()}")
+            hunk = Hunk(
+                int(match.group(1)),
+                int(match.group(2) or 1),
+                int(match.group(4) or 1),
+            )
+            hunks.append(hunk)
+    if hunk is not None and hunk.open():
+        raise PatchError("Truncated hunk at end of diff")
+    return patches
+
+
+def _locate(lines: List[str], hunk: Hunk, expected: int) -> int:
+    """Find where a hunk's old lines occur, nearest to the expected index."""
+    size = len(hunk.old_lines)
+    for delta in range(_MAX_OFFSET + 1):
+        for start in (expected - delta, expected + delta):
+            if 0 <= start <= len(lines) - size and (
+                lines[start : start + size] == hunk.old_lines
+            ):
+                return start
+    raise PatchError(f"Hunk at line {hunk.old_start} does not apply")
+
+
+def apply_hunks(lines: List[str], hunks: List[Hunk]) -> List[str]:
+    """Apply hunks to file content.
+
+    Args:
+        lines: File content split with line endings kept.
+        hunks: Hunks in file order.
+
+    Returns:
+        The patched lines.
+
+    Raises:
+        PatchError: If a hunk's context does not match the content.
+    """
+    result = list(lines)
+    # Lines added or removed by earlier hunks, plus any drift they matched at
+    shift = 0
+    for hunk in hunks:
+        # A zero-length old side records the line *before* the insertion
+        nominal = hunk.old_start - (1 if hunk.old_lines else 0)
+        start = _locate(result, hunk, nominal + shift)
+        result[start : start + len(hunk.old_lines)] = hunk.new_lines
+        shift = start - nominal + len(hunk.new_lines) - len(hunk.old_lines)
+    return result
+
+
+def write_atomic(path: str, content: str) -> None:
+    """Replace a file's content via a temporary file and rename.
+
+    The original file's permission bits are preserved.
+
+    Args:
+        path: File to replace.
+        content: New content.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(
+            fd, "w", encoding="utf-8", errors="surrogateescape", newline=""
+        ) as handle:
+            handle.write(content)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+def apply_patch(path: str, hunks: List[Hunk]) -> None:
+    """Apply hunks to a file on disk, writing it once.
+
+    Args:
+        path: File to patch.
+        hunks: Hunks for that file.
+
+    Raises:
+        PatchError: If the hunks do not apply.
+        OSError: If the file cannot be read or written.
+    """
+    with open(path, encoding="utf-8", errors="surrogateescape", newline="") as handle:
+        lines = _split_lines(handle.read())
+    write_atomic(path, "".join(apply_hunks(lines, hunks)))
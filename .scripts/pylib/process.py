@@ -0,0 +1,421 @@
+"""Running tool processes under limits.
+
+One huge generated script, or a tool that hangs, must not hold up a whole
+run. Commands that lint files can therefore be run with a wall-clock
+timeout, and on POSIX with CPU time (RLIMIT_CPU) and address space
+(RLIMIT_AS) limits, which the child sets on itself before it executes the
+tool, so even its first instructions run limited. Where a pre-exec hook
+cannot run, the limits are applied with prlimit just after the start. Time
+limits are given per file and scaled by the number of files a command
+lints, so batching files into one command does not tighten them. Tools
+run in their own process group, so stopping one, after a timeout or a
+--fail-fast cancellation, also stops anything it started.
+
+Output of linting commands can be streamed to a consumer as it is written
+rather than held until the process exits, so a file with tens of thousands
+of findings is parsed piece by piece, and the tool can be stopped once the
+consumer has seen enough (--max-diagnostics).
+"""
+
+import contextlib
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError, Executor, ThreadPoolExecutor
+from typing import IO, Any, Callable, Iterator, List, Optional, Tuple
+
+from .timing import PROCESS, STARTUP, TRACER, span
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Time a stopped process group gets to exit before it is killed, in seconds
+TERMINATE_GRACE = 1.0
+
+# How often a running tool process checks for cancellation, in seconds
+CANCEL_POLL = 0.1
+
+# Set to stop every running tool process (--fail-fast found an issue)
+CANCELLED = threading.Event()
+
+# Bytes read from a streamed process's output at a time
+STREAM_CHUNK = 64 * 1024
+
+# Chunks read ahead of the consumer before the reader waits for it
+STREAM_BACKLOG = 16
+
+
+class ProcessLimits:
+    """Limits applied to tool processes that lint files.
+
+    Attributes:
+        timeout: Wall-clock seconds per linted file, or None for no limit.
+        cpu: CPU seconds (RLIMIT_CPU) per linted file, or None for no limit.
+        memory: Bytes of address space (RLIMIT_AS), or None for no limit.
+        diagnostics: Diagnostics kept per file, or None for no limit. Tools
+            whose output is streamed are stopped once every file they check
+            has more.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        cpu: Optional[int] = None,
+        memory: Optional[int] = None,
+        diagnostics: Optional[int] = None,
+    ):
+        self.timeout = timeout
+        self.cpu = cpu
+        self.memory = memory
+        self.diagnostics = diagnostics
+
+    def for_files(self, files: int) -> "ProcessLimits":
+        """Return the limits of a process that lints a number of files."""
+        return ProcessLimits(
+            None if self.timeout is None else self.timeout * files,
+            None if self.cpu is None else self.cpu * files,
+            self.memory,
+            self.diagnostics,
+        )
+
+
+# Set from the command line; see run_process() and stream_process()
+LIMITS = ProcessLimits()
+
+_NO_LIMITS = ProcessLimits()
+
+
+def _rlimits(limits: ProcessLimits) -> List[Tuple[int, int, int]]:
+    """Return (resource, soft, hard) for the CPU and memory limits that are set."""
+    if resource is None:
+        return []
+    # The soft CPU limit sends SIGXCPU; the hard one a second later, SIGKILL
+    return [
+        (kind, soft, hard)
+        for kind, soft, hard in (
+            (resource.RLIMIT_CPU, limits.cpu, limits.cpu and limits.cpu + 1),
+            (resource.RLIMIT_AS, limits.memory, limits.memory),
+        )
+        if soft is not None
+    ]
+
+
+def _spawn(args: List[str], limits: ProcessLimits, **kwargs: Any) -> subprocess.Popen:
+    """Start a tool process in its own session, under CPU and memory limits.
+
+    The child sets the limits on itself between fork and exec. Popen needs
+    a full fork for that rather than vfork or posix_spawn, so the hook is
+    only installed when a limit is set. Where Python cannot run it (in a
+    subinterpreter), the limits are applied with prlimit once the process
+    has started.
+    """
+    rlimits = _rlimits(limits)
+
+    def set_rlimits() -> None:
+        for kind, soft, hard in rlimits:
+            # The limit may exceed the hard limit we inherited
+            with contextlib.suppress(OSError, ValueError):
+                resource.setrlimit(kind, (soft, hard))
+
+    try:
+        # The hook only calls setrlimit, which takes no locks after fork
+        return subprocess.Popen(  # pylint: disable=subprocess-popen-preexec-fn
+            args,
+            start_new_session=os.name == "posix",
+            preexec_fn=set_rlimits if rlimits else None,
+            **kwargs,
+        )
+    except RuntimeError:
+        if not rlimits:
+            raise
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        args, start_new_session=os.name == "posix", **kwargs
+    )
+    if hasattr(resource, "prlimit"):
+        for kind, soft, hard in rlimits:
+            # The process may have exited already, or the limit exceed ours
+            with contextlib.suppress(OSError, ValueError):
+                resource.prlimit(process.pid, kind, (soft, hard))
+    return process
+
+
+def terminate(process: subprocess.Popen) -> None:
+    """Stop a process and its process group.
+
+    The group is sent SIGTERM, and SIGKILL once the process has exited or
+    TERMINATE_GRACE has passed, so children holding its pipes open do not
+    outlive it. Elsewhere the process alone is killed.
+
+    Args:
+        process: A process started by run_process() or in a new session.
+    """
+    if os.name != "posix":
+        process.kill()
+        return
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(process.pid, signal.SIGTERM)
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            process.wait(TERMINATE_GRACE)
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def _check_cpu(process: subprocess.Popen, limits: ProcessLimits, command: str) -> None:
+    """Raise TimeoutExpired if a finished process hit its CPU time limit."""
+    # RLIMIT_CPU ends the process with SIGXCPU
+    if (
+        limits.cpu is not None
+        and hasattr(signal, "SIGXCPU")
+        and process.returncode == -signal.SIGXCPU
+    ):
+        raise subprocess.TimeoutExpired(command, limits.cpu)
+
+
+def run_process(
+    args: List[str],
+    input_data: Optional[Any] = None,
+    limited: bool = False,
+    files: int = 1,
+    **kwargs: Any,
+) -> subprocess.CompletedProcess:
+    """Run a command like subprocess.run(capture_output=True, check=False).
+
+    Launching (fork and exec) and execution are recorded as separate
+    spans; the tool's own startup is part of execution (see
+    measure_startup()). The process group is stopped if CANCELLED is set
+    while it runs.
+
+    Args:
+        args: Command and arguments.
+        input_data: Data for the process's standard input, if any.
+        limited: Apply LIMITS, for commands that lint files.
+        files: Number of files the command lints, scaling the time limits.
+        **kwargs: Further Popen arguments (cwd, text, encoding, env).
+
+    Returns:
+        The completed process with captured output.
+
+    Raises:
+        CancelledError: If CANCELLED was set before or while the command ran.
+        subprocess.TimeoutExpired: If the command exceeded its wall-clock or
+            CPU time limit.
+    """
+    if CANCELLED.is_set():
+        raise CancelledError()
+    limits = LIMITS.for_files(files) if limited else _NO_LIMITS
+    command = os.path.basename(args[0])
+    with span("launch", PROCESS, command=command):
+        process = _spawn(
+            args,
+            limits,
+            stdin=subprocess.PIPE if input_data is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **kwargs,
+        )
+    deadline = None if limits.timeout is None else time.monotonic() + limits.timeout
+    with process, span("execute", PROCESS, command=command):
+        try:
+            while True:
+                try:
+                    stdout, stderr = process.communicate(
+                        input_data, timeout=CANCEL_POLL
+                    )
+                    break
+                except subprocess.TimeoutExpired:
+                    # Later calls keep writing the input given to the first one
+                    input_data = None
+                    if CANCELLED.is_set():
+                        raise CancelledError() from None
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise subprocess.TimeoutExpired(
+                            command, limits.timeout
+                        ) from None
+        except BaseException:
+            # Ctrl+C included: the signal does not reach the tool's process group
+            terminate(process)
+            process.communicate()
+            raise
+    _check_cpu(process, limits, command)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+def _pump(stream: IO[bytes], chunks: "queue.Queue[bytes]") -> None:
+    """Move a pipe's data to a queue, ending with an empty chunk at EOF."""
+    try:
+        for chunk in iter(lambda: stream.read1(STREAM_CHUNK), b""):
+            chunks.put(chunk)
+    finally:
+        chunks.put(b"")
+
+
+def _feed(stream: IO[bytes], data: bytes) -> None:
+    """Write a process's input and close it; a stopped process ignores it."""
+    with contextlib.suppress(OSError), stream:
+        stream.write(data)
+
+
+def _start_readers(
+    process: subprocess.Popen,
+    chunks: "queue.Queue[bytes]",
+    stderr: List[bytes],
+    input_data: Optional[bytes],
+) -> List[threading.Thread]:
+    """Start the threads moving a streamed process's input and output."""
+    threads = [
+        threading.Thread(target=_pump, args=(process.stdout, chunks), daemon=True),
+        threading.Thread(
+            target=lambda: stderr.append(process.stderr.read()), daemon=True
+        ),
+    ]
+    if input_data is not None:
+        threads.append(
+            threading.Thread(
+                target=_feed, args=(process.stdin, input_data), daemon=True
+            )
+        )
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _join_readers(
+    chunks: "queue.Queue[bytes]", eof: bool, threads: List[threading.Thread]
+) -> None:
+    """Wait for a streamed process's helper threads, draining its output."""
+    # Unblock the reader, which may be waiting for room in the queue
+    while not eof:
+        eof = not chunks.get()
+    for thread in threads:
+        thread.join()
+
+
+def stream_process(
+    args: List[str],
+    consume: Callable[[bytes], bool],
+    input_data: Optional[bytes] = None,
+    limited: bool = False,
+    files: int = 1,
+    **kwargs: Any,
+) -> subprocess.CompletedProcess:
+    """Run a command, passing its standard output on as it is written.
+
+    Output is read in chunks of up to STREAM_CHUNK bytes by a helper thread
+    and handed to consume in the calling thread, so cancellation and the
+    time limits are checked while the tool runs, as in run_process(). The
+    reader waits while STREAM_BACKLOG chunks are pending, so a consumer that
+    falls behind slows the tool down rather than buffering its output.
+
+    Args:
+        args: Command and arguments.
+        consume: Called with each chunk of output; returns False to stop the
+            process group early, once the output seen so far is enough.
+        input_data: Bytes for the process's standard input, if any.
+        limited: Apply LIMITS, for commands that lint files.
+        files: Number of files the command lints, scaling the time limits.
+        **kwargs: Further Popen arguments (cwd, env); output is binary.
+
+    Returns:
+        The completed process, with the captured standard error and no
+        standard output. A process stopped by consume has a negative
+        return code.
+
+    Raises:
+        CancelledError: If CANCELLED was set before or while the command ran.
+        subprocess.TimeoutExpired: If the command exceeded its wall-clock or
+            CPU time limit.
+    """
+    if CANCELLED.is_set():
+        raise CancelledError()
+    limits = LIMITS.for_files(files) if limited else _NO_LIMITS
+    command = os.path.basename(args[0])
+    with span("launch", PROCESS, command=command):
+        process = _spawn(
+            args,
+            limits,
+            stdin=subprocess.PIPE if input_data is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **kwargs,
+        )
+    deadline = None if limits.timeout is None else time.monotonic() + limits.timeout
+    chunks: "queue.Queue[bytes]" = queue.Queue(STREAM_BACKLOG)
+    stderr: List[bytes] = []
+    threads = _start_readers(process, chunks, stderr, input_data)
+
+    with process, span("execute", PROCESS, command=command):
+        eof = False
+        try:
+            while not eof:
+                if CANCELLED.is_set():
+                    raise CancelledError()
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise subprocess.TimeoutExpired(command, limits.timeout)
+                try:
+                    chunk = chunks.get(timeout=CANCEL_POLL)
+                except queue.Empty:
+                    continue
+                eof = not chunk
+                if chunk and not consume(chunk):
+                    terminate(process)
+                    break
+        except BaseException:
+            # Ctrl+C included: the signal does not reach the tool's process group
+            terminate(process)
+            raise
+        finally:
+            _join_readers(chunks, eof, threads)
+            process.wait()
+    _check_cpu(process, limits, command)
+    return subprocess.CompletedProcess(
+        args, process.returncode, None, stderr[0] if stderr else b""
+    )
+
+
+def measure_startup(args: List[str]) -> None:
+    """Time a call that does no work, to estimate a tool's startup cost.
+
+    Only done while spans are recorded (--profile, --trace). The wait for
+    the process is recorded as a STARTUP span named "no-op", which the
+    profile summary counts once for every run of the command.
+
+    Args:
+        args: Command that starts the tool and exits at once, such as
+            ``shellcheck --version``.
+    """
+    if not TRACER.enabled:
+        return
+    with (
+        contextlib.suppress(OSError),
+        subprocess.Popen(
+            args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ) as process,
+        span("no-op", STARTUP, command=os.path.basename(args[0])),
+    ):
+        process.wait()
+
+
+@contextlib.contextmanager
+def worker_pool(jobs: int) -> Iterator[Optional[Executor]]:
+    """Create the thread pool tool invocations run on, if jobs > 1.
+
+    Args:
+        jobs: Maximum number of concurrent tool invocations.
+
+    Yields:
+        The pool, or None to run everything in the calling thread.
+    """
+    if jobs <= 1:
+        yield None
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            yield pool
+        except BaseException:
+            # Stop running tools rather than wait for them, as on Ctrl+C
+            CANCELLED.set()
+            raise
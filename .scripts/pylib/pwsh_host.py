@@ -0,0 +1,340 @@
+"""Long-lived PowerShell worker for PSScriptAnalyzer.
+
+Starting pwsh and importing PSScriptAnalyzer costs about a second, so
+instead of one ``pwsh -Command`` per file this module keeps a worker
+process that loads the module and the settings file once and then answers
+analyze/fix requests. Requests and responses are single-line JSON messages
+over the worker's stdin/stdout, and paths travel as data rather than being
+spliced into PowerShell source. Diagnostics are sent one message each as
+the analyzer yields them, followed by a final response, and a request may
+ask for only the first few, which stops the analyzer's pipeline early.
+A request running past the per-file timeout, or still running when
+--fail-fast cancels the run, stops the worker, which is restarted for the
+next request.
+"""
+
+import base64
+import contextlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError
+from typing import Any, Dict, Iterator, List, Optional
+
+from .process import CANCEL_POLL, CANCELLED, LIMITS, terminate
+from .timing import PROCESS, STARTUP, span
+
+# Worker loop. The settings file path is passed in the environment.
+HOST_SCRIPT = r"""
+$ErrorActionPreference = 'Stop'
+$utf8 = [System.Text.UTF8Encoding]::new($false)
+[Console]::InputEncoding = $utf8
+[Console]::OutputEncoding = $utf8
+
+function Send-Message($Message) {
+    [Console]::Out.WriteLine(($Message | ConvertTo-Json -Compress -Depth 5))
+    [Console]::Out.Flush()
+}
+
+try {
+    Import-Module PSScriptAnalyzer
+    $module = Get-Module PSScriptAnalyzer
+    $settings = $null
+    if ($env:PWSHLINT_SETTINGS) {
+        $settings = Import-PowerShellDataFile -LiteralPath $env:PWSHLINT_SETTINGS
+    }
+} catch {
+    Send-Message @{ ready = $false; error = $_.Exception.Message }
+    exit 1
+}
+Send-Message @{ ready = $true; version = $module.Version.ToString() }
+
+while ($null -ne ($line = [Console]::In.ReadLine())) {
+    $request = $line | ConvertFrom-Json
+    $response = @{ id = $request.id }
+    try {
+        $params = @{ ErrorAction = 'SilentlyContinue' }
+        if ($null -ne $request.script) {
+            $params.ScriptDefinition = $request.script
+        } else {
+            $params.Path = $request.path
+        }
+        if ($null -ne $settings) { $params.Settings = $settings }
+        if ($request.op -eq 'fix') { $params.Fix = $true }
+        $limit = if ($request.limit) { [int]$request.limit } else { [int]::MaxValue }
+        Invoke-ScriptAnalyzer @params | Select-Object -First $limit | ForEach-Object {
+            Send-Message @{
+                id = $request.id
+                diagnostic = @{
+                    line = $_.Line
+                    column = $_.Column
+                    end_line = $_.Extent.EndLineNumber
+                    end_column = $_.Extent.EndColumnNumber
+                    severity = $_.Severity.ToString()
+                    rule = $_.RuleName
+                    message = $_.Message
+                    fixable = [bool]$_.SuggestedCorrections
+                }
+            }
+        }
+    } catch {
+        $response.error = $_.Exception.Message
+    }
+    Send-Message $response
+}
+"""
+
+HOST_COMMAND = ["pwsh", "-NoLogo", "-NoProfile", "-NonInteractive", "-EncodedCommand"]
+
+
+class PwshHostError(Exception):
+    """Raised when the PowerShell worker fails or rejects a request."""
+
+
+class PwshHostTimeout(PwshHostError):
+    """Raised when a request exceeds the per-file timeout."""
+
+
+class PwshHost:
+    """A single PowerShell worker process."""
+
+    def __init__(self, settings_file: Optional[str] = None):
+        """Initialize the worker handle; the process starts on first use.
+
+        Args:
+            settings_file: PSScriptAnalyzer settings file to load, if any.
+        """
+        self.settings_file = settings_file
+        self.version = ""
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr: Any = None
+        self._next_id = 0
+        self._expired = False
+        self._cancelled = False
+
+    def start(self) -> None:
+        """Start the worker and wait until PSScriptAnalyzer is loaded.
+
+        Raises:
+            PwshHostError: If pwsh cannot start or the module fails to load.
+        """
+        env = dict(os.environ)
+        if self.settings_file:
+            env["PWSHLINT_SETTINGS"] = self.settings_file
+        encoded = base64.b64encode(HOST_SCRIPT.encode("utf-16-le")).decode("ascii")
+        self._stderr = tempfile.TemporaryFile()  # noqa: SIM115  # closed in close()
+        try:
+            with span("launch", PROCESS, command="pwsh"):
+                self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+                    [*HOST_COMMAND, encoded],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=self._stderr,
+                    env=env,
+                    text=True,
+                    encoding="utf-8",
+                    start_new_session=os.name == "posix",
+                )
+        except OSError as exc:
+            raise PwshHostError(f"Could not start pwsh: {exc}") from exc
+
+        # Loading pwsh and PSScriptAnalyzer is the startup cost the worker saves
+        with span("ready handshake", STARTUP, command="pwsh"):
+            ready = self._receive()
+        if not ready.get("ready"):
+            self.close()
+            raise PwshHostError(ready.get("error") or "PSScriptAnalyzer failed to load")
+        self.version = ready.get("version", "")
+
+    def _receive(self) -> Dict[str, Any]:
+        """Read one message from the worker.
+
+        Lines that are not JSON objects (for example warnings PowerShell
+        writes to the console) are skipped.
+        """
+        assert self._process is not None and self._process.stdout is not None
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                if self._cancelled:
+                    self.close()
+                    raise CancelledError()
+                if self._expired:
+                    self.close()
+                    raise PwshHostTimeout(f"Timed out after {LIMITS.timeout:g} seconds")
+                raise PwshHostError(self._failure())
+            if line.startswith("{"):
+                break
+        try:
+            return json.loads(line)
+        except ValueError as exc:
+            raise PwshHostError(f"Unexpected output from pwsh: {line.strip()}") from exc
+
+    def _failure(self) -> str:
+        """Describe why the worker stopped answering and discard it.
+
+        The next request starts a fresh worker.
+        """
+        assert self._process is not None
+        code = self._process.wait()
+        details = ""
+        if self._stderr is not None:
+            self._stderr.seek(0)
+            details = self._stderr.read().decode("utf-8", "replace").strip()
+        self.close()
+        return f"pwsh worker exited with code {code}" + (
+            f": {details}" if details else ""
+        )
+
+    def request(
+        self,
+        op: str,
+        path: str,
+        script: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run Invoke-ScriptAnalyzer on a file in the worker.
+
+        Args:
+            op: "analyze" to report diagnostics, "fix" to apply fixes.
+            path: Path to the script.
+            script: Script text to analyze instead of reading path (passed
+                as -ScriptDefinition; analyze only).
+            limit: Stop the analysis after this many diagnostics (analyze
+                only).
+
+        Returns:
+            Diagnostic objects with line, column, end_line, end_column,
+            severity, rule, message and whether a suggested correction exists
+            (fixable).
+
+        Raises:
+            CancelledError: If CANCELLED was set before or while the request
+                ran.
+            PwshHostTimeout: If the request ran longer than LIMITS.timeout.
+            PwshHostError: If the worker fails or the analyzer raises.
+        """
+        if CANCELLED.is_set():
+            raise CancelledError()
+        if self._expired or self._cancelled:
+            # Stopped just after the previous response
+            self.close()
+        if self._process is None:
+            self.start()
+        assert self._process is not None and self._process.stdin is not None
+        self._next_id += 1
+        message: Dict[str, Any] = {
+            "id": self._next_id,
+            "op": op,
+            "path": os.path.abspath(path),
+        }
+        if script is not None:
+            message["script"] = script
+        if limit is not None:
+            message["limit"] = limit
+        process = self._process
+        # Stopping the worker ends the pending read
+        done = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watch, args=(process, done), daemon=True
+        )
+        watchdog.start()
+        with span("execute", PROCESS, command="pwsh worker", op=op):
+            try:
+                process.stdin.write(json.dumps(message) + "\n")
+                process.stdin.flush()
+                diagnostics = []
+                response = self._receive()
+                while "diagnostic" in response and response.get("id") == self._next_id:
+                    diagnostics.append(response["diagnostic"])
+                    response = self._receive()
+            except OSError as exc:
+                raise PwshHostError(self._failure()) from exc
+            finally:
+                done.set()
+        if response.get("id") != self._next_id:
+            raise PwshHostError("pwsh worker answered out of order")
+        if response.get("error"):
+            raise PwshHostError(response["error"])
+        return diagnostics
+
+    def _watch(self, process: subprocess.Popen, done: threading.Event) -> None:
+        """Stop the worker if its request is cancelled or runs out of time.
+
+        Runs until done is set, checking every CANCEL_POLL seconds.
+        """
+        deadline = None
+        if LIMITS.timeout is not None:
+            deadline = time.monotonic() + LIMITS.timeout
+        while not done.wait(CANCEL_POLL):
+            if CANCELLED.is_set():
+                self._cancelled = True
+            elif deadline is not None and time.monotonic() >= deadline:
+                self._expired = True
+            else:
+                continue
+            terminate(process)
+            return
+
+    def close(self) -> None:
+        """Stop the worker process."""
+        if self._process is not None:
+            try:
+                if self._process.stdin is not None:
+                    self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+        self._expired = False
+        self._cancelled = False
+
+
+class PwshHostPool:
+    """Idle PwshHost workers shared by the threads that lint.
+
+    A worker is lent to one thread at a time and returned when its request
+    finishes, so the pool never holds more workers than requests ever ran
+    at once, however many thread pools a resident linter goes through.
+    """
+
+    def __init__(self, settings_file: Optional[str] = None):
+        """Initialize an empty pool.
+
+        Args:
+            settings_file: PSScriptAnalyzer settings file for every worker.
+        """
+        self.settings_file = settings_file
+        self._idle: List[PwshHost] = []
+        self._hosts: List[PwshHost] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def host(self) -> Iterator[PwshHost]:
+        """Lend an idle worker to the caller, starting one if none is idle."""
+        with self._lock:
+            host = self._idle.pop() if self._idle else None
+        if host is None:
+            host = PwshHost(self.settings_file)
+            with self._lock:
+                self._hosts.append(host)
+        try:
+            yield host
+        finally:
+            with self._lock:
+                if host in self._hosts:
+                    self._idle.append(host)
+
+    def close(self) -> None:
+        """Stop every worker in the pool."""
+        with self._lock:
+            hosts, self._hosts, self._idle = self._hosts, [], []
+        for host in hosts:
+            host.close()
@@ -0,0 +1,369 @@
+"""Result reporters for linters.
+
+A reporter receives each file's result as soon as it is known and writes
+it out immediately, so memory use does not grow with the number of files.
+Three formats are available:
+
+- text: the tool's own diagnostics layout with colored status lines
+- json: one JSON object per file per line, followed by a summary line
+- sarif: a SARIF 2.1.0 log, written incrementally
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+from typing import Any, ContextManager, Dict, List, Optional, TextIO
+from urllib.parse import quote
+
+from .timing import TRACER
+
+SARIF_VERSION = "2.1.0"
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+# Tool severities mapped onto a shared vocabulary
+_SEVERITIES = {
+    "error": "error",
+    "parseerror": "error",
+    "warning": "warning",
+    "info": "info",
+    "information": "info",
+    "style": "style",
+}
+
+_SARIF_LEVELS = {"error": "error", "warning": "warning"}
+
+
+class Colors:
+    """ANSI color codes for terminal output."""
+
+    RESET = "\033[0m"
+    RED = "\033[31m"
+    GREEN = "\033[32m"
+    YELLOW = "\033[33m"
+    GRAY = "\033[90m"
+    WHITE = "\033[37m"
+
+
+def normalize_severity(value: str) -> str:
+    """Map a tool's severity name to error, warning, info or style."""
+    return _SEVERITIES.get(value.lower(), "warning")
+
+
+class Diagnostic:  # pylint: disable=too-many-instance-attributes
+    """A single issue reported by a tool.
+
+    The path is not stored: results are cached by content, so the same
+    record may belong to several files.
+    """
+
+    __slots__ = (
+        "line",
+        "column",
+        "end_line",
+        "end_column",
+        "severity",
+        "rule",
+        "message",
+        "fixable",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        line: int,
+        column: int,
+        severity: str,
+        rule: str,
+        message: str,
+        end_line: Optional[int] = None,
+        end_column: Optional[int] = None,
+        fixable: bool = False,
+    ):
+        self.line = line
+        self.column = column
+        self.end_line = end_line
+        self.end_column = end_column
+        self.severity = normalize_severity(severity)
+        self.rule = rule
+        self.message = message
+        self.fixable = fixable
+
+    def to_row(self) -> List[Any]:
+        """Return the fields as a compact list, for the cache."""
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row: List[Any]) -> "Diagnostic":
+        """Rebuild a diagnostic from to_row() data."""
+        line, column, end_line, end_column, severity, rule, message, fixable = row
+        return cls(line, column, severity, rule, message, end_line, end_column, fixable)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the fields as a JSON object, omitting unknown end positions."""
+        return {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        }
+
+
+def _plain(text: str) -> str:
+    return _ANSI.sub("", text).strip()
+
+
+class Reporter:
+    """Base class for reporters; writes nothing.
+
+    Calls arrive as open(), then start() / result()... / end() for each
+    linter, then summary() and close().
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        """Initialize the reporter.
+
+        Args:
+            stream: Output stream (default: standard output).
+        """
+        self.stream = stream or sys.stdout
+        self.name = ""
+        self.version = ""
+
+    def _write(self, text: str) -> None:
+        self.stream.write(text)
+        self.stream.flush()
+
+    def open(self) -> None:
+        """Called once before the first linter starts."""
+
+    def start(self, name: str, version: str = "") -> None:
+        """Called before a linter's first result.
+
+        Args:
+            name: Linter name.
+            version: Version of the underlying tool, if known.
+        """
+        self.name = name
+        self.version = version
+
+    def result(self, file_path: str, result: Any) -> None:
+        """Write the result for one file.
+
+        Args:
+            file_path: Path to the linted file.
+            result: The file's LintResult.
+        """
+
+    def end(self) -> None:
+        """Called after a linter's last result."""
+
+    def summary(self, name: str, file_count: int, has_issues: bool, fix: bool) -> None:
+        """Write the outcome of the whole run.
+
+        Args:
+            name: Name of the linter, or linters, the summary refers to.
+            file_count: Number of files checked.
+            has_issues: Whether any file had issues.
+            fix: Whether automatic fixes were requested.
+        """
+
+    def close(self) -> None:
+        """Called once at the end of the output."""
+
+    def no_files(self, name: str) -> None:
+        """Report a run that found nothing to lint.
+
+        Args:
+            name: Name of the linter, or linters, that found no files.
+        """
+        self.open()
+        self.summary(name, 0, False, False)
+        self.close()
+
+
+class TextReporter(Reporter):
+    """Human-readable output in each tool's own layout."""
+
+    def start(self, name: str, version: str = "") -> None:
+        super().start(name, version)
+        self._write(f"{name}: Linting files...\n\n")
+
+    def result(self, file_path: str, result: Any) -> None:
+        lines = list(result.messages)
+        if result.timed_out:
+            lines.append(f"{Colors.YELLOW}TIMEOUT: {file_path}{Colors.RESET}")
+            lines.append(result.output)
+        elif result.has_issues:
+            lines.append(f"{Colors.WHITE}{file_path}{Colors.RESET}")
+            lines.append(result.output)
+            if result.truncated:
+                lines.append(
+                    f"{Colors.YELLOW}  Showing the first {len(result.diagnostics)} "
+                    f"diagnostics (--max-diagnostics){Colors.RESET}"
+                )
+        else:
+            lines.append(f"{Colors.GRAY}  OK: {file_path}{Colors.RESET}")
+        self._write("".join(f"{line}\n" for line in lines))
+
+    def summary(self, name: str, file_count: int, has_issues: bool, fix: bool) -> None:
+        lines = ["", f"Checked {file_count} file(s)"]
+        if not has_issues:
+            lines.append(f"{Colors.GREEN}[OK] All files are clean{Colors.RESET}")
+        elif fix:
+            lines.append("")
+            lines.append(
+                f"{Colors.YELLOW}[WARN] Some issues could not be auto-fixed{Colors.RESET}"
+            )
+            lines.append("Please review and fix them manually")
+        else:
+            lines.append(f"{Colors.RED}[FAIL] {name} found issues{Colors.RESET}")
+            lines.append("Run with --fix to apply automatic fixes")
+        self._write("".join(f"{line}\n" for line in lines))
+
+    def no_files(self, name: str) -> None:
+        self._write(f"{Colors.YELLOW}No {name} files found to lint{Colors.RESET}\n")
+
+
+class JsonReporter(Reporter):
+    """JSON Lines: a tool object per linter, one object per file, a summary."""
+
+    def start(self, name: str, version: str = "") -> None:
+        super().start(name, version)
+        self._write(json.dumps({"tool": {"name": name, "version": version}}) + "\n")
+
+    def result(self, file_path: str, result: Any) -> None:
+        record: Dict[str, Any] = {
+            "path": file_path.replace(os.sep, "/"),
+            "tool": self.name,
+            "has_issues": result.has_issues,
+            "fixable": result.fixable,
+            "diagnostics": [d.to_dict() for d in result.diagnostics],
+        }
+        if result.messages:
+            record["notes"] = [_plain(message) for message in result.messages]
+        if result.timed_out:
+            record["timed_out"] = True
+        if result.truncated:
+            record["truncated"] = True
+        if result.has_issues and not result.diagnostics:
+            # The tool failed rather than reporting issues
+            record["error"] = _plain(result.output)
+        self._write(json.dumps(record) + "\n")
+
+    def summary(self, name: str, file_count: int, has_issues: bool, fix: bool) -> None:
+        summary = {
+            "tool": name,
+            "files": file_count,
+            "has_issues": has_issues,
+            "fix": fix,
+        }
+        self._write(json.dumps({"summary": summary}) + "\n")
+
+
+class SarifReporter(Reporter):
+    """SARIF 2.1.0 log with one run per linter, streamed result by result."""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        super().__init__(stream)
+        self._run_separator = ""
+        self._separator = ""
+        # Tool failures are few; they are reported as notifications at the end
+        self._failures: List[Dict[str, Any]] = []
+
+    def open(self) -> None:
+        header = json.dumps(
+            {"version": SARIF_VERSION, "$schema": SARIF_SCHEMA}, separators=(",", ":")
+        )
+        self._write(f'{header[:-1]},"runs":[\n')
+
+    def start(self, name: str, version: str = "") -> None:
+        super().start(name, version)
+        driver: Dict[str, Any] = {"name": name}
+        if version:
+            driver["version"] = version
+        run = json.dumps({"tool": {"driver": driver}}, separators=(",", ":"))
+        self._write(f'{self._run_separator}{run[:-1]},"results":[\n')
+        self._run_separator = ",\n"
+        self._separator = ""
+        self._failures = []
+
+    def result(self, file_path: str, result: Any) -> None:
+        uri = quote(file_path.replace(os.sep, "/"))
+        if result.has_issues and not result.diagnostics:
+            failure = {
+                "level": "error",
+                "message": {"text": _plain(result.output) or "Linting failed"},
+                "locations": [{"physicalLocation": {"artifactLocation": {"uri": uri}}}],
+            }
+            if result.timed_out:
+                failure["descriptor"] = {"id": "timeout"}
+            self._failures.append(failure)
+            return
+        records = []
+        for diagnostic in result.diagnostics:
+            region = {"startLine": diagnostic.line, "startColumn": diagnostic.column}
+            if diagnostic.end_line is not None:
+                region["endLine"] = diagnostic.end_line
+            if diagnostic.end_column is not None:
+                region["endColumn"] = diagnostic.end_column
+            record = {
+                "ruleId": diagnostic.rule,
+                "level": _SARIF_LEVELS.get(diagnostic.severity, "note"),
+                "message": {"text": diagnostic.message},
+                "locations": [
+                    {
+                        "physicalLocation": {
+                            "artifactLocation": {"uri": uri},
+                            "region": region,
+                        }
+                    }
+                ],
+            }
+            records.append(self._separator + json.dumps(record))
+            self._separator = ",\n"
+        if records:
+            self._write("".join(records))
+
+    def end(self) -> None:
+        invocation: Dict[str, Any] = {"executionSuccessful": not self._failures}
+        if self._failures:
+            invocation["toolExecutionNotifications"] = self._failures
+        self._write(f'\n],"invocations":[{json.dumps(invocation)}]}}')
+
+    def close(self) -> None:
+        self._write("\n]}\n")
+
+
+REPORTERS = {"text": TextReporter, "json": JsonReporter, "sarif": SarifReporter}
+
+
+def status_output(args: argparse.Namespace) -> ContextManager[Any]:
+    """Send status and error messages to stderr for machine-readable formats.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Returns:
+        Context manager redirecting standard output where needed.
+    """
+    if args.format == "text":
+        return contextlib.nullcontext()
+    return contextlib.redirect_stdout(sys.stderr)
+
+
+def write_timing(args: argparse.Namespace) -> None:
+    """Print the --profile summary and write the --trace file, if asked.
+
+    Args:
+        args: Parsed command-line arguments.
+    """
+    if args.profile:
+        print(TRACER.summary(), file=sys.stderr)
+    if args.trace and not TRACER.write_trace(args.trace):
+        print(
+            f"{Colors.YELLOW}Could not write trace to {args.trace}{Colors.RESET}",
+            file=sys.stderr,
+        )
@@ -0,0 +1,273 @@
+"""Work scheduling for linters.
+
+Two concerns live here:
+
+- How many workers to run. ``os.cpu_count()`` reports the host's CPUs,
+  but a container is often limited to a fraction of them by a cgroup CPU
+  quota, and running more tool processes than the quota allows only adds
+  throttling. The memory limit caps the count as well, since every worker
+  may hold a tool process.
+- How to batch and order work. Batches are bounded by the command-line
+  length limit. Durations from earlier runs (kept in the result cache)
+  give each file an estimated cost; batches are balanced by cost and
+  submitted longest first, so the pool does not end up waiting on one
+  slow file picked up last.
+"""
+
+import heapq
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Memory to allow for each worker's tool process
+WORKER_MEMORY = 256 * 1024 * 1024
+
+_CGROUP_ROOT = "/sys/fs/cgroup"
+
+# cgroup v1 quotas and "max" in cgroup v2 at or above this mean unlimited
+_UNLIMITED = 1 << 60
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return handle.readline().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(controller: str) -> List[str]:
+    """Return the cgroup directories of this process for a controller.
+
+    The process's own group comes first, followed by its ancestors, since
+    a limit set on any of them applies.
+    """
+    relative = None
+    try:
+        with open("/proc/self/cgroup", encoding="utf-8") as handle:
+            for line in handle:
+                _, controllers, path = line.rstrip("\n").split(":", 2)
+                if controllers == "" and relative is None:
+                    relative = ("", path)
+                elif controller in controllers.split(","):
+                    relative = (controllers, path)
+    except (OSError, ValueError):
+        return []
+    if relative is None:
+        return []
+    mount = os.path.join(_CGROUP_ROOT, relative[0])
+    if relative[0] and not os.path.isdir(mount):
+        mount = os.path.join(_CGROUP_ROOT, controller)
+    parts = [part for part in relative[1].split("/") if part]
+    dirs = [os.path.join(mount, *parts[:depth]) for depth in range(len(parts), -1, -1)]
+    return [directory for directory in dirs if os.path.isdir(directory)]
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Return the CPU quota of this process's cgroup, in CPUs.
+
+    Returns:
+        The smallest quota on the cgroup path, or None if unlimited.
+    """
+    limits = []
+    for directory in _cgroup_dirs("cpu"):
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        fields = (_read_first_line(os.path.join(directory, "cpu.max")) or "").split()
+        if len(fields) == 2 and fields[0] != "max":
+            limits.append(int(fields[0]) / int(fields[1]))
+            continue
+        # cgroup v1: quota is -1 when unlimited
+        quota = _read_first_line(os.path.join(directory, "cpu.cfs_quota_us"))
+        period = _read_first_line(os.path.join(directory, "cpu.cfs_period_us"))
+        if quota and period and int(quota) > 0 and int(period) > 0:
+            limits.append(int(quota) / int(period))
+    return min(limits) if limits else None
+
+
+def cgroup_memory_limit() -> Optional[int]:
+    """Return the memory limit of this process's cgroup, in bytes.
+
+    Returns:
+        The smallest limit on the cgroup path, or None if unlimited.
+    """
+    limits = []
+    for directory in _cgroup_dirs("memory"):
+        for name in ("memory.max", "memory.limit_in_bytes"):
+            value = _read_first_line(os.path.join(directory, name))
+            if value and value.isdigit() and int(value) < _UNLIMITED:
+                limits.append(int(value))
+    return min(limits) if limits else None
+
+
+def default_jobs() -> int:
+    """Return the number of workers to run by default.
+
+    Returns:
+        Usable CPUs (scheduler affinity, else os.cpu_count()), capped by the
+        cgroup CPU quota (rounded up) and by the memory limit, at least 1.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        jobs = len(os.sched_getaffinity(0))
+    else:
+        jobs = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota is not None:
+        jobs = min(jobs, -int(-quota // 1))
+    memory = cgroup_memory_limit()
+    if memory is not None:
+        jobs = min(jobs, memory // WORKER_MEMORY)
+    return max(1, jobs)
+
+
+def argv_budget() -> int:
+    """Return a conservative byte budget for a child process command line.
+
+    Returns:
+        Bytes available for arguments, leaving room for the environment.
+    """
+    if os.name == "nt":
+        # CreateProcess limits the whole command line to 32767 characters
+        return 32000
+    try:
+        limit = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        limit = 131072
+    environment = sum(len(k) + len(v) + 2 for k, v in os.environ.items())
+    return max(4096, min(limit, 1 << 20) - environment - 4096)
+
+
+def split_batches(
+    file_paths: List[str], base_args: List[str], jobs: int
+) -> List[List[str]]:
+    """Split files into command-line batches bounded by argv length.
+
+    Batches are also kept small enough that every worker gets one.
+
+    Args:
+        file_paths: Paths to distribute.
+        base_args: The command and flags preceding the file arguments.
+        jobs: Number of workers the batches will be spread over.
+
+    Returns:
+        List of non-empty batches, preserving the order of file_paths.
+    """
+    if not file_paths:
+        return []
+    budget = argv_budget() - sum(len(arg) + 9 for arg in base_args)
+    per_worker = -(-len(file_paths) // max(1, jobs))
+    batches: List[List[str]] = [[]]
+    used = 0
+    for file_path in file_paths:
+        # Each argument costs its bytes, a NUL terminator and a pointer
+        cost = len(os.fsencode(file_path)) + 9
+        if batches[-1] and (used + cost > budget or len(batches[-1]) >= per_worker):
+            batches.append([])
+            used = 0
+        batches[-1].append(file_path)
+        used += cost
+    return batches
+
+
+def estimate_costs(
+    file_paths: List[str], history: Callable[[str], Optional[float]]
+) -> Dict[str, float]:
+    """Estimate how long each file takes to lint.
+
+    Files linted before are expected to take as long as they did then.
+    Others are estimated from their size, at the seconds-per-byte rate of
+    the known files; when no file is known, sizes alone rank the files.
+
+    Args:
+        file_paths: Paths to estimate.
+        history: Returns a file's recorded duration in seconds, or None.
+
+    Returns:
+        Estimated cost by path.
+    """
+    sizes = {}
+    for file_path in file_paths:
+        try:
+            sizes[file_path] = os.path.getsize(file_path)
+        except OSError:
+            sizes[file_path] = 0
+    known = {path: history(path) for path in file_paths}
+    known = {path: seconds for path, seconds in known.items() if seconds is not None}
+    known_bytes = sum(sizes[path] for path in known)
+    if not known:
+        rate = 1.0
+    elif known_bytes:
+        rate = sum(known.values()) / known_bytes
+    else:
+        rate = 0.0
+    fallback = sum(known.values()) / len(known) if known else 0.0
+    return {
+        path: known.get(path, sizes[path] * rate or fallback) for path in file_paths
+    }
+
+
+def apportion(file_paths: List[str], seconds: float) -> Dict[str, float]:
+    """Split the duration of a batch between its files by their size.
+
+    Args:
+        file_paths: Files linted together.
+        seconds: How long the batch took.
+
+    Returns:
+        Share of the duration by path; equal shares if all files are empty.
+    """
+    sizes = {}
+    for file_path in file_paths:
+        try:
+            sizes[file_path] = os.path.getsize(file_path)
+        except OSError:
+            sizes[file_path] = 0
+    total = sum(sizes.values())
+    if not total:
+        return {path: seconds / len(file_paths) for path in file_paths}
+    return {path: seconds * size / total for path, size in sizes.items()}
+
+
+def longest_first(batches: List[List[str]], costs: Dict[str, float]) -> List[int]:
+    """Return batch numbers ordered by total estimated cost, largest first."""
+    totals = [sum(costs.get(path, 0.0) for path in batch) for batch in batches]
+    return sorted(range(len(batches)), key=lambda number: -totals[number])
+
+
+def balance(
+    units: List[List[str]], costs: Dict[str, float], bins: int
+) -> List[List[str]]:
+    """Spread units of work over bins of similar total estimated cost.
+
+    Units are kept whole unless one costs more than a bin's fair share, in
+    which case it is cut into consecutive pieces. Pieces are then dealt
+    longest first to the least loaded bin (the LPT rule).
+
+    Args:
+        units: Lists of paths that should preferably run together.
+        costs: Estimated cost by path.
+        bins: Number of bins, usually the number of workers.
+
+    Returns:
+        Non-empty bins of paths.
+    """
+    share = sum(costs.get(path, 0.0) for unit in units for path in unit) / max(1, bins)
+    pieces: List[Tuple[float, List[str]]] = []
+    for unit in units:
+        piece: List[str] = []
+        load = 0.0
+        for path in unit:
+            cost = costs.get(path, 0.0)
+            if piece and load + cost > share:
+                pieces.append((load, piece))
+                piece, load = [], 0.0
+            piece.append(path)
+            load += cost
+        if piece:
+            pieces.append((load, piece))
+
+    groups: List[List[str]] = [[] for _ in range(max(1, min(bins, len(pieces))))]
+    heap = [(0.0, number) for number in range(len(groups))]
+    for load, piece in sorted(pieces, key=lambda item: -item[0]):
+        total, number = heapq.heappop(heap)
+        groups[number].extend(piece)
+        heapq.heappush(heap, (total + load, number))
+    return [group for group in groups if group]
@@ -0,0 +1,312 @@
+"""Splitting a lint run across CI nodes.
+
+With ``--shard INDEX/COUNT`` a run lints one of COUNT disjoint parts of the
+discovered files. Every node computes the same partition from the same
+checkout: files are weighted by the durations in a --shard-timings file
+shared by the nodes, or by size where the file has no entry, and dealt
+largest first to the lightest shard. Durations from the local result cache
+are not used, since they differ from node to node.
+
+Each shard writes its results to a partial result file. The ``merge``
+subcommand reads the partial files of all shards and reports them as one
+run with one exit code; ``merge --timings`` also writes the durations the
+shards recorded, for the next run's --shard-timings.
+"""
+
+import argparse
+import heapq
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import read_json, write_json_atomic
+from .report import REPORTERS, Colors, Reporter
+from .schedule import estimate_costs
+
+PARTIAL_FORMAT = 1
+DEFAULT_PARTIAL = "lint-shard-{index}-of-{count}.json"
+
+# (index, count), with index counted from 1
+Shard = Tuple[int, int]
+
+
+def parse_shard(value: str) -> Shard:
+    """Parse an INDEX/COUNT shard argument.
+
+    Raises:
+        argparse.ArgumentTypeError: If value is not INDEX/COUNT with
+            1 <= INDEX <= COUNT.
+    """
+    index, _, count = value.partition("/")
+    if not (index.isdigit() and count.isdigit() and 1 <= int(index) <= int(count)):
+        raise argparse.ArgumentTypeError(
+            f"expected INDEX/COUNT with 1 <= INDEX <= COUNT, got {value!r}"
+        )
+    return int(index), int(count)
+
+
+def partition(
+    file_paths: List[str], costs: Dict[str, float], count: int
+) -> List[List[str]]:
+    """Split files into count parts of similar total cost.
+
+    Ties are broken by path and shard number, so equal inputs give equal
+    partitions on every node.
+
+    Args:
+        file_paths: Paths to split.
+        costs: Estimated cost by path.
+        count: Number of parts.
+
+    Returns:
+        Exactly count lists of sorted paths, some possibly empty.
+    """
+    parts: List[List[str]] = [[] for _ in range(count)]
+    heap = [(0.0, number) for number in range(count)]
+    for path in sorted(file_paths, key=lambda path: (-costs[path], path)):
+        load, number = heapq.heappop(heap)
+        parts[number].append(path)
+        heapq.heappush(heap, (load + costs[path], number))
+    return [sorted(part) for part in parts]
+
+
+def select_shard(
+    file_paths: List[str], shard: Shard, timings_path: Optional[str] = None
+) -> List[str]:
+    """Return the files of one shard.
+
+    Args:
+        file_paths: Every discovered path, as given on all nodes.
+        shard: The shard to select.
+        timings_path: JSON file of durations by path, from merge --timings.
+
+    Returns:
+        Sorted paths of the shard.
+    """
+    timings = read_json(timings_path) if timings_path else None
+    if not isinstance(timings, dict):
+        timings = {}
+    costs = estimate_costs(file_paths, lambda path: timings.get(os.path.normpath(path)))
+    return partition(file_paths, costs, shard[1])[shard[0] - 1]
+
+
+class ShardRecorder(Reporter):
+    """Passes results on to another reporter and saves them for merge."""
+
+    def __init__(
+        self,
+        reporter: Reporter,
+        path: str,
+        shard: Shard,
+        duration: Callable[[str, str], Optional[float]],
+    ):
+        """Initialize the recorder.
+
+        Args:
+            reporter: Reporter writing this shard's own output.
+            path: Partial result file to write.
+            shard: The shard being linted.
+            duration: Returns the recorded duration of a linter's file.
+        """
+        super().__init__()
+        self.reporter = reporter
+        self.path = path
+        self.duration = duration
+        self.partial: Dict[str, Any] = {
+            "format": PARTIAL_FORMAT,
+            "shard": list(shard),
+            "fix": False,
+            "linters": [],
+        }
+
+    def open(self) -> None:
+        self.reporter.open()
+
+    def start(self, name: str, version: str = "") -> None:
+        super().start(name, version)
+        self.partial["linters"].append(
+            {"name": name, "version": version, "results": []}
+        )
+        self.reporter.start(name, version)
+
+    def result(self, file_path: str, result: Any) -> None:
+        self.partial["linters"][-1]["results"].append(
+            [
+                os.path.normpath(file_path),
+                result.to_payload(),
+                result.messages,
+                self.duration(self.name, file_path),
+            ]
+        )
+        self.reporter.result(file_path, result)
+
+    def end(self) -> None:
+        self.reporter.end()
+
+    def summary(self, name: str, file_count: int, has_issues: bool, fix: bool) -> None:
+        self.partial["fix"] = self.partial["fix"] or fix
+        self.reporter.summary(name, file_count, has_issues, fix)
+
+    def close(self) -> None:
+        self.reporter.close()
+        self.save()
+
+    def no_files(self, name: str) -> None:
+        self.reporter.no_files(name)
+        self.save()
+
+    def save(self) -> None:
+        """Write the partial result file."""
+        if not write_json_atomic(self.path, self.partial):
+            print(
+                f"{Colors.YELLOW}Could not write shard results to {self.path}"
+                f"{Colors.RESET}",
+                file=sys.stderr,
+            )
+
+
+def record_shard(
+    args: argparse.Namespace,
+    reporter: Reporter,
+    duration: Callable[[str, str], Optional[float]],
+) -> Reporter:
+    """Wrap a reporter in a ShardRecorder when --shard is given.
+
+    Args:
+        args: Parsed command-line arguments.
+        reporter: Reporter for the run's own output.
+        duration: Returns the recorded duration of a linter's file.
+
+    Returns:
+        The reporter to use.
+    """
+    if args.shard is None:
+        return reporter
+    index, count = args.shard
+    path = args.shard_output or DEFAULT_PARTIAL.format(index=index, count=count)
+    return ShardRecorder(reporter, path, args.shard, duration)
+
+
+def _read_partials(paths: List[str]) -> List[Dict[str, Any]]:
+    """Read partial result files, checking that they form one complete run.
+
+    Raises:
+        ValueError: If a file is invalid or shards are missing or repeated.
+    """
+    partials = []
+    for path in paths:
+        data = read_json(path)
+        if not isinstance(data, dict) or data.get("format") != PARTIAL_FORMAT:
+            raise ValueError(f"{path} is not a shard result file")
+        partials.append(data)
+    counts = {partial["shard"][1] for partial in partials}
+    if len(counts) != 1:
+        raise ValueError("Shard results come from runs with different shard counts")
+    indexes = sorted(partial["shard"][0] for partial in partials)
+    expected = list(range(1, counts.pop() + 1))
+    if indexes != expected:
+        missing = sorted(set(expected) - set(indexes))
+        raise ValueError(
+            f"Expected results of shards {expected[0]}-{expected[-1]} once each"
+            + (f"; missing {', '.join(map(str, missing))}" if missing else "")
+        )
+    return partials
+
+
+def _merge_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="merge", description="Report the results of --shard runs together"
+    )
+    parser.add_argument("partials", nargs="+", help="Partial result files")
+    parser.add_argument(
+        "--format",
+        choices=list(REPORTERS),
+        default="text",
+        help="Output format (default: text)",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="FILE",
+        help="Write the recorded durations by path, for --shard-timings",
+    )
+    return parser
+
+
+def _combine(partials: List[Dict[str, Any]]) -> Dict[str, Tuple[str, List[Any]]]:
+    """Return (tool version, result rows sorted by path) by linter name."""
+    linters: Dict[str, Tuple[str, Dict[str, List[Any]]]] = {}
+    for partial in sorted(partials, key=lambda partial: partial["shard"][0]):
+        for linter in partial["linters"]:
+            entry = linters.setdefault(linter["name"], (linter["version"], {}))
+            entry[1].update((row[0], row) for row in linter["results"])
+    return {
+        name: (version, [rows[path] for path in sorted(rows)])
+        for name, (version, rows) in linters.items()
+    }
+
+
+def _timings(linters: Dict[str, Tuple[str, List[Any]]]) -> Dict[str, float]:
+    """Return the total recorded duration of each path, over all linters."""
+    timings: Dict[str, float] = {}
+    for _, rows in linters.values():
+        for path, _, _, seconds in rows:
+            if seconds is not None:
+                timings[path] = timings.get(path, 0.0) + seconds
+    return timings
+
+
+def merge_command(argv: List[str], load: Callable[[Dict[str, Any]], Any]) -> int:
+    """Report the partial results of all shards as one run.
+
+    Args:
+        argv: Arguments following the merge subcommand.
+        load: Rebuilds a lint result from its cached payload.
+
+    Returns:
+        Exit code: 2 if the partial files are unusable, 1 if any file has
+        issues, 0 otherwise.
+    """
+    args = _merge_parser().parse_args(argv)
+    try:
+        partials = _read_partials(args.partials)
+    except ValueError as exc:
+        print(f"{Colors.RED}[FAIL] {exc}{Colors.RESET}")
+        return 2
+    linters = _combine(partials)
+    if args.timings and not write_json_atomic(args.timings, _timings(linters)):
+        print(
+            f"{Colors.YELLOW}Could not write timings to {args.timings}{Colors.RESET}",
+            file=sys.stderr,
+        )
+
+    reporter = REPORTERS[args.format]()
+    if not linters:
+        reporter.no_files("script")
+        return 0
+    fix = any(partial["fix"] for partial in partials)
+    return 1 if _report(reporter, linters, load, fix) else 0
+
+
+def _report(
+    reporter: Reporter,
+    linters: Dict[str, Tuple[str, List[Any]]],
+    load: Callable[[Dict[str, Any]], Any],
+    fix: bool,
+) -> bool:
+    """Write combined results through a reporter; return whether any failed."""
+    reporter.open()
+    file_count = 0
+    failed = []
+    for name, (version, rows) in linters.items():
+        reporter.start(name, version)
+        for path, payload, messages, _ in rows:
+            result = load(payload)
+            result.messages = messages
+            reporter.result(path, result)
+            if result.has_issues and name not in failed:
+                failed.append(name)
+        reporter.end()
+        file_count += len(rows)
+    reporter.summary(", ".join(failed or linters), file_count, bool(failed), fix)
+    reporter.close()
+    return bool(failed)
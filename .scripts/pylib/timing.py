@@ -0,0 +1,227 @@
+"""Timing spans for linter runs.
+
+Spans are recorded for the phases of a run (discovery, toolchain check,
+linting), for each lint and fix call, and for the child processes inside
+them, split into launch time (fork and exec, until Popen returns) and
+execution time (waiting for the process to finish). Execution includes
+the tool's own startup, which the summary reports separately: the
+PowerShell worker's ready handshake is timed directly, and other tools'
+startup is estimated from a no-op call timed once per run (see
+process.measure_startup()). A lint or fix call covers a batch of files,
+so its duration is also split between them by size, as the linter does
+for the durations it caches, and the summary ranks files by their shares.
+Recording is off unless --profile or --trace is given, in which case spans
+can be summarized or written in Chrome's trace event format for
+chrome://tracing or Perfetto.
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .cache import write_json_atomic
+from .schedule import apportion
+
+# Categories the profile summary groups spans by
+PHASE = "phase"
+LINT = "lint"
+FIX = "fix"
+PROCESS = "process"
+STARTUP = "startup"
+
+
+class Tracer:
+    """Thread-safe recorder of timing spans."""
+
+    def __init__(self):
+        """Create a disabled tracer."""
+        self.enabled = False
+        self.events: List[Dict[str, Any]] = []
+        # (seconds, call name, path) for each file of a lint or fix call
+        self.files: List[Tuple[float, str, str]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[None]:
+        """Record the duration of the enclosed block.
+
+        Args:
+            name: Span name shown in the trace.
+            category: One of the module's category constants.
+            **args: JSON-serializable details attached to the span.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    @contextmanager
+    def batch(self, name: str, category: str, files: List[str]) -> Iterator[None]:
+        """Record a call over files as a span and each file's share of it.
+
+        Args:
+            name: Span name shown in the trace.
+            category: LINT or FIX.
+            files: Files the call covers.
+        """
+        start = time.perf_counter()
+        with self.span(name, category, files=files):
+            yield
+        if self.enabled:
+            shares = apportion(files, time.perf_counter() - start)
+            with self._lock:
+                self.files.extend(
+                    (seconds, name, path) for path, seconds in shares.items()
+                )
+
+    def reset(self) -> None:
+        """Discard the recorded spans."""
+        with self._lock:
+            self.events = []
+            self.files = []
+            self._origin = time.perf_counter_ns()
+
+    def total(self, category: str, name: Optional[str] = None) -> float:
+        """Return the summed duration of matching spans, in milliseconds."""
+        return (
+            sum(
+                event["dur"]
+                for event in self.events
+                if event["cat"] == category and name in (None, event["name"])
+            )
+            / 1000
+        )
+
+    def _startup(self) -> Tuple[List[str], float, float]:
+        """Break tool startup down by command.
+
+        Returns:
+            Tuple of (report lines, total startup in milliseconds, the part
+            of it estimated to lie inside execution spans).
+        """
+        no_op: Dict[str, float] = {}
+        handshakes: Dict[str, List[float]] = {}
+        runs: Dict[str, int] = {}
+        for event in self.events:
+            command = event["args"].get("command", "")
+            if event["cat"] == STARTUP and event["name"] == "no-op":
+                no_op[command] = min(no_op.get(command, math.inf), event["dur"] / 1000)
+            elif event["cat"] == STARTUP:
+                handshakes.setdefault(command, []).append(event["dur"] / 1000)
+            elif event["cat"] == PROCESS and event["name"] == "execute":
+                runs[command] = runs.get(command, 0) + 1
+        lines = []
+        for command, durations in sorted(handshakes.items()):
+            lines.append(
+                f"    {command:<22}{sum(durations):10.1f} ms"
+                f"  ({len(durations)} worker ready handshakes)"
+            )
+        estimated = 0.0
+        for command, duration in sorted(no_op.items()):
+            count = runs.get(command, 0)
+            estimated += count * duration
+            lines.append(
+                f"    {command:<22}{count * duration:10.1f} ms"
+                f"  ({count} runs x {duration:.1f} ms no-op call)"
+            )
+        total = estimated + sum(sum(durations) for durations in handshakes.values())
+        return lines, total, estimated
+
+    def summary(self, top: int = 10) -> str:
+        """Summarize phases, tool startup overhead and the slowest files.
+
+        Args:
+            top: Number of slowest files to list.
+
+        Returns:
+            Multi-line report text.
+        """
+        lines = ["", "Profile:"]
+        for event in self.events:
+            if event["cat"] == PHASE:
+                lines.append(f"  {event['name']:<24}{event['dur'] / 1000:10.1f} ms")
+
+        launched = sum(1 for event in self.events if event["name"] == "launch")
+        lines.append(
+            f"  {'Process launch':<24}{self.total(PROCESS, 'launch'):10.1f} ms"
+            f"  ({launched} processes, fork and exec)"
+        )
+        startup_lines, startup, estimated = self._startup()
+        lines.append(f"  {'Tool startup':<24}{startup:10.1f} ms")
+        lines.extend(startup_lines)
+        execution = max(0.0, self.total(PROCESS, "execute") - estimated)
+        lines.append(
+            f"  {'Tool execution':<24}{execution:10.1f} ms  (excluding startup)"
+        )
+
+        slowest = sorted(self.files, key=lambda record: -record[0])[:top]
+        if slowest:
+            lines.extend(["", "Slowest files:"])
+        for seconds, name, path in slowest:
+            lines.append(f"  {seconds * 1000:10.1f} ms  {name:<12}{path}")
+        return "\n".join(lines)
+
+    def write_trace(self, path: str) -> bool:
+        """Write the recorded spans as a Chrome trace event file.
+
+        Args:
+            path: Destination file.
+
+        Returns:
+            True if the file was written.
+        """
+        with self._lock:
+            events = list(self.events)
+        main = threading.main_thread().ident
+        workers = sorted({event["tid"] for event in events} - {main})
+        names = {
+            main: "main",
+            **{tid: f"worker {n}" for n, tid in enumerate(workers, 1)},
+        }
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in names.items()
+        ]
+        return write_json_atomic(
+            path, {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+        )
+
+
+# Shared by the linter and the tool helpers it calls
+TRACER = Tracer()
+
+
+def span(name: str, category: str, **args: Any):
+    """Record a span on the shared tracer (see Tracer.span)."""
+    return TRACER.span(name, category, **args)
+
+
+def batch_span(name: str, category: str, files: List[str]):
+    """Record a call over files on the shared tracer (see Tracer.batch)."""
+    return TRACER.batch(name, category, files)
@@ -0,0 +1,147 @@
+"""Memoized toolchain probes for linters.
+
+Checking that a tool is installed (and which version) can cost a
+subprocess per run, which for pwsh means a second of startup. A probe
+result is recorded in a stamp file keyed by the resolved executable path,
+its mtime and size, plus any extra paths the probe depends on (such as a
+PowerShell module directory). Later runs reuse the recorded version
+without starting the tool until one of those changes.
+"""
+
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import read_json, write_json_atomic
+
+STAMP_FORMAT = 1
+STAMP_FILE = "toolchain.json"
+
+# A probe receives the resolved executable and returns the tool version and
+# the paths whose modification should invalidate the record, or None if the
+# tool is not usable.
+Probe = Callable[[str], Optional[Tuple[str, List[str]]]]
+
+
+def _fingerprint(path: str) -> Optional[List[object]]:
+    """Return [path, mtime_ns, size] for a path, or None if it is missing."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return [path, info.st_mtime_ns, info.st_size]
+
+
+class Toolchain:
+    """Resolves executables and records probed tool versions."""
+
+    def __init__(self, stamp_path: Optional[str] = None):
+        """Load recorded probes.
+
+        Args:
+            stamp_path: Location of the stamp file, or None to probe every
+                time without persisting anything.
+        """
+        self.stamp_path = stamp_path
+        self.versions: Dict[str, str] = {}
+        self._paths: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        data = read_json(stamp_path) if stamp_path else None
+        self._stamps: Dict[str, Dict[str, Any]] = {}
+        if isinstance(data, dict) and data.get("format") == STAMP_FORMAT:
+            self._stamps = data.get("tools", {})
+
+    def which(self, executable: str) -> Optional[str]:
+        """Resolve an executable on PATH once per process.
+
+        Args:
+            executable: Command name.
+
+        Returns:
+            Absolute path to the executable, or None if not found.
+        """
+        with self._lock:
+            if executable not in self._paths:
+                found = shutil.which(executable)
+                self._paths[executable] = os.path.realpath(found) if found else None
+            return self._paths[executable]
+
+    def version(self, tool: str) -> Optional[str]:
+        """Return the version recorded for a tool in this process.
+
+        Args:
+            tool: Tool name as passed to probe().
+
+        Returns:
+            The version string, or None if the tool has not been probed.
+        """
+        return self.versions.get(tool)
+
+    def probe(
+        self, tool: str, executable: str, probe: Probe, refresh: bool = False
+    ) -> Optional[str]:
+        """Return a tool's version, running the probe only when needed.
+
+        Args:
+            tool: Name the result is recorded under.
+            executable: Command the tool depends on.
+            probe: Function that checks the tool and reports its version.
+            refresh: Ignore any recorded result (e.g. after installing).
+
+        Returns:
+            The tool version, or None if the executable or tool is missing.
+        """
+        path = self.which(executable)
+        if path is None:
+            return None
+
+        key = _fingerprint(path)
+        stamp = self._stamps.get(tool)
+        if (
+            not refresh
+            and stamp is not None
+            and stamp.get("key") == key
+            and all(_fingerprint(dep[0]) == dep for dep in stamp.get("depends", []))
+        ):
+            version = str(stamp["version"])
+        else:
+            outcome = probe(path)
+            if outcome is None:
+                self._forget(tool)
+                return None
+            version, depends = outcome
+            self._record(tool, key, version, depends)
+
+        self.versions[tool] = version
+        return version
+
+    def _record(
+        self, tool: str, key: Optional[List[object]], version: str, depends: List[str]
+    ) -> None:
+        """Store a probe result and write the stamp file."""
+        self._stamps[tool] = {
+            "key": key,
+            "version": version,
+            "depends": [_fingerprint(dep) for dep in depends if os.path.exists(dep)],
+        }
+        self._save(tool)
+
+    def _forget(self, tool: str) -> None:
+        """Drop the record for a tool that is no longer usable."""
+        if self._stamps.pop(tool, None) is not None:
+            self._save(tool)
+
+    def _save(self, tool: str) -> None:
+        """Write one tool's record, keeping records other linters wrote."""
+        if not self.stamp_path:
+            return
+        data = read_json(self.stamp_path)
+        tools = {}
+        if isinstance(data, dict) and data.get("format") == STAMP_FORMAT:
+            tools = data.get("tools", {})
+        if tool in self._stamps:
+            tools[tool] = self._stamps[tool]
+        else:
+            tools.pop(tool, None)
+        write_json_atomic(self.stamp_path, {"format": STAMP_FORMAT, "tools": tools})
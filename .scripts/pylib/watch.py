@@ -0,0 +1,303 @@
+"""Change notification for watch mode.
+
+On Linux the trees are watched with inotify, so an idle watch costs no CPU
+and a save is seen as soon as the editor closes the file. Elsewhere, or if
+inotify is unavailable (for example when the per-user watch limit is
+reached), the trees are rescanned periodically and compared by modification
+time and size. Either way, changes arriving in quick succession, such as a
+"save all" or a branch switch, are collected into a single batch. Paths
+are skipped by the same ignore rules file discovery uses, and a changed
+ignore file makes the watcher read the rules again.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .file_finder import ignore_rules
+from .ignore import IGNORE_FILES, IgnoreRules
+
+# Quiet period that ends a batch of changes, in seconds
+DEBOUNCE_SECONDS = 0.2
+
+# Delay between rescans of the polling fallback, in seconds
+POLL_INTERVAL = 0.5
+
+# inotify event flags (linux/inotify.h)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_ONLYDIR
+)
+
+# struct inotify_event without the trailing name
+_EVENT = struct.Struct("iIII")
+
+_READ_SIZE = 65536
+
+
+def _tree(root: str, rules: IgnoreRules) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (directory, files) for root and every directory below it.
+
+    Ignored directories are not entered and ignored files are left out.
+    Symbolic links to directories are not followed.
+    """
+    tree, relative = rules.resolve(root)
+    stack = [(root, relative)]
+    while stack:
+        directory, relative = stack.pop()
+        ignores = tree.directory(relative)
+        if ignores is None:
+            continue
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    path = os.path.normpath(os.path.join(directory, entry.name))
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # Decided by tree.directory() when popped
+                            child = (
+                                f"{relative}/{entry.name}" if relative else entry.name
+                            )
+                            stack.append((path, child))
+                        elif entry.is_file() and not ignores.ignores(entry.name, False):
+                            files.append(path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        yield directory, files
+
+
+def _rules_changed(paths: Iterable[str]) -> bool:
+    """Check whether any of the changed files is an ignore file."""
+    return any(os.path.basename(path) in IGNORE_FILES for path in paths)
+
+
+class InotifyWatcher:
+    """Watches directory trees with Linux inotify."""
+
+    def __init__(self, roots: List[str], rules: IgnoreRules):
+        """Start watching.
+
+        Args:
+            roots: Directories to watch, recursively.
+            rules: Ignore rules deciding the paths to skip.
+
+        Raises:
+            OSError: If inotify is unavailable or a watch cannot be added.
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._roots = roots
+        self._rules = rules
+        self._directories: Dict[int, str] = {}
+        # Times the kernel queue overflowed and events were lost
+        self.overflows = 0
+        try:
+            self._rescan()
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, root: str) -> Set[str]:
+        """Watch root and its subdirectories; return the files found there."""
+        found = set()
+        for directory, files in _tree(root, self._rules):
+            descriptor = self._add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if descriptor < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, "inotify watch limit reached")
+                # The directory vanished or cannot be read
+                continue
+            self._directories[descriptor] = directory
+            found.update(files)
+        return found
+
+    def _rescan(self) -> Set[str]:
+        found = set()
+        for root in self._roots:
+            found.update(self._add_tree(root))
+        return found
+
+    def poll(self, timeout: Optional[float]) -> Set[str]:
+        """Wait for changes.
+
+        Args:
+            timeout: Seconds to wait, or None to wait until something changes.
+
+        Returns:
+            Paths of files created, modified, moved or deleted; empty if the
+            timeout expired.
+        """
+        ready = select.select([self._fd], [], [], timeout)[0]
+        if not ready:
+            return set()
+        data = os.read(self._fd, _READ_SIZE)
+        changed: Set[str] = set()
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped: treat every file as changed
+                self.overflows += 1
+                changed.update(self._rescan())
+            elif mask & _IN_IGNORED:
+                self._directories.pop(descriptor, None)
+            elif descriptor in self._directories:
+                path = os.path.normpath(
+                    os.path.join(self._directories[descriptor], name)
+                )
+                if self._rules.ignored(path, bool(mask & _IN_ISDIR)):
+                    continue
+                if not mask & _IN_ISDIR:
+                    changed.add(path)
+                elif mask & (_IN_CREATE | _IN_MOVED_TO):
+                    changed.update(self._add_tree(path))
+        if _rules_changed(changed):
+            # Directories may have started or stopped being ignored
+            self._rules.clear()
+            changed.update(self._rescan())
+        return changed
+
+    def close(self) -> None:
+        """Stop watching."""
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Watches directory trees by rescanning them periodically."""
+
+    def __init__(self, roots: List[str], rules: IgnoreRules):
+        """Take the initial snapshot.
+
+        Args:
+            roots: Directories to watch, recursively.
+            rules: Ignore rules deciding the paths to skip.
+        """
+        self._roots = roots
+        self._rules = rules
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for root in self._roots:
+            for _, files in _tree(root, self._rules):
+                for path in files:
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _compare(self) -> Set[str]:
+        """Rescan and return the files that differ from the last snapshot."""
+        snapshot = self._scan()
+        changed = {
+            path
+            for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def poll(self, timeout: Optional[float]) -> Set[str]:
+        """Wait for changes (see InotifyWatcher.poll)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = POLL_INTERVAL
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+            time.sleep(delay)
+            changed = self._compare()
+            if _rules_changed(changed):
+                # Directories may have started or stopped being ignored
+                self._rules.clear()
+                changed |= self._compare()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        """Stop watching."""
+
+
+def create_watcher(roots: List[str], rules: IgnoreRules):
+    """Return an inotify watcher where available, else a polling one.
+
+    Args:
+        roots: Directories to watch, recursively.
+        rules: Ignore rules deciding the paths to skip.
+
+    Returns:
+        An InotifyWatcher or PollingWatcher.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots, rules)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, rules)
+
+
+def watch_changes(
+    roots: List[str],
+    ignore_patterns: Optional[List[str]] = None,
+    debounce: float = DEBOUNCE_SECONDS,
+) -> Iterator[List[str]]:
+    """Yield batches of changed files, forever.
+
+    A batch is yielded once no further change has arrived for debounce
+    seconds. Changes made while the caller processes a batch (including
+    its own fixes) are reported in the next one.
+
+    Args:
+        roots: Directories to watch, recursively.
+        ignore_patterns: Additional gitignore-style patterns to ignore.
+        debounce: Quiet period ending a batch, in seconds.
+
+    Yields:
+        Sorted paths of files created, modified, moved or deleted.
+    """
+    watcher = create_watcher(roots, ignore_rules(ignore_patterns))
+    try:
+        while True:
+            changed = watcher.poll(None)
+            while changed:
+                more = watcher.poll(debounce)
+                if not more:
+                    break
+                changed |= more
+            if changed:
+                yield sorted(changed)
+    finally:
+        watcher.close()
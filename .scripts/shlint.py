@@ -2,106 +2,507 @@
 """ShellCheck linter wrapper for shell scripts.
 
 This script provides a Python interface to shellcheck with consistent
-output formatting and optional auto-fix support via git apply.
+output formatting and optional auto-fix support.
+
+Files are checked in batches: each shellcheck process receives many files
+and reports in json1 format, which is parsed as it is read, split back out
+per file and rendered in ShellCheck's tty layout. Fixes are requested as one diff per batch and
+applied in-process.
 """
 
+import argparse
+import codecs
+import json
 import os
-import shutil
+import re
 import subprocess
 import sys
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 # Add the current directory to sys.path to allow importing pylib
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, SCRIPT_DIR)
 
-from pylib.linter import Colors, Linter  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.cache import settings_digest  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.depgraph import (  # noqa: E402  # pylint: disable=wrong-import-position
+    DependencyGraph,
+    group_by_dependencies,
+)
+from pylib.driver import register  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.linter import (  # noqa: E402  # pylint: disable=wrong-import-position
+    Colors,
+    Linter,
+    LintResult,
+)
+from pylib.patch import (  # noqa: E402  # pylint: disable=wrong-import-position
+    PatchError,
+    apply_patch,
+    parse_unified_diff,
+)
+from pylib.process import (  # noqa: E402  # pylint: disable=wrong-import-position
+    LIMITS,
+    measure_startup,
+    run_process,
+    stream_process,
+)
+from pylib.report import Diagnostic  # noqa: E402  # pylint: disable=wrong-import-position
+from pylib.schedule import balance, split_batches  # noqa: E402  # pylint: disable=wrong-import-position
+
+# Flags shared by the check and fix invocations
+SHELLCHECK_ARGS = ["-x", "--severity=style"]
+
+CHECK_COMMAND = ["shellcheck", *SHELLCHECK_ARGS, "--format=json1"]
+
+FIX_COMMAND = ["shellcheck", *SHELLCHECK_ARGS, "--format=diff"]
+
+WIKI_URL = "https://www.shellcheck.net/wiki/SC{code}"
+
+# "source FILE" / ". FILE" commands and "# shellcheck source=FILE" directives
+_SOURCE_COMMAND = re.compile(r"^\s*(?:source|\.)\s+([^;&|#\n]+)", re.M)
+_SOURCE_DIRECTIVE = re.compile(r"#\s*shellcheck\s+(?:\S+\s+)*?source=(\S+)")
+
+# Opening of a json1 document, up to the start of the comments array
+_JSON1_START = re.compile(r'\s*\{\s*"comments"\s*:\s*\[')
+_JSON1_SEPARATOR = re.compile(r"[\s,]*")
+
+# Source graph file in the cache directory
+GRAPH_FILE = "shellcheck-sources.json"
+
+# Shells ShellCheck supports, for scripts found by their #! line (--shebang)
+SHELL_INTERPRETERS = ["bash", "dash", "ksh", "sh"]
+
+# Extensions ShellCheck infers a dialect from; stdin has no file name
+SHELL_EXTENSIONS = {".bash": "bash", ".bats": "bats", ".dash": "dash", ".ksh": "ksh"}
+
+
+def _probe_version(executable: str) -> Optional[Tuple[str, List[str]]]:
+    """Run shellcheck --version and extract the version number."""
+    try:
+        result = run_process([executable, "--version"], text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    for line in result.stdout.splitlines():
+        if line.startswith("version:"):
+            return line.split(":", 1)[1].strip(), []
+    return result.stdout.strip(), []
+
+
+def _marker(comment: Dict[str, Any]) -> str:
+    """Build the tty-style caret marker for a comment's column range."""
+    width = comment["endColumn"] - comment["column"]
+    if comment["endLine"] == comment["line"] and width > 1:
+        return "^" + "-" * (width - 2) + "^"
+    return "^--"
+
+
+def render_comments(
+    file_path: str, comments: List[Dict[str, Any]], text: Optional[str] = None
+) -> str:
+    """Render json1 comments for one file in ShellCheck's tty layout.
+
+    Args:
+        file_path: Path to the checked file.
+        comments: json1 comment objects for that file.
+        text: Checked content, if it was not read from file_path.
+
+    Returns:
+        Diagnostics text.
+    """
+    if text is None:
+        try:
+            with open(file_path, encoding="utf-8", errors="replace") as handle:
+                text = handle.read()
+        except OSError:
+            text = ""
+    source = text.splitlines()
+
+    comments = sorted(comments, key=lambda c: (c["line"], c["column"], c["code"]))
+    lines: List[str] = []
+    current = None
+    for comment in comments:
+        line_no = comment["line"]
+        text = source[line_no - 1] if 0 < line_no <= len(source) else ""
+        if line_no != current:
+            lines.extend(["", f"In {file_path} line {line_no}:", text])
+            current = line_no
+        # Keep tabs so the marker lines up with the source line
+        pad = "".join(
+            "\t" if char == "\t" else " " for char in text[: comment["column"] - 1]
+        )
+        lines.append(
+            f"{pad}{_marker(comment)} SC{comment['code']} "
+            f"({comment['level']}): {comment['message']}"
+        )
+
+    seen = {}
+    for comment in comments:
+        seen.setdefault(comment["code"], comment["message"])
+    lines.extend(["", "For more information:"])
+    lines.extend(
+        f"  {WIKI_URL.format(code=code)} -- {message}"
+        for code, message in sorted(seen.items())
+    )
+    return "\n".join(lines) + "\n"
+
+
+def sourced_files(file_path: str) -> Set[str]:
+    """Return the paths a script may source.
+
+    Relative paths are resolved against both the working directory (as
+    ``shellcheck -x`` does) and the script's directory. A path starting
+    with an expansion, such as ``"$(dirname "$0")/lib.sh"`` or
+    ``"$SCRIPT_DIR/lib.sh"``, is taken to be relative to the script.
+
+    Args:
+        file_path: Path to the script.
+
+    Returns:
+        Candidate paths of sourced files, normalized.
+    """
+    try:
+        with open(file_path, encoding="utf-8", errors="replace") as handle:
+            text = handle.read()
+    except OSError:
+        return set()
+    script_dir = os.path.dirname(file_path)
+    targets = [
+        argument if argument.lstrip('"').startswith("$") else argument.split()[0]
+        for argument in _SOURCE_COMMAND.findall(text)
+    ]
+    targets += [
+        target.replace("SCRIPTDIR", script_dir or os.curdir, 1)
+        for target in _SOURCE_DIRECTIVE.findall(text)
+    ]
+    paths = set()
+    for target in targets:
+        target = target.strip().strip("'\"")
+        if target.startswith("$"):
+            if "/" not in target:
+                continue
+            name = target.rsplit("/", 1)[1].strip("'\"")
+            paths.add(os.path.normpath(os.path.join(script_dir, name)))
+        else:
+            paths.add(os.path.normpath(target))
+            paths.add(os.path.normpath(os.path.join(script_dir, target)))
+    return paths
+
+
+class CommentCollector:
+    """Collects ShellCheck's json1 comments per file as the output arrives.
+
+    Each comment is decoded as soon as it is complete, so only the one being
+    read is held in memory however long the output, and at most
+    LIMITS.diagnostics comments are kept per file.
+
+    Attributes:
+        comments: Kept comments by file name, for the names given.
+        truncated: Names of the files that had more comments than were kept.
+        complete: True once the whole comments array has been read.
+        unparsed: Output not parsed yet; an error message if ShellCheck
+            could not produce json1.
+    """
+
+    def __init__(self, names: List[str]):
+        """Initialize the collector.
+
+        Args:
+            names: File names as ShellCheck reports them; comments on other
+                files, such as sourced ones, are dropped.
+        """
+        self.comments: Dict[str, List[Dict[str, Any]]] = {name: [] for name in names}
+        self.truncated: Set[str] = set()
+        self.complete = False
+        self.unparsed = ""
+        self._started = False
+        self._decode = codecs.getincrementaldecoder("utf-8")("replace").decode
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, data: bytes) -> bool:
+        """Parse a chunk of output.
+
+        Args:
+            data: Bytes of ShellCheck's standard output.
+
+        Returns:
+            False once every file has more comments than are kept, as the
+            rest of the output can then be skipped.
+        """
+        self.unparsed += self._decode(data)
+        if not self._started:
+            match = _JSON1_START.match(self.unparsed)
+            if match is None:
+                return True
+            self._started = True
+            self.unparsed = self.unparsed[match.end() :]
+        while not self.complete:
+            position = _JSON1_SEPARATOR.match(self.unparsed).end()
+            if self.unparsed.startswith("]", position):
+                self.complete = True
+                break
+            try:
+                comment, position = self._decoder.raw_decode(self.unparsed, position)
+            except ValueError:
+                # The comment is not complete yet
+                break
+            self.unparsed = self.unparsed[position:]
+            self._add(comment)
+        return len(self.truncated) < len(self.comments)
+
+    def _add(self, comment: Any) -> None:
+        """Keep a comment unless its file already has enough."""
+        name = comment.get("file") if isinstance(comment, dict) else None
+        # Comments in sourced files belong to their own lint run
+        if name not in self.comments:
+            return
+        if LIMITS.diagnostics is not None and (
+            len(self.comments[name]) >= LIMITS.diagnostics
+        ):
+            self.truncated.add(name)
+        else:
+            self.comments[name].append(comment)
+
+    def finished(self) -> bool:
+        """Return whether every file's comments were read."""
+        return self.complete or len(self.truncated) == len(self.comments)
 
 
+def _result(
+    file_path: str,
+    comments: List[Dict[str, Any]],
+    text: Optional[str] = None,
+    truncated: bool = False,
+) -> LintResult:
+    """Build the lint result for one file's json1 comments."""
+    if not comments:
+        return LintResult(False)
+    return LintResult(
+        True,
+        render_comments(file_path, comments, text),
+        fixable=any(comment.get("fix") for comment in comments),
+        truncated=truncated,
+        diagnostics=[
+            Diagnostic(
+                comment["line"],
+                comment["column"],
+                comment["level"],
+                f"SC{comment['code']}",
+                comment["message"],
+                comment.get("endLine"),
+                comment.get("endColumn"),
+                bool(comment.get("fix")),
+            )
+            for comment in comments
+        ],
+    )
+
+
+@register
 class ShellLinter(Linter):
     """Linter for shell scripts using ShellCheck."""
 
     def __init__(self):
         """Initialize the ShellCheck linter."""
-        super().__init__("ShellCheck", "**/*.sh")
+        super().__init__("ShellCheck", "**/*.sh", SHELL_INTERPRETERS)
+        self._graph = DependencyGraph(sourced_files)
 
     def check_installed(self) -> None:
-        """Verify that ShellCheck is installed."""
-        if not shutil.which("shellcheck"):
+        """Verify that ShellCheck is installed and record its version."""
+        version = self.toolchain.probe("shellcheck", "shellcheck", _probe_version)
+        if version is None:
             print(f"{Colors.RED}[FAIL] ShellCheck is not installed{Colors.RESET}")
             print("Install it: https://github.com/koalaman/shellcheck#installing")
             sys.exit(2)
+        self.tool_version = version
+        # Every batch pays ShellCheck's startup; --profile reports the total
+        measure_startup(["shellcheck", "--version"])
+
+    def cache_context(self) -> List[str]:
+        """Return the ShellCheck version, flags and .shellcheckrc digest."""
+        root_dir = os.path.dirname(SCRIPT_DIR)
+        return [
+            self.name,
+            self.tool_version,
+            *SHELLCHECK_ARGS,
+            settings_digest(os.path.join(root_dir, ".shellcheckrc")),
+        ]
+
+    def configure(self, args: argparse.Namespace) -> None:
+        """Load the source graph saved with the cache."""
+        super().configure(args)
+        path = None if args.no_cache else os.path.join(args.cache_dir, GRAPH_FILE)
+        if self._graph.path != path:
+            self._graph = DependencyGraph(sourced_files, path)
+
+    def dependencies(self, file_path: str) -> List[str]:
+        """Return the files a script sources, directly or not."""
+        return self._graph.closure(file_path)
+
+    def flush(self) -> None:
+        """Save the cache and the source graph."""
+        super().flush()
+        self._graph.save()
+
+    def make_batches(
+        self, file_paths: List[str], jobs: int, costs: Dict[str, float]
+    ) -> List[List[str]]:
+        """Group files into argv-bounded batches for one shellcheck call each.
+
+        Scripts sourcing the same libraries are kept together, so a library
+        is parsed by as few shellcheck calls as possible, and the groups are
+        spread over one batch per worker by estimated cost.
+        """
+        groups = balance(
+            group_by_dependencies(file_paths, self.dependencies), costs, jobs
+        )
+        return [
+            batch
+            for group in groups
+            for batch in split_batches(group, CHECK_COMMAND, 1)
+        ]
 
-    def lint_file(self, file_path: str, fix: bool) -> bool:
+    def lint_file(self, file_path: str) -> LintResult:
         """Lint a shell script using ShellCheck.
 
         Args:
             file_path: Path to the shell script to lint.
-            fix: Whether to attempt automatic fixes via git apply.
 
         Returns:
-            True if issues were found, False otherwise.
+            The lint result, with ShellCheck's diagnostics in tty layout.
         """
-        if fix:
-            self._try_fix(file_path)
-
-        result = subprocess.run(
-            ["shellcheck", "-x", "--severity=style", "--format=tty", file_path],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        return self.lint_batch([file_path])[0]
+
+    def lint_batch(self, file_paths: List[str]) -> List[LintResult]:
+        """Lint shell scripts with a single ShellCheck invocation.
 
-        if result.returncode != 0 and result.stdout.strip():
-            print(f"{Colors.WHITE}{file_path}{Colors.RESET}")
-            print(result.stdout)
-            return True
+        Args:
+            file_paths: Paths to the shell scripts to lint.
 
-        print(f"{Colors.GRAY}  OK: {file_path}{Colors.RESET}")
-        return False
+        Returns:
+            One lint result per file, in the same order as file_paths.
+            If ShellCheck runs out of time, the batch is halved until the
+            slow file is on its own, and that file is reported as timed out.
+        """
+        collector = CommentCollector(file_paths)
+        try:
+            result = stream_process(
+                [*CHECK_COMMAND, *file_paths],
+                collector.feed,
+                limited=True,
+                files=len(file_paths),
+            )
+        except subprocess.TimeoutExpired as exc:
+            if len(file_paths) == 1:
+                return [LintResult.timeout(exc.timeout)]
+            middle = len(file_paths) // 2
+            return self.lint_batch(file_paths[:middle]) + self.lint_batch(
+                file_paths[middle:]
+            )
+
+        if not collector.finished():
+            if len(file_paths) > 1:
+                # Isolate the file ShellCheck could not process
+                return [self.lint_file(path) for path in file_paths]
+            output = result.stderr.decode("utf-8", "replace") or collector.unparsed
+            return [LintResult(True, output.strip())]
+
+        return [
+            _result(
+                path,
+                collector.comments[path],
+                truncated=path in collector.truncated,
+            )
+            for path in file_paths
+        ]
 
-    def _try_fix(self, file_path: str) -> None:
-        """Attempt to apply ShellCheck fixes via git apply.
+    def lint_source(self, file_path: str, source: bytes) -> LintResult:
+        """Lint in-memory content by passing it to ShellCheck on stdin.
+
+        Args:
+            file_path: Path the content belongs to, for reporting.
+            source: Script content.
+
+        Returns:
+            The lint result, with diagnostics attributed to file_path.
+        """
+        args = [*CHECK_COMMAND]
+        shell = SHELL_EXTENSIONS.get(os.path.splitext(file_path)[1])
+        if shell:
+            args.append(f"--shell={shell}")
+        collector = CommentCollector(["-"])
+        try:
+            result = stream_process([*args, "-"], collector.feed, source, limited=True)
+        except subprocess.TimeoutExpired as exc:
+            return LintResult.timeout(exc.timeout)
+        if not collector.finished():
+            output = result.stderr.decode("utf-8", "replace") or collector.unparsed
+            return LintResult(True, output.strip())
+
+        return _result(
+            file_path,
+            collector.comments["-"],
+            source.decode("utf-8", "replace"),
+            "-" in collector.truncated,
+        )
+
+    def fix_file(self, file_path: str) -> List[str]:
+        """Apply ShellCheck's suggested fixes to a file.
 
         Args:
             file_path: Path to the file to fix.
+
+        Returns:
+            Messages describing the fix attempt.
         """
+        return self.fix_batch([file_path])[file_path]
+
+    def fix_batch(self, file_paths: List[str]) -> Dict[str, List[str]]:
+        """Apply ShellCheck's suggested fixes with a single invocation.
+
+        The combined diff is applied in-process and each file is rewritten
+        once, atomically.
+
+        Args:
+            file_paths: Paths to the files to fix.
+
+        Returns:
+            Fix messages by path.
+        """
+        messages: Dict[str, List[str]] = {path: [] for path in file_paths}
         try:
-            result = subprocess.run(
-                [
-                    "shellcheck",
-                    "-x",
-                    "--severity=style",
-                    "--format=diff",
-                    file_path,
-                ],
-                capture_output=True,
+            result = run_process(
+                [*FIX_COMMAND, *file_paths],
                 text=True,
-                check=False,
+                limited=True,
+                files=len(file_paths),
             )
-
-            if result.stdout:
-                apply_process = subprocess.run(
-                    ["git", "apply", "--allow-empty"],
-                    input=result.stdout,
-                    text=True,
-                    capture_output=True,
-                    check=False,
+            patches = parse_unified_diff(result.stdout)
+        except (OSError, PatchError, subprocess.TimeoutExpired) as exc:
+            for path in file_paths:
+                messages[path].append(
+                    f"{Colors.YELLOW}  Warning: Error during fix for {path}: "
+                    f"{exc}{Colors.RESET}"
                 )
+            return messages
 
-                if apply_process.returncode == 0:
-                    print(f"{Colors.WHITE}  Fixed: {file_path}{Colors.RESET}")
-                else:
-                    print(
-                        f"{Colors.YELLOW}  Warning: Could not apply fixes "
-                        f"to {file_path}{Colors.RESET}"
-                    )
-                    print(apply_process.stderr)
-
-        except OSError as exc:
-            print(
-                f"{Colors.YELLOW}  Warning: Error during fix for {file_path}: "
-                f"{exc}{Colors.RESET}"
-            )
+        by_name = {os.path.normpath(path): path for path in file_paths}
+        for name, hunks in patches.items():
+            path = by_name.get(os.path.normpath(name))
+            if path is None:
+                # Fixes to sourced files belong to their own lint run
+                continue
+            try:
+                apply_patch(path, hunks)
+            except (OSError, PatchError) as exc:
+                messages[path].append(
+                    f"{Colors.YELLOW}  Warning: Could not apply fixes "
+                    f"to {path}{Colors.RESET}"
+                )
+                messages[path].append(str(exc))
+            else:
+                messages[path].append(f"{Colors.WHITE}  Fixed: {path}{Colors.RESET}")
+        return messages
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""Make pylib importable from the tests, as the linter scripts do."""
+
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
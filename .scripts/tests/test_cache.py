@@ -0,0 +1,96 @@
+"""Tests for pylib.cache."""
+
+from pylib.cache import ResultCache
+
+
+def test_identical_files_with_same_dependencies_have_separate_entries(
+    tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.sh", "b.sh"):
+        (tmp_path / name).write_text(". ./lib.sh\n")
+    (tmp_path / "lib.sh").write_text("x=1\n")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+
+    cache.put("a.sh", {"output": "In a.sh line 1:"}, ["lib.sh"])
+
+    assert cache.get("b.sh", ["lib.sh"]) is None
+    assert cache.get("a.sh", ["lib.sh"]) == {"output": "In a.sh line 1:"}
+
+
+def test_result_survives_save_and_reload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.sh").write_text("echo\n")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+    cache.put("a.sh", {"output": ""})
+    cache.save()
+
+    reloaded = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+
+    assert reloaded.get("a.sh") == {"output": ""}
+
+
+def test_content_change_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.sh").write_text("echo\n")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+    cache.put("a.sh", {"output": ""})
+
+    (tmp_path / "a.sh").write_text("echo $x\n")
+
+    assert cache.get("a.sh") is None
+
+
+def test_context_change_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.sh").write_text("echo\n")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool 0.9"])
+    cache.put("a.sh", {"output": ""})
+    cache.save()
+
+    assert ResultCache(str(tmp_path / "cache.json"), ["tool 1.0"]).get("a.sh") is None
+
+
+def test_dependency_change_or_appearance_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.sh").write_text(". ./lib.sh\n")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+    cache.put("a.sh", {"output": ""}, ["lib.sh"])
+    assert cache.get("a.sh", ["lib.sh"]) == {"output": ""}
+
+    (tmp_path / "lib.sh").write_text("x=1\n")
+    assert cache.get("a.sh", ["lib.sh"]) is None
+    cache.put("a.sh", {"output": "with lib"}, ["lib.sh"])
+
+    (tmp_path / "lib.sh").write_text("x=2\n")
+    assert cache.get("a.sh", ["lib.sh"]) is None
+
+
+def test_same_relative_path_from_another_directory_is_a_miss(tmp_path, monkeypatch):
+    for name in ("one", "two"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "a.sh").write_text("echo\n")
+    monkeypatch.chdir(tmp_path / "one")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+    cache.put("a.sh", {"output": "one"})
+
+    monkeypatch.chdir(tmp_path / "two")
+
+    assert cache.get("a.sh") is None
+
+
+def test_least_recently_used_results_are_evicted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.sh", "b.sh", "c.sh"):
+        (tmp_path / name).write_text(f"echo {name}\n")
+    cache = ResultCache(str(tmp_path / "cache.json"), ["tool"], max_entries=2)
+    for name in ("a.sh", "b.sh", "c.sh"):
+        cache.put(name, {"output": name})
+    cache.get("a.sh")
+    cache.save()
+
+    reloaded = ResultCache(str(tmp_path / "cache.json"), ["tool"])
+
+    assert reloaded.get("a.sh") == {"output": "a.sh"}
+    assert reloaded.get("b.sh") is None
+    assert reloaded.get("c.sh") == {"output": "c.sh"}
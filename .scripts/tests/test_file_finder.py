@@ -0,0 +1,37 @@
+"""Tests for pylib.file_finder."""
+
+import glob
+import os
+
+import pytest
+from pylib.file_finder import find_files
+
+
+@pytest.fixture(name="tree")
+def fixture_tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("a.sh", "scripts/b.sh", "scripts/deep/c.sh", ".hidden/d.sh"):
+        os.makedirs(os.path.dirname(name) or ".", exist_ok=True)
+        with open(name, "w", encoding="utf-8") as handle:
+            handle.write("echo\n")
+    return tmp_path
+
+
+def _glob_files(pattern):
+    return sorted(
+        os.path.normpath(path)
+        for path in glob.glob(pattern, recursive=True)
+        if os.path.isfile(path)
+    )
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    ["**", "**/", "**/*.sh", "scripts/", "scripts/**/", "scripts/**", "*/*.sh"],
+)
+def test_matches_glob(tree, pattern):
+    assert find_files([pattern], []) == _glob_files(pattern)
+
+
+def test_trailing_separator_finds_no_files(tree):
+    assert not find_files(["**/"], [])
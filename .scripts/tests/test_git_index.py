@@ -0,0 +1,86 @@
+"""Tests for pylib.git_index."""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+from pylib.git_index import find_repository, read_index
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+
+# Shared prefixes exercise the path compression of index version 4
+FILES = [
+    "build.sh",
+    "scripts/deploy/prod.sh",
+    "scripts/deploy/staging.sh",
+    "scripts/lib/common.sh",
+    "scripts/lib/common_test.sh",
+    "z/" + "long-name-" * 12 + ".ps1",
+]
+
+
+def _git(repo, *args):
+    return subprocess.run(
+        ["git", "-C", str(repo), *args],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={
+            **os.environ,
+            "GIT_AUTHOR_NAME": "test",
+            "GIT_AUTHOR_EMAIL": "test@example.com",
+            "GIT_COMMITTER_NAME": "test",
+            "GIT_COMMITTER_EMAIL": "test@example.com",
+        },
+    ).stdout
+
+
+@pytest.fixture(name="repo")
+def fixture_repo(tmp_path, monkeypatch):
+    monkeypatch.delenv("GIT_INDEX_FILE", raising=False)
+    _git(tmp_path, "init", "-q")
+    for name in FILES:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("echo\n")
+    _git(tmp_path, "add", ".")
+    return tmp_path
+
+
+@pytest.mark.parametrize("version", [2, 3, 4])
+def test_read_index_versions(repo, version):
+    expected = sorted(FILES)
+    if version >= 3:
+        # Intent-to-add entries carry the extended flags of version 3
+        (repo / "new.sh").write_text("echo\n")
+        _git(repo, "add", "--intent-to-add", "new.sh")
+        expected = sorted([*FILES, "new.sh"])
+    _git(repo, "update-index", f"--index-version={version}")
+
+    assert (repo / ".git" / "index").read_bytes()[4:8] == version.to_bytes(4, "big")
+    assert read_index(str(repo / ".git")) == expected
+
+
+def test_read_index_skips_submodules(repo, tmp_path_factory):
+    other = tmp_path_factory.mktemp("other")
+    _git(other, "init", "-q")
+    _git(other, "commit", "-q", "--allow-empty", "-m", "init")
+    head = _git(other, "rev-parse", "HEAD").strip()
+    _git(repo, "update-index", "--add", "--cacheinfo", f"160000,{head},vendor")
+
+    assert read_index(str(repo / ".git")) == sorted(FILES)
+
+
+def test_split_index_is_rejected(repo):
+    _git(repo, "update-index", "--split-index")
+
+    with pytest.raises(ValueError, match="extension 'link'"):
+        read_index(str(repo / ".git"))
+
+
+def test_find_repository_from_subdirectory(repo):
+    assert find_repository(str(repo / "scripts" / "lib")) == (
+        str(repo),
+        str(repo / ".git"),
+    )
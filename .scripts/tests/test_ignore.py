@@ -0,0 +1,107 @@
+"""Tests for pylib.ignore."""
+
+import pytest
+from pylib.ignore import IgnoreRules, compile_rule
+
+
+def _ignored(tmp_path, patterns, path, is_dir=False):
+    rules = IgnoreRules(overrides=patterns, root=str(tmp_path), files=())
+    return rules.ignored(str(tmp_path / path), is_dir)
+
+
+@pytest.mark.parametrize("line", ["", "   ", "# comment"])
+def test_blank_lines_and_comments_are_not_rules(line):
+    assert compile_rule(line) is None
+
+
+@pytest.mark.parametrize(
+    ("path", "ignored"),
+    [("debug.log", True), ("sub/debug.log", True), ("keep.log", False)],
+)
+def test_negation_re_includes(tmp_path, path, ignored):
+    assert _ignored(tmp_path, ["*.log", "!keep.log"], path) is ignored
+
+
+def test_last_matching_rule_wins(tmp_path):
+    assert _ignored(tmp_path, ["!keep.log", "*.log"], "keep.log")
+
+
+def test_negation_cannot_re_include_inside_ignored_directory(tmp_path):
+    assert _ignored(tmp_path, ["build/", "!build/run.sh"], "build/run.sh")
+
+
+@pytest.mark.parametrize(
+    ("pattern", "path", "ignored"),
+    [
+        ("/top.sh", "top.sh", True),
+        ("/top.sh", "sub/top.sh", False),
+        ("doc/*.sh", "doc/a.sh", True),
+        ("doc/*.sh", "src/doc/a.sh", False),
+        ("doc/*.sh", "doc/deep/a.sh", False),
+        ("name.sh", "a/b/name.sh", True),
+    ],
+)
+def test_anchoring(tmp_path, pattern, path, ignored):
+    assert _ignored(tmp_path, [pattern], path) is ignored
+
+
+def test_trailing_slash_matches_directories_only(tmp_path):
+    assert _ignored(tmp_path, ["out/"], "out", is_dir=True)
+    assert not _ignored(tmp_path, ["out/"], "out")
+
+
+@pytest.mark.parametrize(
+    ("pattern", "path", "is_dir", "ignored"),
+    [
+        ("**/gen", "gen", True, True),
+        ("**/gen", "a/b/gen", True, True),
+        ("a/**/b.sh", "a/b.sh", False, True),
+        ("a/**/b.sh", "a/x/y/b.sh", False, True),
+        ("a/**/b.sh", "c/a/x/b.sh", False, False),
+        ("a/**", "a/x/y.sh", False, True),
+        ("a/**", "a", True, False),
+        ("a*/**/*.sh", "ab/c/d.sh", False, True),
+    ],
+)
+def test_double_star(tmp_path, pattern, path, is_dir, ignored):
+    assert _ignored(tmp_path, [pattern], path, is_dir) is ignored
+
+
+@pytest.mark.parametrize(
+    ("pattern", "path", "ignored"),
+    [
+        ("\\#notes", "#notes", True),
+        ("\\!bang", "!bang", True),
+        ("trail\\ ", "trail ", True),
+        ("trail ", "trail", True),
+        ("\\*", "*", True),
+        ("\\*", "x", False),
+        ("[ab].sh", "a.sh", True),
+        ("[!ab].sh", "a.sh", False),
+        ("[!ab].sh", "c.sh", True),
+        ("file?.sh", "file1.sh", True),
+        ("file?.sh", "file.sh", False),
+    ],
+)
+def test_escapes_and_wildcards(tmp_path, pattern, path, ignored):
+    assert _ignored(tmp_path, [pattern], path) is ignored
+
+
+def test_gitignore_rules_are_relative_to_their_directory(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / ".gitignore").write_text("*.tmp\n")
+    (tmp_path / "sub" / ".gitignore").write_text("/local.sh\n!keep.tmp\n")
+    rules = IgnoreRules(root=str(tmp_path))
+
+    assert rules.ignored(str(tmp_path / "sub" / "local.sh"))
+    assert not rules.ignored(str(tmp_path / "local.sh"))
+    assert rules.ignored(str(tmp_path / "sub" / "x.tmp"))
+    assert not rules.ignored(str(tmp_path / "sub" / "keep.tmp"))
+
+
+def test_overrides_take_precedence_over_gitignore(tmp_path):
+    (tmp_path / ".gitignore").write_text("!*.sh\n")
+    rules = IgnoreRules(defaults=["*.sh"], overrides=["gen.sh"], root=str(tmp_path))
+
+    assert not rules.ignored(str(tmp_path / "run.sh"))
+    assert rules.ignored(str(tmp_path / "gen.sh"))
@@ -0,0 +1,96 @@
+"""Tests for pylib.patch."""
+
+import pytest
+from pylib.patch import PatchError, apply_hunks, apply_patch, parse_unified_diff
+
+
+def _lines(text):
+    return text.splitlines(keepends=True)
+
+
+def test_multi_file_diff_is_split_by_target_path():
+    diff = (
+        "--- a/one.sh\n"
+        "+++ b/one.sh\n"
+        "@@ -1 +1 @@\n"
+        "-echo $a\n"
+        '+echo "$a"\n'
+        "--- a/dir/two.sh\n"
+        "+++ b/dir/two.sh\n"
+        "@@ -2,2 +2,2 @@\n"
+        " x=1\n"
+        "-echo $x\n"
+        '+echo "$x"\n'
+    )
+
+    patches = parse_unified_diff(diff)
+
+    assert list(patches) == ["one.sh", "dir/two.sh"]
+    [hunk] = patches["dir/two.sh"]
+    assert hunk.old_start == 2
+    assert hunk.old_lines == ["x=1\n", "echo $x\n"]
+    assert hunk.new_lines == ["x=1\n", 'echo "$x"\n']
+
+
+def test_hunk_applies_at_an_offset():
+    diff = "--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n a\n-b\n+B\n@@ -5 +5 @@\n-e\n+E\n"
+    hunks = parse_unified_diff(diff)["f"]
+
+    # Two lines were inserted above both hunks since the diff was made
+    result = apply_hunks(_lines("new\nnew\na\nb\nc\nd\ne\n"), hunks)
+
+    assert "".join(result) == "new\nnew\na\nB\nc\nd\nE\n"
+
+
+def test_insertion_after_a_line():
+    diff = "--- a/f\n+++ b/f\n@@ -1,0 +2 @@\n+inserted\n"
+
+    result = apply_hunks(_lines("a\nb\n"), parse_unified_diff(diff)["f"])
+
+    assert "".join(result) == "a\ninserted\nb\n"
+
+
+def test_no_newline_marker_on_old_and_new_side():
+    diff = (
+        "--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n a\n-b\n\\ No newline at end of file\n+c\n"
+    )
+
+    result = apply_hunks(_lines("a\nb"), parse_unified_diff(diff)["f"])
+
+    assert "".join(result) == "a\nc\n"
+
+
+def test_no_newline_marker_on_context_line():
+    diff = (
+        "--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n-a\n+A\n b\n\\ No newline at end of file\n"
+    )
+
+    result = apply_hunks(_lines("a\nb"), parse_unified_diff(diff)["f"])
+
+    assert "".join(result) == "A\nb"
+
+
+def test_hunk_that_cannot_be_placed_raises():
+    diff = "--- a/f\n+++ b/f\n@@ -1 +1 @@\n-missing\n+x\n"
+
+    with pytest.raises(PatchError, match="line 1 does not apply"):
+        apply_hunks(_lines("a\nb\n"), parse_unified_diff(diff)["f"])
+
+
+def test_malformed_and_truncated_diffs_raise():
+    with pytest.raises(PatchError, match="Malformed hunk header"):
+        parse_unified_diff("--- a/f\n+++ b/f\n@@ bogus @@\n")
+    with pytest.raises(PatchError, match="Truncated hunk"):
+        parse_unified_diff("--- a/f\n+++ b/f\n@@ -1,2 +1,2 @@\n a\n")
+
+
+def test_apply_patch_keeps_line_endings_and_mode(tmp_path):
+    path = tmp_path / "f.sh"
+    path.write_bytes(b"a\r\nb\r\n")
+    path.chmod(0o755)
+    diff = "--- a/f.sh\n+++ b/f.sh\n@@ -2 +2 @@\n-b\r\n+c\r\n"
+
+    apply_patch(str(path), parse_unified_diff(diff)["f.sh"])
+
+    assert path.read_bytes() == b"a\r\nc\r\n"
+    assert path.stat().st_mode & 0o777 == 0o755
@@ -0,0 +1,28 @@
+"""Tests for pylib.timing."""
+
+from pylib.timing import PROCESS, STARTUP, Tracer
+
+
+def _event(name, category, milliseconds, **args):
+    return {"name": name, "cat": category, "dur": milliseconds * 1000, "args": args}
+
+
+def test_summary_reports_tool_startup_apart_from_launch_and_execution():
+    tracer = Tracer()
+    tracer.events = [
+        _event("no-op", STARTUP, 5, command="shellcheck"),
+        _event("no-op", STARTUP, 4, command="shellcheck"),
+        _event("ready handshake", STARTUP, 900, command="pwsh"),
+        *[_event("launch", PROCESS, 1, command="shellcheck") for _ in range(3)],
+        *[_event("execute", PROCESS, 30, command="shellcheck") for _ in range(3)],
+        _event("execute", PROCESS, 50, command="pwsh worker"),
+    ]
+
+    summary = tracer.summary()
+
+    assert "Process launch" in summary and "(3 processes, fork and exec)" in summary
+    assert "(3 runs x 4.0 ms no-op call)" in summary
+    assert "(1 worker ready handshakes)" in summary
+    # 900 ms of handshakes plus three runs at the fastest no-op call
+    assert "Tool startup                 912.0 ms" in summary
+    assert "Tool execution               128.0 ms" in summary